@@ -26,6 +26,7 @@ from models.document import Document
 from models.job import Job
 from models.control import Control
 from models.evidence import EvidenceItem, Gap
+from models.outbox import OutboxMessage
 
 target_metadata = Base.metadata
 
@@ -0,0 +1,48 @@
+"""Add de-duplication key and result source to jobs table
+
+Revision ID: add_job_dedup_001
+Revises: add_job_metrics_001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_job_dedup_001'
+down_revision: Union[str, None] = 'add_job_metrics_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('dedup_key', sa.String(64), nullable=True))
+    op.add_column(
+        'jobs',
+        sa.Column(
+            'source_job_id',
+            sa.UUID(),
+            sa.ForeignKey('jobs.id', ondelete='SET NULL'),
+            nullable=True,
+        ),
+    )
+    op.create_index('ix_jobs_dedup_key', 'jobs', ['dedup_key'])
+    # Only one queued or running job per key, so concurrent duplicate
+    # submissions coalesce even across API instances
+    op.create_index(
+        'ix_jobs_active_dedup_key',
+        'jobs',
+        ['dedup_key'],
+        unique=True,
+        postgresql_where=sa.text("status IN ('PENDING', 'RUNNING')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_active_dedup_key', table_name='jobs')
+    op.drop_index('ix_jobs_dedup_key', table_name='jobs')
+    op.drop_column('jobs', 'source_job_id')
+    op.drop_column('jobs', 'dedup_key')
@@ -0,0 +1,45 @@
+"""Add job_documents association table
+
+Revision ID: add_job_documents_001
+Revises: add_job_dedup_001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_job_documents_001'
+down_revision: Union[str, None] = 'add_job_dedup_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('job_documents',
+    sa.Column('job_id', sa.UUID(), nullable=False),
+    sa.Column('document_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['job_id'], ['jobs.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('job_id', 'document_id')
+    )
+    op.create_index(op.f('ix_job_documents_document_id'), 'job_documents', ['document_id'], unique=False)
+    # Link existing jobs to the documents their evidence was drawn from.
+    # Jobs with no evidence get no rows; the run endpoint falls back to the
+    # owner's documents for those, as runs did before this table
+    op.execute("""
+        INSERT INTO job_documents (job_id, document_id)
+        SELECT DISTINCT e.job_id, d.id
+        FROM evidence_items e
+        CROSS JOIN LATERAL unnest(e.source_document_ids) AS src(document_id)
+        JOIN documents d ON d.id = src.document_id
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_job_documents_document_id'), table_name='job_documents')
+    op.drop_table('job_documents')
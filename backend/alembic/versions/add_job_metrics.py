@@ -0,0 +1,27 @@
+"""Add metrics to jobs table
+
+Revision ID: add_job_metrics_001
+Revises: add_scan_type_001
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_job_metrics_001'
+down_revision: Union[str, None] = 'add_scan_type_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-job performance telemetry written when analysis completes
+    op.add_column('jobs', sa.Column('metrics', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'metrics')
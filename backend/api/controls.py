@@ -1,54 +1,63 @@
 """
 Controls API endpoints for listing compliance controls.
-Enhanced with full SOC 2 Trust Service Criteria.
+Controls are served from the framework registry (SOC 2, ISO 27001, HIPAA).
 """
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query, status
 from typing import Optional
 import uuid
 
-from services.soc2_controls import (
-    get_all_controls,
-    get_quick_scan_controls,
-    get_control_by_id,
-    get_control_categories,
-    CONTROL_SUMMARY,
+from services.framework_registry import (
+    FrameworkCatalog,
+    FrameworkNotFoundError,
+    get_framework,
+    get_framework_registry,
 )
 from schemas.control import ControlResponse, ControlListResponse
 
 router = APIRouter()
 
 
+def _get_catalog(framework: str) -> FrameworkCatalog:
+    """Resolve a framework catalog or raise 404."""
+    try:
+        return get_framework(framework)
+    except FrameworkNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown framework: {framework}",
+        )
+
+
 @router.get("", response_model=ControlListResponse)
 async def list_controls(
     framework: str = Query("soc2", description="Compliance framework"),
     category: Optional[str] = Query(None, description="Filter by category"),
-    scan_type: str = Query("quick", description="'quick' for 8 key controls, 'full' for all"),
+    scan_type: str = Query("quick", description="'quick' for the pack's quick-scan controls, 'full' for all"),
 ) -> ControlListResponse:
     """
     List all compliance controls for a framework.
-    
+
     Args:
         framework: The compliance framework (default: soc2).
         category: Optional category filter.
-        scan_type: 'quick' for key controls, 'full' for all 50+ controls.
-    
+        scan_type: 'quick' for key controls, 'full' for all controls.
+
     Returns:
         List of controls with total count.
     """
+    catalog = _get_catalog(framework)
+
     # Get controls based on scan type
-    if scan_type == "full":
-        all_controls = get_all_controls()
-    else:
-        all_controls = get_quick_scan_controls()
-    
+    all_controls = catalog.get_controls(scan_type)
+
     # Filter by category if provided
     if category:
         all_controls = [
             c for c in all_controls
             if category.lower() in c["category"].lower()
         ]
-    
+
     # Convert to response format
     controls = []
     for control in all_controls:
@@ -56,7 +65,7 @@ async def list_controls(
             ControlResponse(
                 id=uuid.uuid5(uuid.NAMESPACE_DNS, control["control_id"]),
                 control_id=control["control_id"],
-                framework="SOC2",
+                framework=catalog.short_name,
                 title=control["title"],
                 description=control["description"],
                 check_type="ai_prompt",
@@ -64,22 +73,43 @@ async def list_controls(
                 required_file_types="pdf,csv,json,txt",
             )
         )
-    
+
     return ControlListResponse(
         controls=controls,
         total=len(controls),
     )
 
 
+@router.get("/frameworks")
+async def list_frameworks():
+    """
+    Get all compliance frameworks with an installed control pack.
+
+    Returns:
+        Framework metadata including version and control counts.
+    """
+    registry = get_framework_registry()
+    frameworks = [
+        registry.get(framework_id).info()
+        for framework_id in registry.available_frameworks()
+    ]
+    return {
+        "frameworks": frameworks,
+        "total": len(frameworks),
+    }
+
+
 @router.get("/categories")
-async def list_categories():
+async def list_categories(
+    framework: str = Query("soc2", description="Compliance framework"),
+):
     """
-    Get all SOC 2 control categories with counts.
-    
+    Get all control categories for a framework with counts.
+
     Returns:
         List of categories with control counts.
     """
-    categories = get_control_categories()
+    categories = _get_catalog(framework).get_categories()
     return {
         "categories": categories,
         "total_categories": len(categories),
@@ -87,39 +117,47 @@ async def list_categories():
 
 
 @router.get("/summary")
-async def get_controls_summary():
+async def get_controls_summary(
+    framework: str = Query("soc2", description="Compliance framework"),
+):
     """
-    Get summary statistics for all SOC 2 controls.
-    
+    Get summary statistics for all controls in a framework.
+
     Returns:
         Control statistics by category.
     """
+    catalog = _get_catalog(framework)
     return {
-        "summary": CONTROL_SUMMARY,
-        "quick_scan_count": len(get_quick_scan_controls()),
-        "full_scan_count": len(get_all_controls()),
+        "summary": catalog.summary(),
+        "quick_scan_count": catalog.control_count("quick"),
+        "full_scan_count": catalog.control_count("full"),
     }
 
 
 @router.get("/{control_id}")
-async def get_control(control_id: str):
+async def get_control(
+    control_id: str,
+    framework: str = Query("soc2", description="Compliance framework"),
+):
     """
     Get details for a specific control.
-    
+
     Args:
         control_id: The control ID (e.g., CC6.1).
-    
+        framework: The compliance framework (default: soc2).
+
     Returns:
         Control details or 404 if not found.
     """
-    control = get_control_by_id(control_id.upper())
+    catalog = _get_catalog(framework)
+    control = catalog.get_control(control_id)
     if not control:
         return {"error": f"Control {control_id} not found"}
-    
+
     return {
         "id": str(uuid.uuid5(uuid.NAMESPACE_DNS, control["control_id"])),
         "control_id": control["control_id"],
-        "framework": "SOC2",
+        "framework": catalog.short_name,
         "category": control["category"],
         "title": control["title"],
         "description": control["description"],
@@ -2,7 +2,9 @@
 Health check endpoints for monitoring and load balancers.
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response, status
+
+from core.readiness import ReadinessChecker, get_readiness_checker
 
 router = APIRouter()
 
@@ -23,18 +25,21 @@ async def health_check() -> dict:
 
 
 @router.get("/health/ready")
-async def readiness_check() -> dict:
+async def readiness_check(
+    response: Response,
+    checker: ReadinessChecker = Depends(get_readiness_checker),
+) -> dict:
     """
     Readiness check for Kubernetes/container orchestration.
     
+    Probes the database pool, Redis, Celery workers and the upload
+    directory. Results are cached for a few seconds so frequent probing
+    does not load the dependencies.
+    
     Returns:
-        Status indicating if the service is ready to receive traffic.
+        Per-check status and latency; HTTP 503 when a required check fails.
     """
-    # TODO: Add database connectivity check
-    return {
-        "status": "ready",
-        "checks": {
-            "database": "ok",
-            "redis": "ok",
-        },
-    }
+    report = await checker.check()
+    if report["status"] != "ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
@@ -2,20 +2,23 @@
 Job management API endpoints for compliance analysis.
 """
 
+import asyncio
 from datetime import datetime, timezone
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, status
 
+from core.config import settings
 from core.dependencies import DbSession, CurrentUserId
-from schemas.job import JobCreate, JobResponse, JobListResponse
+from schemas.job import JobCreate, JobResponse, JobListResponse, JobMetricsResponse
 from schemas.evidence import EvidenceListResponse, GapListResponse
 from services.job_service import JobService
 from services.document_service import DocumentService
+from services.framework_registry import get_framework_registry
+from services.job_cancellation import request_cancellation, revoke_task
+from services.job_executor import ExecutorUnavailableError, JobExecutor, get_job_executor
+from services.job_scheduler import get_job_scheduler, release_job
 from models.job import Job, JobStatus
-from models.document import Document
-from models.evidence import EvidenceItem, Gap, EvidenceStatus, GapSeverity
 
 router = APIRouter()
 
@@ -34,14 +37,22 @@ async def create_evidence_run(
     Create a new compliance evidence collection job.
     
     This will start an async job that analyzes the provided documents
-    against SOC 2 compliance controls.
+    against the requested framework's compliance controls. The job is
+    handed to the task queue through the outbox, so the broker is never
+    contacted during the request.
     
     Args:
-        job_data: Job creation data including document_ids and scan_type
-            - scan_type: "quick" for 8 key controls, "full" for all 51
+        job_data: Job creation data including document_ids, framework and scan_type
+            - scan_type: "quick" for the pack's quick-scan controls, "full" for all controls
     """
     user_uuid = UUID(user_id)
     
+    if not get_framework_registry().has_framework(job_data.framework):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown framework: {job_data.framework}",
+        )
+    
     # Verify all documents exist and belong to user
     doc_service = DocumentService(db)
     documents = await doc_service.get_documents_by_ids(
@@ -55,30 +66,18 @@ async def create_evidence_run(
             detail="One or more documents not found",
         )
     
-    # Create job with scan_type
+    # Create job with scan_type, unless an identical run can answer it
     job_service = JobService(db)
-    job = await job_service.create_job(
+    job, created = await job_service.create_or_reuse_job(
         job_data=job_data,
         user_id=user_uuid,
+        documents=documents,
     )
     
-    # Try to enqueue Celery task for async processing
-    try:
-        from worker.tasks import run_compliance_analysis
-        task = run_compliance_analysis.delay(
-            str(job.id),
-            [str(d) for d in job_data.document_ids],
-            job_data.scan_type,
-        )
-        # Update job with celery task ID
-        job.celery_task_id = task.id
-        await db.commit()
-        await db.refresh(job)
-    except Exception as e:
-        # Celery not available - job will stay pending
-        print(f"Celery not available: {e}")
-    
-    return JobResponse.model_validate(job)
+    response = JobResponse.model_validate(job)
+    response.queue_position = await _queue_position(job)
+    response.deduplicated = not created
+    return response
 
 
 @router.get("", response_model=JobListResponse)
@@ -116,7 +115,20 @@ async def get_job(
             detail="Job not found",
         )
     
-    return JobResponse.model_validate(job)
+    response = JobResponse.model_validate(job)
+    response.queue_position = await _queue_position(job)
+    return response
+
+
+async def _queue_position(job: Job) -> int | None:
+    """Scheduler queue position of a pending job, if it is waiting to start."""
+    if not settings.scheduler_enabled or job.status != JobStatus.PENDING.value:
+        return None
+    try:
+        return await asyncio.to_thread(get_job_scheduler().position, str(job.id))
+    except Exception:
+        # Position is informational; Redis being down must not fail the request
+        return None
 
 
 @router.get("/{job_id}/evidence", response_model=EvidenceListResponse)
@@ -141,6 +153,34 @@ async def get_job_evidence(
     return result
 
 
+@router.get("/{job_id}/metrics", response_model=JobMetricsResponse)
+async def get_job_metrics(
+    job_id: UUID,
+    user_id: CurrentUserId = None,
+    db: DbSession = None,
+) -> JobMetricsResponse:
+    """
+    Get performance telemetry for a job.
+    
+    Includes extraction time per document, how the documents were packed
+    into the token budget, LLM latency, tokens, context fill, retries, cache
+    hits and parse failures per control, and DB write time.
+    """
+    service = JobService(db)
+    result = await service.get_job_metrics(
+        job_id=job_id,
+        user_id=UUID(user_id),
+    )
+    
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    
+    return result
+
+
 @router.get("/{job_id}/gaps", response_model=GapListResponse)
 async def get_job_gaps(
     job_id: UUID,
@@ -183,23 +223,73 @@ async def delete_job(
         )
 
 
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(
+    job_id: UUID,
+    user_id: CurrentUserId = None,
+    db: DbSession = None,
+) -> JobResponse:
+    """
+    Cancel a pending or running job.
+    
+    A queued job never starts. A running job stops before its next control,
+    or during its current LLM call, keeping the evidence already collected.
+    """
+    service = JobService(db)
+    job = await service.get_job(job_id=job_id, user_id=UUID(user_id))
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    
+    if job.status not in [JobStatus.PENDING.value, JobStatus.RUNNING.value]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Job cannot be cancelled in {job.status} status",
+        )
+    
+    # The flag stops a running analysis; a queued job also sees the status
+    try:
+        await asyncio.to_thread(request_cancellation, str(job.id))
+    except Exception as e:
+        if job.status == JobStatus.RUNNING.value:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Could not signal the running job: {e}",
+            )
+    
+    if job.status == JobStatus.PENDING.value:
+        await asyncio.to_thread(release_job, str(job.id))
+        if job.celery_task_id:
+            await asyncio.to_thread(revoke_task, job.celery_task_id)
+    
+    job.status = JobStatus.CANCELLED.value
+    job.completed_at = datetime.now(timezone.utc)
+    await db.commit()
+    await db.refresh(job)
+    
+    return JobResponse.model_validate(job)
+
+
 @router.post(
     "/{job_id}/run",
     response_model=JobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def run_job_analysis(
     job_id: UUID,
     user_id: CurrentUserId = None,
     db: DbSession = None,
+    executor: JobExecutor = Depends(get_job_executor),
 ) -> JobResponse:
     """
-    Run compliance analysis for a job.
+    Queue compliance analysis for a job on the in-process executor.
     
-    This runs the Gemini AI analysis directly.
-    Use this when Celery worker is not available.
+    Use this when Celery worker is not available. Returns immediately;
+    poll GET /jobs/{id} for progress.
     """
-    from services.gemini_service import get_gemini_service
-    
     service = JobService(db)
     job = await service.get_job(job_id=job_id, user_id=UUID(user_id))
     
@@ -215,11 +305,10 @@ async def run_job_analysis(
             detail=f"Job cannot be run in {job.status} status",
         )
     
-    # Get user's documents
-    result = await db.execute(
-        select(Document).where(Document.user_id == UUID(user_id))
-    )
-    documents = result.scalars().all()
+    # Get the documents the job was created for
+    documents = await service.get_job_documents(job.id)
+    if not documents:
+        documents = await service.link_owner_documents(job)
     
     if not documents:
         raise HTTPException(
@@ -227,89 +316,31 @@ async def run_job_analysis(
             detail="No documents found for analysis",
         )
     
-    # Update job to running
-    job.status = JobStatus.RUNNING.value
-    job.started_at = datetime.now(timezone.utc)
-    job.error_message = None
-    await db.commit()
+    active = await service.reset_for_rerun(job)
+    if active is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"An identical job is already active: {active.id}",
+        )
     
     try:
-        # Get document file paths
-        doc_paths = [doc.file_path for doc in documents]
-        doc_ids = [doc.id for doc in documents]
-        
-        # Get scan_type from job (default to quick)
-        scan_type = getattr(job, 'scan_type', 'quick') or 'quick'
-        
-        # Initialize Gemini service with scan_type and run analysis
-        gemini = get_gemini_service(scan_type=scan_type)
-        
-        # Update total controls based on scan type
-        job.total_controls = len(gemini.get_controls())
-        await db.commit()
-        
-        analysis_results = await gemini.analyze_documents(doc_paths)
-        
-        # Save evidence items
-        for evidence_data in analysis_results["evidence_items"]:
-            status_map = {
-                "pass": EvidenceStatus.PASS.value,
-                "fail": EvidenceStatus.FAIL.value,
-                "needs_review": EvidenceStatus.NEEDS_REVIEW.value,
-                "error": EvidenceStatus.ERROR.value,
-            }
-            
-            evidence = EvidenceItem(
-                job_id=job_id,
-                control_id=evidence_data["control_id"],
-                status=status_map.get(
-                    evidence_data.get("status", "needs_review"),
-                    EvidenceStatus.NEEDS_REVIEW.value
-                ),
-                confidence=evidence_data.get("confidence", 0.0),
-                summary=evidence_data.get("summary", ""),
-                evidence_quote=evidence_data.get("evidence_quote"),
-                raw_llm_response={
-                    "response": evidence_data.get("raw_llm_response")
-                },
-                source_document_ids=list(doc_ids),
-            )
-            db.add(evidence)
-        
-        # Save gaps
-        for gap_data in analysis_results.get("gaps", []):
-            severity_map = {
-                "critical": GapSeverity.CRITICAL.value,
-                "high": GapSeverity.HIGH.value,
-                "medium": GapSeverity.MEDIUM.value,
-                "low": GapSeverity.LOW.value,
-            }
-            
-            gap = Gap(
-                job_id=job_id,
-                control_id=gap_data["control_id"],
-                severity=severity_map.get(
-                    gap_data.get("severity", "medium"),
-                    GapSeverity.MEDIUM.value
-                ),
-                description=gap_data["description"],
-                remediation_suggestion=gap_data.get("remediation_suggestion"),
-            )
-            db.add(gap)
-        
-        # Update job as completed
-        job.status = JobStatus.SUCCEEDED.value
-        job.progress = 100
-        job.completed_at = datetime.now(timezone.utc)
-        await db.commit()
-        await db.refresh(job)
-        
-    except Exception as e:
-        # Update job as failed
-        job.status = JobStatus.FAILED.value
-        job.error_message = str(e)
-        job.completed_at = datetime.now(timezone.utc)
-        await db.commit()
-        await db.refresh(job)
+        queued = executor.submit(str(job.id), job.scan_type or "quick", job.job_type)
+    except ExecutorUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+        )
+    
+    if not queued:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job is already queued for execution",
+        )
+    
+    # A job still waiting in the fair scheduler would otherwise also run on
+    # Celery. Release it only once the executor holds it, so a rejected run
+    # leaves it queued there; the worker's atomic claim stops a double run
+    # in between.
+    await asyncio.to_thread(release_job, str(job.id))
     
     return JobResponse.model_validate(job)
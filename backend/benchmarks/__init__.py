@@ -0,0 +1 @@
+"""Benchmarks and load tests for the ShieldAgent pipeline."""
@@ -0,0 +1,184 @@
+"""
+Async HTTP client for driving the ShieldAgent API in benchmarks.
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+
+from models.job import JobStatus
+
+TERMINAL_JOB_STATUSES = {
+    JobStatus.SUCCEEDED.value,
+    JobStatus.FAILED.value,
+    JobStatus.CANCELLED.value,
+}
+
+
+
+class DeduplicatedRunError(RuntimeError):
+    """The server answered an evidence run from job de-duplication."""
+
+
+# Called with (endpoint name, latency in ms, HTTP status or 0 on transport error)
+Recorder = Callable[[str, float, int], None]
+
+
+class ApiClient:
+    """Thin wrapper over the public API used by the benchmarks."""
+
+    def __init__(
+        self,
+        base_url: str,
+        api_prefix: str = "/api",
+        timeout: float = 60.0,
+        recorder: Recorder | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+        allow_dedup: bool = False,
+    ) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            base_url: Server root, e.g. http://localhost:8000.
+            api_prefix: Prefix the API router is mounted under.
+            timeout: Per-request timeout in seconds.
+            recorder: Optional callback receiving each request's timing.
+            transport: Optional httpx transport (e.g. ASGITransport in-process).
+            allow_dedup: Accept evidence runs answered by an identical
+                in-flight or recent job. Off by default: a benchmark would
+                then measure de-duplication instead of analysis.
+        """
+        self._client = httpx.AsyncClient(
+            base_url=f"{base_url.rstrip('/')}{api_prefix}",
+            timeout=timeout,
+            transport=transport,
+        )
+        self._recorder = recorder
+        self._allow_dedup = allow_dedup
+
+    async def __aenter__(self) -> "ApiClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def _request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request, timing it under an endpoint name like "GET /jobs/{id}"."""
+        started = time.perf_counter()
+        status_code = 0
+        try:
+            response = await self._client.request(method, url, **kwargs)
+            status_code = response.status_code
+        finally:
+            if self._recorder is not None:
+                self._recorder(name, (time.perf_counter() - started) * 1000, status_code)
+        response.raise_for_status()
+        return response
+
+    async def register(self, email: str, password: str) -> dict[str, Any]:
+        response = await self._request(
+            "POST /auth/register",
+            "POST",
+            "/auth/register",
+            json={"email": email, "password": password, "full_name": "Benchmark User"},
+        )
+        return response.json()
+
+    async def login(self, email: str, password: str) -> str:
+        """Log in and authenticate subsequent requests."""
+        response = await self._request(
+            "POST /auth/login",
+            "POST",
+            "/auth/login",
+            data={"username": email, "password": password},
+        )
+        token = response.json()["access_token"]
+        self._client.headers["Authorization"] = f"Bearer {token}"
+        return token
+
+    async def upload(self, path: str | Path) -> str:
+        """Upload a document and return its ID."""
+        path = Path(path)
+        with open(path, "rb") as f:
+            response = await self._request(
+                "POST /documents/upload",
+                "POST",
+                "/documents/upload",
+                files={"file": (path.name, f.read())},
+            )
+        return response.json()["id"]
+
+    async def create_run(
+        self,
+        document_ids: list[str],
+        scan_type: str = "quick",
+        framework: str = "soc2",
+    ) -> dict[str, Any]:
+        """
+        Start an evidence run.
+
+        Raises:
+            DeduplicatedRunError: If the server reused another job and
+                allow_dedup is off (run the server with JOB_DEDUP_ENABLED=false).
+        """
+        response = await self._request(
+            "POST /jobs/evidence-run",
+            "POST",
+            "/jobs/evidence-run",
+            json={
+                "document_ids": document_ids,
+                "scan_type": scan_type,
+                "framework": framework,
+            },
+        )
+        job = response.json()
+        if job.get("deduplicated") and not self._allow_dedup:
+            raise DeduplicatedRunError(
+                f"Job {job['id']} was answered by job de-duplication; "
+                "run the API with JOB_DEDUP_ENABLED=false when benchmarking"
+            )
+        return job
+
+    async def get_job(self, job_id: str) -> dict[str, Any]:
+        response = await self._request("GET /jobs/{id}", "GET", f"/jobs/{job_id}")
+        return response.json()
+
+    async def wait_for_job(
+        self,
+        job_id: str,
+        poll_interval: float = 1.0,
+        timeout: float = 900.0,
+    ) -> dict[str, Any]:
+        """
+        Poll a job until it succeeds, fails or is cancelled.
+
+        Raises:
+            TimeoutError: If the job is still running after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get_job(job_id)
+            if job["status"] in TERMINAL_JOB_STATUSES:
+                return job
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job['status']} after {timeout}s")
+            await asyncio.sleep(poll_interval)
+
+    async def list_evidence(self, job_id: str) -> dict[str, Any]:
+        response = await self._request("GET /jobs/{id}/evidence", "GET", f"/jobs/{job_id}/evidence")
+        return response.json()
+
+    async def list_gaps(self, job_id: str) -> dict[str, Any]:
+        response = await self._request("GET /jobs/{id}/gaps", "GET", f"/jobs/{job_id}/gaps")
+        return response.json()
+
+    async def download_report(self, job_id: str) -> bytes:
+        response = await self._request("GET /reports/pdf/{id}", "GET", f"/reports/pdf/{job_id}")
+        return response.content
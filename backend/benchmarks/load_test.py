@@ -0,0 +1,260 @@
+"""
+API load test with per-endpoint latency SLO reports.
+
+Virtual users register and log in, then repeatedly upload a document,
+create an evidence run, poll the job, list evidence and gaps and download the
+report. Latency is recorded per endpoint and reported as p50/p95/p99, and the
+run can be compared against a stored baseline to catch regressions:
+
+    LLM_BACKEND=stub JOB_DEDUP_ENABLED=false uvicorn main:app   # plus Postgres, Redis, workers
+    python -m benchmarks.load_test --users 20 --duration 120 --save-baseline
+    python -m benchmarks.load_test --users 20 --duration 120   # compares
+
+The process exits with status 1 when any endpoint regresses past the
+tolerance, so it can gate CI or a release.
+
+Users upload the same sample documents over and over, so job
+de-duplication must be off on the API; otherwise most runs would attach
+to an earlier job and the test would measure de-duplication, not
+analysis. The run stops with an error if a run was de-duplicated.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmarks.client import ApiClient
+from benchmarks.stats import summarize
+from core.config import settings
+
+DEFAULT_DOCUMENTS_DIR = Path(__file__).resolve().parents[2] / "sample_documents"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "load_test.json"
+
+# Percentiles compared against the baseline
+SLO_PERCENTILES = ("p50", "p95", "p99")
+
+
+class LatencyRecorder:
+    """Collects request latencies and errors per endpoint."""
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def __call__(self, name: str, latency_ms: float, status_code: int) -> None:
+        self.latencies.setdefault(name, []).append(latency_ms)
+        if status_code == 0 or status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed_seconds: float) -> dict[str, dict]:
+        """Per-endpoint latency percentiles (ms), error rate and request rate."""
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            errors = self.errors.get(name, 0)
+            endpoints[name] = {
+                **summarize(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "rps": round(len(samples) / elapsed_seconds, 2) if elapsed_seconds else 0.0,
+            }
+        return endpoints
+
+
+def compare_to_baseline(
+    endpoints: dict[str, dict],
+    baseline: dict[str, dict],
+    tolerance: float = 0.2,
+    min_delta_ms: float = 5.0,
+) -> list[dict]:
+    """
+    Find endpoints that got slower or less reliable than the baseline.
+
+    A percentile regresses when it exceeds the baseline by more than
+    `tolerance` (relative) and `min_delta_ms` (absolute), so noise on very
+    fast endpoints is ignored.
+
+    Args:
+        endpoints: Current per-endpoint report.
+        baseline: Baseline per-endpoint report.
+        tolerance: Allowed relative slowdown, e.g. 0.2 for +20%.
+        min_delta_ms: Smallest absolute slowdown treated as a regression.
+
+    Returns:
+        One entry per regressed metric.
+    """
+    regressions = []
+    for name, current in endpoints.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        for metric in SLO_PERCENTILES:
+            before, after = previous.get(metric, 0.0), current[metric]
+            if after - before > min_delta_ms and after > before * (1 + tolerance):
+                regressions.append({
+                    "endpoint": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change_pct": round((after / before - 1) * 100, 1) if before else None,
+                })
+
+        before_rate = previous.get("error_rate", 0.0)
+        if current["error_rate"] > before_rate + 0.01:
+            regressions.append({
+                "endpoint": name,
+                "metric": "error_rate",
+                "baseline": before_rate,
+                "current": current["error_rate"],
+                "change_pct": None,
+            })
+    return regressions
+
+
+async def _virtual_user(
+    base_url: str,
+    recorder: LatencyRecorder,
+    documents: list[Path],
+    deadline: float,
+    start_delay: float,
+    args: argparse.Namespace,
+) -> int:
+    """Run the user journey until the deadline; returns completed iterations."""
+    await asyncio.sleep(start_delay)
+    email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+    password = "load-test-password"
+    document_cycle = itertools.cycle(documents)
+    iterations = 0
+
+    async with ApiClient(base_url, recorder=recorder) as client:
+        try:
+            await client.register(email, password)
+            await client.login(email, password)
+        except httpx.HTTPError:
+            return 0
+
+        while time.monotonic() < deadline:
+            if args.iterations and iterations >= args.iterations:
+                break
+            try:
+                document_id = await client.upload(next(document_cycle))
+                job = await client.create_run([document_id], args.scan_type, args.framework)
+                try:
+                    await client.wait_for_job(
+                        job["id"],
+                        poll_interval=args.poll_interval,
+                        timeout=min(args.poll_timeout, max(0.0, deadline - time.monotonic())),
+                    )
+                except TimeoutError:
+                    pass
+                await client.list_evidence(job["id"])
+                await client.list_gaps(job["id"])
+                await client.download_report(job["id"])
+            except httpx.HTTPError:
+                # Already recorded as an endpoint error; keep generating load
+                pass
+            iterations += 1
+            if args.think_time:
+                await asyncio.sleep(args.think_time)
+
+    return iterations
+
+
+async def run_load_test(args: argparse.Namespace, documents: list[Path]) -> dict:
+    """Run the load test described by the CLI arguments and build the report."""
+    recorder = LatencyRecorder()
+    started = time.monotonic()
+    deadline = started + args.ramp_up + args.duration
+    ramp_step = args.ramp_up / args.users if args.users else 0.0
+
+    iterations = await asyncio.gather(*(
+        _virtual_user(args.base_url, recorder, documents, deadline, i * ramp_step, args)
+        for i in range(args.users)
+    ))
+    elapsed = time.monotonic() - started
+
+    return {
+        "config": {
+            "users": args.users,
+            "duration_seconds": args.duration,
+            "ramp_up_seconds": args.ramp_up,
+            "scan_type": args.scan_type,
+            "framework": args.framework,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "iterations": sum(iterations),
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+def _print_report(report: dict, regressions: list[dict]) -> None:
+    print(f"{report['iterations']} iterations by {report['config']['users']} users "
+          f"in {report['elapsed_seconds']}s")
+    print(f"{'endpoint':<28}{'count':>7}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>8}")
+    for name, stats in report["endpoints"].items():
+        print(f"{name:<28}{stats['count']:>7}{stats['error_rate'] * 100:>7.1f}"
+              f"{stats['p50']:>9.1f}{stats['p95']:>9.1f}{stats['p99']:>9.1f}{stats['rps']:>8.2f}")
+
+    if regressions:
+        print("\nREGRESSIONS:")
+        for r in regressions:
+            change = f" ({r['change_pct']:+.1f}%)" if r["change_pct"] is not None else ""
+            print(f"  {r['endpoint']} {r['metric']}: {r['baseline']} -> {r['current']}{change}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=10.0)
+    parser.add_argument("--iterations", type=int, default=0, help="Per-user cap (0 = unlimited)")
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--poll-timeout", type=float, default=120.0)
+    parser.add_argument("--scan-type", choices=["quick", "full"], default="quick")
+    parser.add_argument("--framework", default="soc2")
+    parser.add_argument("--documents-dir", type=Path, default=DEFAULT_DOCUMENTS_DIR)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative slowdown per percentile")
+    args = parser.parse_args()
+
+    documents = sorted(
+        p for p in args.documents_dir.iterdir()
+        if p.suffix.lstrip(".") in settings.allowed_extensions
+    )
+    report = asyncio.run(run_load_test(args, documents))
+
+    regressions: list[dict] = []
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2))
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare_to_baseline(
+            report["endpoints"], baseline["endpoints"], tolerance=args.tolerance
+        )
+        report["regressions"] = regressions
+    else:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+
+    _print_report(report, regressions)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
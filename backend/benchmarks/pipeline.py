@@ -0,0 +1,210 @@
+"""
+End-to-end pipeline benchmark: API -> Celery -> Postgres.
+
+Submits evidence runs through the API, waits for the workers to finish them
+and reports job throughput, per-control LLM latency and database write rate.
+Run the API and workers with the offline stub backend so results do not
+depend on Gemini quotas. Every job analyzes the same uploads, so job
+de-duplication must be off on the API or the runs would be answered from
+the first job's results; the client stops with an error if a run was
+de-duplicated:
+
+    LLM_BACKEND=stub LLM_STUB_LATENCY_MS=400 celery -A worker.celery_app worker
+    LLM_BACKEND=stub JOB_DEDUP_ENABLED=false uvicorn main:app
+    python -m benchmarks.pipeline --jobs 20 --concurrency 5 --output bench.json
+
+Per-control latency and row counts are read from the database configured in
+settings (DATABASE_URL), so run the benchmark with the same environment as
+the workers.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.client import ApiClient
+from benchmarks.stats import summarize
+from core.config import settings
+from models.evidence import EvidenceItem, Gap
+from models.job import JobStatus
+
+DEFAULT_DOCUMENTS_DIR = Path(__file__).resolve().parents[2] / "sample_documents"
+
+
+async def _run_job(
+    client: ApiClient,
+    document_ids: list[str],
+    scan_type: str,
+    framework: str,
+    semaphore: asyncio.Semaphore,
+    poll_interval: float,
+) -> dict:
+    async with semaphore:
+        submitted = time.perf_counter()
+        job = await client.create_run(document_ids, scan_type, framework)
+        job = await client.wait_for_job(job["id"], poll_interval=poll_interval)
+        job["wall_seconds"] = time.perf_counter() - submitted
+        return job
+
+
+async def _collect_db_stats(job_ids: list[str]) -> dict:
+    """Read per-control latency and persisted row counts for the jobs."""
+    engine = create_async_engine(settings.database_url)
+    ids = [UUID(j) for j in job_ids]
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(EvidenceItem.raw_llm_response).where(EvidenceItem.job_id.in_(ids))
+            )
+            latencies = [
+                row.raw_llm_response["latency_ms"]
+                for row in result
+                if row.raw_llm_response and row.raw_llm_response.get("latency_ms") is not None
+            ]
+            evidence_rows = await conn.scalar(
+                select(func.count()).select_from(EvidenceItem).where(EvidenceItem.job_id.in_(ids))
+            )
+            gap_rows = await conn.scalar(
+                select(func.count()).select_from(Gap).where(Gap.job_id.in_(ids))
+            )
+    finally:
+        await engine.dispose()
+
+    return {
+        "control_latencies_ms": latencies,
+        "evidence_rows": evidence_rows or 0,
+        "gap_rows": gap_rows or 0,
+    }
+
+
+def _job_run_seconds(job: dict) -> float | None:
+    """Worker-side run time from the job's started/completed timestamps."""
+    if not job.get("started_at") or not job.get("completed_at"):
+        return None
+    started = datetime.fromisoformat(job["started_at"])
+    completed = datetime.fromisoformat(job["completed_at"])
+    return (completed - started).total_seconds()
+
+
+async def run_benchmark(
+    base_url: str,
+    jobs: int,
+    concurrency: int,
+    scan_type: str,
+    framework: str,
+    documents: list[Path],
+    poll_interval: float = 1.0,
+) -> dict:
+    """
+    Run the pipeline benchmark.
+
+    Args:
+        base_url: API server root.
+        jobs: Number of evidence runs to submit.
+        concurrency: Maximum jobs in flight at once.
+        scan_type: "quick" or "full".
+        framework: Framework ID to evaluate against.
+        documents: Evidence files uploaded once and used by every job.
+        poll_interval: Seconds between job status polls.
+
+    Returns:
+        Benchmark report.
+    """
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    password = "benchmark-password"
+
+    async with ApiClient(base_url) as client:
+        await client.register(email, password)
+        await client.login(email, password)
+        document_ids = [await client.upload(path) for path in documents]
+
+        semaphore = asyncio.Semaphore(concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            _run_job(client, document_ids, scan_type, framework, semaphore, poll_interval)
+            for _ in range(jobs)
+        ))
+        elapsed = time.perf_counter() - started
+
+    succeeded = [j for j in results if j["status"] == JobStatus.SUCCEEDED.value]
+    db_stats = await _collect_db_stats([j["id"] for j in results])
+    rows_written = db_stats["evidence_rows"] + db_stats["gap_rows"]
+    run_seconds = [s for s in map(_job_run_seconds, succeeded) if s is not None]
+
+    return {
+        "config": {
+            "jobs": jobs,
+            "concurrency": concurrency,
+            "scan_type": scan_type,
+            "framework": framework,
+            "documents": [p.name for p in documents],
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "jobs_succeeded": len(succeeded),
+        "jobs_failed": len(results) - len(succeeded),
+        "jobs_per_minute": round(len(succeeded) / elapsed * 60, 2) if elapsed else 0.0,
+        "job_wall_seconds": summarize([j["wall_seconds"] for j in results]),
+        "job_run_seconds": summarize(run_seconds),
+        "control_latency_ms": summarize(db_stats["control_latencies_ms"]),
+        "db_rows_written": {
+            "evidence_items": db_stats["evidence_rows"],
+            "gaps": db_stats["gap_rows"],
+        },
+        "db_rows_per_second": round(rows_written / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(f"Jobs: {report['jobs_succeeded']} succeeded, {report['jobs_failed']} failed "
+          f"in {report['elapsed_seconds']}s")
+    print(f"Throughput: {report['jobs_per_minute']} jobs/min")
+    for name in ("job_wall_seconds", "job_run_seconds", "control_latency_ms"):
+        stats = report[name]
+        print(f"{name:>20}: p50={stats['p50']} p95={stats['p95']} "
+              f"p99={stats['p99']} max={stats['max']} (n={stats['count']})")
+    rows = report["db_rows_written"]
+    print(f"DB writes: {rows['evidence_items']} evidence + {rows['gaps']} gaps "
+          f"({report['db_rows_per_second']} rows/s)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--jobs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--scan-type", choices=["quick", "full"], default="quick")
+    parser.add_argument("--framework", default="soc2")
+    parser.add_argument("--documents-dir", type=Path, default=DEFAULT_DOCUMENTS_DIR)
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    args = parser.parse_args()
+
+    documents = sorted(
+        p for p in args.documents_dir.iterdir()
+        if p.suffix.lstrip(".") in settings.allowed_extensions
+    )
+    report = asyncio.run(run_benchmark(
+        base_url=args.base_url,
+        jobs=args.jobs,
+        concurrency=args.concurrency,
+        scan_type=args.scan_type,
+        framework=args.framework,
+        documents=documents,
+        poll_interval=args.poll_interval,
+    ))
+
+    _print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
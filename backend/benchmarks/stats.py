@@ -0,0 +1,38 @@
+"""
+Latency statistics helpers shared by the benchmarks.
+"""
+
+import math
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Percentile with linear interpolation between closest ranks.
+
+    Args:
+        values: Samples (need not be sorted).
+        q: Percentile in [0, 100].
+
+    Returns:
+        The interpolated percentile, or 0.0 for no samples.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return ordered[low]
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: list[float]) -> dict:
+    """Count, mean and tail percentiles of a latency sample (in its own unit)."""
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+    }
@@ -4,7 +4,7 @@ Loads from environment variables with sensible defaults.
 """
 
 from functools import lru_cache
-from typing import Literal
+from typing import Any, Literal
 
 from pydantic import Field, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -102,6 +102,187 @@ class Settings(BaseSettings):
         description="Google Gemini API key",
     )
     gemini_model: str = "gemini-1.5-flash"
+    gemini_json_mode: bool = True  # Schema-constrained JSON verdicts
+    gemini_context_cache_enabled: bool = True
+    gemini_cache_min_tokens: int = 32768  # Gemini's minimum cacheable size
+    # Cached contexts are billed while they live, so the TTL is short and
+    # renewed as the job makes progress (at half-life, between controls)
+    gemini_cache_ttl_seconds: int = 600
+
+    # Gemini rate limiting and retries (per API key)
+    gemini_rate_limit_backend: Literal["redis", "local"] = "redis"
+    gemini_requests_per_minute: int = 60
+    gemini_rate_limit_burst: int = 10
+    gemini_max_concurrency: int = 8
+    gemini_max_retries: int = 5
+    gemini_backoff_base_seconds: float = 1.0
+    gemini_backoff_max_seconds: float = 60.0
+    gemini_circuit_failure_threshold: int = 5
+    gemini_circuit_reset_seconds: float = 30.0
+    # A half-open trial call running longer than this admits another
+    gemini_circuit_trial_timeout_seconds: float = 120.0
+
+    # Blocking LLM requests run on a process-wide thread pool of this size,
+    # which caps in-flight calls per process across all keys and jobs
+    llm_max_concurrent_calls: int = 32
+
+    # Gemini provider pool: extra keys and a cheaper tier for low-risk work
+    gemini_api_keys: list[str] = Field(
+        default=[],
+        description="Additional Gemini API keys; requests are spread across all keys",
+    )
+    gemini_fast_model: str = ""  # e.g. gemini-1.5-flash-8b; empty disables the fast tier
+    gemini_fast_requests_per_minute: int = 0  # 0 uses gemini_requests_per_minute
+    gemini_fast_scan_types: list[str] = Field(
+        default=["quick"],
+        description="Scan types routed to the fast model tier",
+    )
+    gemini_fast_risk_levels: list[str] = Field(
+        default=["low"],
+        description="Control risk levels routed to the fast model tier",
+    )
+    gemini_endpoint_ejection_seconds: float = 300.0
+
+    # Document packing: the shared document segment is packed by tokens
+    # into the smallest context window of the configured models, less a
+    # reserve for the control instructions and the reply. Local token
+    # estimates are calibrated once per job with the API's count-tokens
+    gemini_context_window_tokens: dict[str, int] = Field(
+        default={
+            "gemini-1.5-flash": 1048576,
+            "gemini-1.5-flash-8b": 1048576,
+            "gemini-1.5-pro": 2097152,
+            "gemini-2.0-flash": 1048576,
+        },
+        description="Input token limit by model name",
+    )
+    gemini_default_context_window_tokens: int = 32768  # models not listed above
+    gemini_prompt_reserve_tokens: int = 4096
+    gemini_max_document_tokens: int = 0  # cap on the document segment (0 = fill the window)
+    gemini_chunk_tokens: int = 1024  # chunk size when documents must be trimmed
+    gemini_token_calibration_chars: int = 20000  # sample of each document counted exactly
+
+    # Map-reduce for evidence larger than the token budget: every section is
+    # mapped to findings per control group (cached by section hash), then
+    # each control's verdict is reduced from its findings across sections
+    gemini_map_reduce_enabled: bool = True
+    gemini_map_fast_tier: bool = True  # map on the fast tier when configured
+    gemini_map_chunk_tokens: int = 32768  # section size
+    gemini_map_group_size: int = 10  # controls per map request
+    gemini_map_concurrency: int = 8  # map requests in flight per job
+    gemini_map_cache_ttl_seconds: int = 7 * 24 * 3600
+
+    # Model cascade: every control is first evaluated on the fast tier and
+    # re-evaluated on gemini_model only when the fast verdict is uncertain
+    # (confidence below the threshold, an escalating status, or unparseable)
+    gemini_cascade_enabled: bool = False  # needs gemini_fast_model
+    gemini_cascade_min_confidence: float = 0.7
+    gemini_cascade_escalate_statuses: list[str] = Field(
+        default=["needs_review", "error"],
+        description="Fast-tier verdict statuses re-evaluated on the default model",
+    )
+    gemini_cascade_policies: dict[str, dict[str, Any]] = Field(
+        default={},
+        description=(
+            "Per control category (case-insensitive) overrides of enabled, "
+            "min_confidence, statuses and on_parse_failure"
+        ),
+    )
+
+    # Gemini connections: one gRPC channel per key for the whole process,
+    # pinged while idle and connected when the API or a worker starts
+    gemini_keepalive_seconds: float = 60.0  # 0 disables keep-alive pings
+    gemini_warmup_timeout_seconds: float = 5.0  # 0 skips connecting at startup
+
+    # LLM backend: "stub" runs the pipeline offline for benchmarks and demos
+    llm_backend: Literal["gemini", "stub"] = "gemini"
+    llm_stub_latency_ms: float = 800.0  # median latency per call
+    llm_stub_latency_distribution: Literal["fixed", "uniform", "lognormal"] = "lognormal"
+    llm_stub_latency_sigma: float = 0.5
+    llm_stub_error_rate: float = 0.0  # fraction of calls failing with 503
+    llm_stub_throttle_rate: float = 0.0  # fraction of calls failing with 429
+    llm_stub_seed: int = 0
+
+    # Relevance prefilter: in these scan types, controls whose "Look for"
+    # items score below the threshold against the evidence are answered
+    # locally (not_applicable when nothing matches, otherwise needs_review)
+    # instead of being sent to the LLM
+    relevance_filter_scan_types: list[str] = Field(
+        default=["full"],
+        description="Scan types whose controls are prefiltered (empty disables)",
+    )
+    relevance_min_score: float = 0.2  # fraction of "Look for" items matched
+
+    # Compliance frameworks (defaults to backend/frameworks)
+    frameworks_dir: str = ""
+
+    # Identical evidence runs (same user, documents, framework and scan type)
+    # attach to the in-flight job or clone results this recent (0 = never clone)
+    job_dedup_enabled: bool = True
+    job_dedup_freshness_seconds: int = 3600
+
+    # Fair job scheduler in front of Celery: weighted fair queuing by user
+    # (weights keyed by user ID), with overall and per-user running limits
+    # applied separately to each scan type. The overall limit of the quick
+    # and full lanes is the concurrency of their workers (below); other
+    # lanes use scheduler_max_running_jobs
+    scheduler_enabled: bool = True
+    scheduler_max_running_jobs: int = 8
+    scheduler_max_jobs_per_user: int = 2
+    scheduler_lease_seconds: float = 900.0
+    scheduler_tenant_weights: dict[str, float] = Field(default_factory=dict)
+    # The outbox relay also dispatches this often, so requeued jobs and
+    # jobs behind expired leases start on an otherwise idle system
+    scheduler_dispatch_interval_seconds: float = 5.0
+
+    # Cooperative cancellation: running jobs poll their Redis flag this often
+    # while an LLM call is in flight (and before every control)
+    job_cancel_poll_seconds: float = 1.0
+    job_cancel_flag_ttl_seconds: int = 86400
+
+    # Transactional outbox: new jobs are committed with an outbox row that a
+    # relay publishes (embedded in the API, or python -m worker.outbox_relay)
+    outbox_relay_embedded: bool = True
+    outbox_poll_interval_seconds: float = 0.5
+    outbox_batch_size: int = 100
+    outbox_retry_max_seconds: float = 60.0
+
+    # In-process executor behind POST /jobs/{id}/run, for deployments without
+    # Celery: jobs queue here and run on this many asyncio workers in the API
+    inprocess_executor_enabled: bool = True
+    inprocess_executor_workers: int = 2
+    inprocess_executor_queue_size: int = 32
+    inprocess_executor_shutdown_seconds: float = 30.0
+
+    # Readiness probes (/health/ready); Celery workers are reported but not
+    # required by default because jobs can also run in the API process
+    readiness_cache_ttl_seconds: float = 5.0
+    readiness_probe_timeout_seconds: float = 2.0
+    readiness_required_checks: list[str] = Field(
+        default=["database", "redis", "uploads"],
+        description="Probes that must pass for the instance to report ready",
+    )
+
+    # Run every analysis task of a worker process on one shared event loop
+    # (start the worker with -P threads -c N): jobs then multiplex on a single
+    # loop with one database pool and one set of LLM limits per process
+    worker_shared_event_loop: bool = False
+    # Tasks each scan worker pool runs at once (celery -c in
+    # docker-compose.yml, which reads the same variables); the scheduler
+    # starts no more jobs of each scan type than this
+    worker_quick_concurrency: int = 32
+    worker_full_concurrency: int = 16
+
+    # Prometheus metrics (/metrics on the API, this port on workers; 0 disables)
+    metrics_enabled: bool = True
+    worker_metrics_port: int = 9100
+
+    # OpenTelemetry tracing (exported to an OTLP/HTTP collector or a JSONL file)
+    tracing_enabled: bool = False
+    tracing_exporter: Literal["otlp", "file", "console"] = "otlp"
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_file: str = "traces.jsonl"
+    tracing_sample_ratio: float = 1.0
 
     # Celery
     celery_broker_url: str = ""
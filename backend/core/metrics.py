@@ -0,0 +1,283 @@
+"""
+Prometheus metrics for the API, Celery workers and LLM calls.
+
+Metrics are defined once here and updated from the code paths they
+describe. The API serves them at /metrics. Workers serve them on
+settings.worker_metrics_port. When PROMETHEUS_MULTIPROC_DIR is set
+(required for prefork Celery workers or multi-process uvicorn), values
+from every process are aggregated at scrape time.
+"""
+
+import asyncio
+import os
+import time
+from functools import lru_cache
+
+import redis
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Latency buckets for LLM calls and whole tasks, which run far longer than
+# the default HTTP-oriented buckets
+LONG_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "shieldagent_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+
+CELERY_TASK_DURATION = Histogram(
+    "shieldagent_celery_task_duration_seconds",
+    "Celery task run time",
+    ["task", "state"],
+    buckets=LONG_BUCKETS,
+)
+
+LLM_CALL_DURATION = Histogram(
+    "shieldagent_llm_call_duration_seconds",
+    "analyze_control latency including retries",
+    ["tier", "outcome"],
+    buckets=LONG_BUCKETS,
+)
+LLM_ERRORS = Counter(
+    "shieldagent_llm_errors_total",
+    "analyze_control calls that failed",
+    ["tier", "error"],
+)
+LLM_PARSE_FAILURES = Counter(
+    "shieldagent_llm_parse_failures_total",
+    "LLM responses that could not be parsed as a verdict",
+    ["tier", "control_id"],
+)
+LLM_PARSE_RESULTS = Counter(
+    "shieldagent_llm_parse_results_total",
+    "Verdict parses by method (strict, repaired, failed)",
+    ["tier", "method"],
+)
+LLM_RETRIES = Counter(
+    "shieldagent_llm_retries_total",
+    "Retried LLM requests (throttling and transient errors)",
+    ["tier"],
+)
+LLM_PREFILTERED = Counter(
+    "shieldagent_llm_prefiltered_total",
+    "Controls answered by the relevance prefilter without an LLM call",
+    ["status"],
+)
+LLM_CASCADE_DECISIONS = Counter(
+    "shieldagent_llm_cascade_decisions_total",
+    "Fast-tier verdicts accepted or escalated to the default model, by reason",
+    ["category", "outcome"],
+)
+LLM_CONTEXT_FILL = Histogram(
+    "shieldagent_llm_context_fill_ratio",
+    "Prompt tokens per call as a share of the model's context window",
+    ["tier"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+LLM_MAP_SECTIONS = Counter(
+    "shieldagent_llm_map_sections_total",
+    "Map-step section evaluations by outcome (mapped, cached, error)",
+    ["outcome"],
+)
+LLM_TOKENS = Counter(
+    "shieldagent_llm_tokens_total",
+    "Tokens reported by the LLM usage metadata",
+    ["tier", "direction"],
+)
+
+JOB_DEDUP_HITS = Counter(
+    "shieldagent_job_dedup_hits_total",
+    "Evidence runs served by an identical job instead of new analysis",
+    ["outcome"],
+)
+
+OUTBOX_PUBLISHED = Counter(
+    "shieldagent_outbox_publish_total",
+    "Outbox messages published or failed by the relay",
+    ["topic", "outcome"],
+)
+
+OUTBOX_LAG = Histogram(
+    "shieldagent_outbox_lag_seconds",
+    "Time from committing an outbox message to publishing it",
+)
+
+JOB_EXECUTOR_ACTIVE = Gauge(
+    "shieldagent_inprocess_jobs",
+    "Jobs queued or running on the API's in-process executor",
+)
+
+EXTRACTION_DURATION = Histogram(
+    "shieldagent_document_extraction_seconds",
+    "Document text extraction time",
+    ["file_type"],
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "shieldagent_db_pool_checkouts_total",
+    "Connections checked out of the SQLAlchemy pool",
+)
+DB_POOL_WAIT = Histogram(
+    "shieldagent_db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_IN_USE = Gauge(
+    "shieldagent_db_pool_connections_in_use",
+    "Connections currently checked out of the SQLAlchemy pool",
+    multiprocess_mode="livesum",
+)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: AsyncEngine) -> AsyncEngine:
+    """
+    Count checkouts and track in-use connections for an engine's pool.
+
+    Pair with poolclass=InstrumentedAsyncQueuePool to also record waits.
+    """
+    pool = engine.sync_engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc()
+        DB_POOL_IN_USE.inc()
+
+    @event.listens_for(pool, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        DB_POOL_IN_USE.dec()
+
+    return engine
+
+
+@lru_cache
+def broker_client(broker_url: str) -> redis.Redis:
+    """Redis client for the Celery broker, which may differ from settings.redis_url."""
+    return redis.from_url(broker_url, socket_connect_timeout=1.0, socket_timeout=1.0)
+
+
+class CeleryQueueCollector(Collector):
+    """
+    Reports broker queue lengths at scrape time (Redis LLEN per queue).
+
+    Collection blocks on the broker, so the API runs the exposition in a
+    thread (see metrics_endpoint).
+    """
+
+    def collect(self):
+        gauge = GaugeMetricFamily(
+            "shieldagent_celery_queue_length",
+            "Messages waiting in each Celery queue",
+            labels=["queue"],
+        )
+        try:
+            from worker.celery_app import celery_app
+
+            queues = {celery_app.conf.task_default_queue}
+            queues.update(q.name for q in celery_app.conf.task_queues or ())
+            client = broker_client(celery_app.conf.broker_url)
+            pipe = client.pipeline(transaction=False)
+            for queue in sorted(queues):
+                pipe.llen(queue)
+            for queue, length in zip(sorted(queues), pipe.execute()):
+                gauge.add_metric([queue], length)
+        except Exception as e:
+            logger.debug("Queue length unavailable", error=str(e))
+        yield gauge
+
+
+def is_multiprocess() -> bool:
+    """Whether metrics are shared across processes through files."""
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def build_registry() -> CollectorRegistry:
+    """Registry exposing this process's metrics, or every process's in multiprocess mode."""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+@lru_cache
+def get_api_registry() -> CollectorRegistry:
+    """Registry served by the API's /metrics endpoint, including queue lengths."""
+    registry = build_registry()
+    registry.register(CeleryQueueCollector())
+    return registry
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Serve metrics in the Prometheus text format."""
+    # Collectors may block (queue lengths come from the broker)
+    body = await asyncio.to_thread(generate_latest, get_api_registry())
+    return Response(body, media_type=CONTENT_TYPE_LATEST)
+
+
+class PrometheusMiddleware:
+    """
+    ASGI middleware recording request latency by route template.
+
+    Labels use the matched route's path (e.g. /api/jobs/{job_id}) rather than
+    the raw URL, keeping label cardinality bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code),
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,224 @@
+"""
+Dependency probes behind the /health/ready endpoint.
+
+Each probe exercises a real dependency: a SELECT 1 through the database
+pool, a Redis PING, a Celery worker ping and a test write to the upload
+directory. Probes run concurrently under a timeout, and their results are
+cached for a short TTL. Load balancers polling several times a second then
+cost at most one round of probes per TTL.
+"""
+
+import asyncio
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable
+
+import redis
+from sqlalchemy import text
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# A probe returns an optional detail string and raises on failure
+Probe = Callable[[], Awaitable[str | None]]
+
+
+@dataclass
+class ProbeResult:
+    """Outcome of one dependency probe."""
+
+    name: str
+    ok: bool
+    latency_ms: float
+    required: bool
+    detail: str | None = None
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        result = {
+            "status": "ok" if self.ok else "error",
+            "latency_ms": self.latency_ms,
+            "required": self.required,
+        }
+        if self.detail:
+            result["detail"] = self.detail
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+async def probe_database() -> str | None:
+    """Run SELECT 1 on a connection checked out of the application pool."""
+    from db import engine
+
+    # Runs on the event loop, so the checker's timeout cancels it outright
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    status = getattr(engine.pool, "status", None)
+    return status() if status else None
+
+
+@lru_cache
+def _redis_probe_client(timeout: float) -> redis.Redis:
+    return redis.from_url(
+        settings.redis_url,
+        socket_connect_timeout=timeout,
+        socket_timeout=timeout,
+    )
+
+
+async def probe_redis() -> str | None:
+    """PING Redis with socket timeouts within the probe timeout."""
+    # The ping runs in a thread, which the checker's timeout cannot stop
+    client = _redis_probe_client(settings.readiness_probe_timeout_seconds)
+    await asyncio.to_thread(client.ping)
+    return None
+
+
+def _ping_workers(timeout: float) -> list:
+    from worker.celery_app import celery_app
+
+    # Bound the broker connection as well as the wait for replies
+    with celery_app.connection_for_write(
+        connect_timeout=timeout,
+        transport_options={"socket_timeout": timeout, "socket_connect_timeout": timeout},
+    ) as connection:
+        return celery_app.control.ping(timeout=timeout, connection=connection)
+
+
+async def probe_celery_workers() -> str | None:
+    """Ping Celery workers over the broker and require at least one reply."""
+    replies = await asyncio.to_thread(
+        _ping_workers, settings.readiness_probe_timeout_seconds / 2
+    )
+    if not replies:
+        raise RuntimeError("No Celery workers responded")
+    return f"{len(replies)} worker(s) responding"
+
+
+def _write_test_file(directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".ready-") as f:
+        f.write(b"ok")
+        f.flush()
+
+
+async def probe_upload_dir() -> str | None:
+    """Create and remove a file in the upload directory."""
+    await asyncio.to_thread(_write_test_file, Path(settings.upload_dir))
+    return None
+
+
+class ReadinessChecker:
+    """
+    Runs dependency probes and caches the combined report.
+
+    The service is ready when every required probe passes; other probes are
+    reported but do not take the instance out of rotation.
+    """
+
+    def __init__(
+        self,
+        probes: dict[str, Probe],
+        required: Iterable[str],
+        ttl_seconds: float = 5.0,
+        timeout_seconds: float = 2.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize the checker.
+
+        Args:
+            probes: Probe coroutine functions by check name.
+            required: Names of the checks that must pass for readiness.
+            ttl_seconds: How long a report is served from cache.
+            timeout_seconds: Per-probe timeout; a slow dependency counts as down.
+            clock: Monotonic time source (injectable for tests).
+        """
+        self.probes = probes
+        self.required = set(required)
+        self.ttl_seconds = ttl_seconds
+        self.timeout_seconds = timeout_seconds
+        self._clock = clock
+        self._report: dict | None = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> dict:
+        """
+        Get the readiness report, probing dependencies if the cache expired.
+
+        Concurrent callers share a single round of probes.
+
+        Returns:
+            Report with overall status, per-check results and whether it was cached.
+        """
+        if self._report is not None and self._clock() < self._expires_at:
+            return {**self._report, "cached": True}
+
+        async with self._lock:
+            if self._report is not None and self._clock() < self._expires_at:
+                return {**self._report, "cached": True}
+
+            results = await asyncio.gather(*(
+                self._run_probe(name, probe) for name, probe in self.probes.items()
+            ))
+            ready = all(r.ok for r in results if r.required)
+            self._report = {
+                "status": "ready" if ready else "not_ready",
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "checks": {r.name: r.to_dict() for r in results},
+            }
+            self._expires_at = self._clock() + self.ttl_seconds
+
+            if not ready:
+                logger.warning(
+                    "Readiness check failed",
+                    failed=[r.name for r in results if r.required and not r.ok],
+                )
+
+        return {**self._report, "cached": False}
+
+    async def _run_probe(self, name: str, probe: Probe) -> ProbeResult:
+        required = name in self.required
+        started = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(probe(), timeout=self.timeout_seconds)
+            ok, error = True, None
+        except asyncio.TimeoutError:
+            detail, ok = None, False
+            error = f"Timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            detail, ok = None, False
+            error = f"{type(e).__name__}: {e}"
+
+        return ProbeResult(
+            name=name,
+            ok=ok,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            required=required,
+            detail=detail,
+            error=error,
+        )
+
+
+@lru_cache
+def get_readiness_checker() -> ReadinessChecker:
+    """Get the process-wide readiness checker configured from settings."""
+    return ReadinessChecker(
+        probes={
+            "database": probe_database,
+            "redis": probe_redis,
+            "celery": probe_celery_workers,
+            "uploads": probe_upload_dir,
+        },
+        required=settings.readiness_required_checks,
+        ttl_seconds=settings.readiness_cache_ttl_seconds,
+        timeout_seconds=settings.readiness_probe_timeout_seconds,
+    )
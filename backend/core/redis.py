@@ -0,0 +1,28 @@
+"""
+Shared Redis client for coordination state (rate limits, flags, queues).
+"""
+
+from functools import lru_cache
+
+import redis
+
+from core.config import settings
+
+
+@lru_cache
+def get_redis_client() -> redis.Redis:
+    """
+    Get the process-wide Redis client.
+
+    The client is thread-safe and pools its connections; short timeouts keep
+    callers responsive when Redis is unavailable.
+
+    Returns:
+        A synchronous Redis client bound to settings.redis_url.
+    """
+    return redis.from_url(
+        settings.redis_url,
+        socket_connect_timeout=1.0,
+        socket_timeout=1.0,
+        health_check_interval=30,
+    )
@@ -0,0 +1,138 @@
+"""
+OpenTelemetry tracing for the API, workers, LLM calls and database.
+
+Tracing is off unless settings.tracing_enabled is set. Spans are exported
+to an OTLP/HTTP collector, or written as JSON lines to a local file for
+ad-hoc flame charts. Code paths use the module-level `tracer`. While no
+provider is configured, the OpenTelemetry API turns its spans into no-ops.
+"""
+
+import threading
+import time
+from typing import Any, Sequence
+
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+tracer = trace.get_tracer("shieldagent")
+
+# Task message header holding the time a job was enqueued
+ENQUEUED_AT_HEADER = "shieldagent_enqueued_at_ns"
+
+_provider: TracerProvider | None = None
+_provider_lock = threading.Lock()
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one OTLP-style JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        # indent=None keeps each span on one line; the SDK annotates it as int
+        lines = "".join(
+            span.to_json(indent=None) + "\n" for span in spans  # type: ignore[arg-type]
+        )
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning("Failed to write spans", path=self.path, error=str(e))
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _build_exporter() -> SpanExporter:
+    if settings.tracing_exporter == "file":
+        return JsonLinesSpanExporter(settings.tracing_file)
+    if settings.tracing_exporter == "console":
+        return ConsoleSpanExporter()
+
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+
+
+def setup_tracing(service_name: str, exporter: SpanExporter | None = None) -> TracerProvider:
+    """
+    Install the process-wide tracer provider (once per process).
+
+    Args:
+        service_name: Reported as service.name (e.g. shieldagent-api).
+        exporter: Exporter override; defaults to settings.tracing_exporter.
+
+    Returns:
+        The active TracerProvider.
+    """
+    global _provider
+    if _provider is not None:
+        return _provider
+
+    with _provider_lock:
+        if _provider is None:
+            provider = TracerProvider(
+                resource=Resource.create({SERVICE_NAME: service_name}),
+                sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+            )
+            provider.add_span_processor(BatchSpanProcessor(exporter or _build_exporter()))
+            trace.set_tracer_provider(provider)
+            _provider = provider
+            logger.info(
+                "Tracing enabled",
+                service=service_name,
+                exporter=settings.tracing_exporter,
+            )
+    return _provider
+
+
+def shutdown_tracing() -> None:
+    """Flush and stop span export (call before the process exits)."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def capture_trace_headers() -> dict[str, Any]:
+    """Current trace context and time, as headers for a task published later."""
+    headers: dict[str, Any] = {}
+    if settings.tracing_enabled:
+        propagate.inject(headers)
+        headers[ENQUEUED_AT_HEADER] = time.time_ns()
+    return headers
+
+
+def instrument_app(app) -> None:
+    """Trace every FastAPI request except metrics and health probes."""
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics,health")
+
+
+def trace_engine(engine) -> None:
+    """Emit a span per SQL statement executed through an async engine."""
+    if not settings.tracing_enabled:
+        return
+    from opentelemetry import metrics
+    from opentelemetry.instrumentation.sqlalchemy.engine import EngineTracer
+
+    # Attach directly rather than through SQLAlchemyInstrumentor, which only
+    # instruments once per process while workers create engines per task
+    connections_usage = metrics.get_meter("shieldagent").create_up_down_counter(
+        "db.client.connections.usage", unit="connections"
+    )
+    EngineTracer(tracer, engine.sync_engine, connections_usage)
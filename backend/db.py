@@ -11,9 +11,11 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import DeclarativeBase
 
 from core.config import settings
+from core.metrics import InstrumentedAsyncQueuePool, instrument_engine
+from core.tracing import trace_engine
 
 
 class GUID(TypeDecorator):
@@ -57,7 +59,10 @@ engine = create_async_engine(
     pool_pre_ping=True,
     pool_size=5,
     max_overflow=10,
+    poolclass=InstrumentedAsyncQueuePool,
 )
+instrument_engine(engine)
+trace_engine(engine)
 
 # Session factory
 async_session_maker = async_sessionmaker(
@@ -68,8 +73,8 @@ async_session_maker = async_sessionmaker(
     autoflush=False,
 )
 
-# Base class for all models
-Base = declarative_base()
+class Base(DeclarativeBase):
+    """Base class for all models."""
 
 
 async def init_db() -> None:
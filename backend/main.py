@@ -4,6 +4,7 @@ ShieldAgent - SOC 2 Compliance Automation Platform
 Main FastAPI application entry point.
 """
 
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
@@ -13,7 +14,12 @@ from fastapi.middleware.cors import CORSMiddleware
 from api import api_router
 from core.config import settings
 from core.logging import setup_logging, get_logger
+from core.metrics import PrometheusMiddleware, metrics_endpoint
+from core.tracing import instrument_app, setup_tracing, shutdown_tracing
 from db import init_db, close_db
+from services.job_executor import get_job_executor
+from services.outbox import get_outbox_relay
+from services.provider_pool import init_provider_pool
 
 # Setup structured logging
 setup_logging()
@@ -25,7 +31,8 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     Application lifespan manager for startup/shutdown events.
     
-    Handles database initialization and cleanup.
+    Handles database initialization, the outbox relay, the in-process job
+    executor (with warm LLM clients) and cleanup.
     """
     # Startup
     logger.info(
@@ -39,11 +46,20 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         await init_db()
         logger.info("Database initialized")
     
+    if settings.outbox_relay_embedded:
+        get_outbox_relay().start()
+    if settings.inprocess_executor_enabled:
+        await asyncio.to_thread(init_provider_pool)
+        get_job_executor().start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down ShieldAgent API")
+    await get_outbox_relay().stop()
+    await get_job_executor().stop(settings.inprocess_executor_shutdown_seconds)
     await close_db()
+    shutdown_tracing()
 
 
 def create_app() -> FastAPI:
@@ -75,9 +91,19 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Request latency histograms by route
+    if settings.metrics_enabled:
+        app.add_middleware(PrometheusMiddleware)
+        app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    
     # Include API routes
     app.include_router(api_router, prefix=settings.api_prefix)
     
+    # Distributed tracing (API -> Celery -> Gemini -> DB)
+    if settings.tracing_enabled:
+        setup_tracing("shieldagent-api")
+        instrument_app(app)
+    
     return app
 
 
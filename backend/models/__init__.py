@@ -5,6 +5,7 @@ from models.document import Document
 from models.job import Job
 from models.control import Control
 from models.evidence import EvidenceItem, Gap
+from models.outbox import OutboxMessage
 
 __all__ = [
     "User",
@@ -13,4 +14,5 @@ __all__ = [
     "Control",
     "EvidenceItem",
     "Gap",
+    "OutboxMessage",
 ]
@@ -5,12 +5,20 @@ Job model for compliance analysis tasks.
 import uuid
 from datetime import datetime
 from enum import Enum
+from typing import TYPE_CHECKING
 
-from sqlalchemy import String, DateTime, Integer, Text, ForeignKey, func
+from sqlalchemy import (
+    Column, String, DateTime, Integer, Text, ForeignKey, Index, Table, func, JSON, text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db import Base, GUID
 
+if TYPE_CHECKING:
+    from models.document import Document
+    from models.evidence import EvidenceItem, Gap
+    from models.user import User
+
 
 class JobStatus(str, Enum):
     """Enum for job execution status."""
@@ -21,10 +29,44 @@ class JobStatus(str, Enum):
     CANCELLED = "CANCELLED"
 
 
+# Documents each job analyzes. The primary key serves job -> documents
+# lookups; the document_id index serves "which jobs used this document".
+job_documents = Table(
+    "job_documents",
+    Base.metadata,
+    Column(
+        "job_id",
+        GUID(),
+        ForeignKey("jobs.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column(
+        "document_id",
+        GUID(),
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    ),
+)
+
+
+# Jobs that are queued or executing; at most one per de-duplication key
+ACTIVE_JOB_CONDITION = text("status IN ('PENDING', 'RUNNING')")
+
+
 class Job(Base):
     """Compliance analysis job model."""
 
     __tablename__ = "jobs"
+    __table_args__ = (
+        Index(
+            "ix_jobs_active_dedup_key",
+            "dedup_key",
+            unique=True,
+            postgresql_where=ACTIVE_JOB_CONDITION,
+            sqlite_where=ACTIVE_JOB_CONDITION,
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         GUID(),
@@ -67,6 +109,20 @@ class Job(Base):
         Text,
         nullable=True,
     )
+    dedup_key: Mapped[str | None] = mapped_column(
+        String(64),
+        nullable=True,
+        index=True,
+    )  # Hash of user, framework, scan type and document contents
+    source_job_id: Mapped[uuid.UUID | None] = mapped_column(
+        GUID(),
+        ForeignKey("jobs.id", ondelete="SET NULL"),
+        nullable=True,
+    )  # Job whose results were cloned into this one
+    metrics: Mapped[dict | None] = mapped_column(
+        JSON,
+        nullable=True,
+    )  # Per-document and per-control performance telemetry
     celery_task_id: Mapped[str | None] = mapped_column(
         String(255),
         nullable=True,
@@ -100,6 +156,10 @@ class Job(Base):
         back_populates="job",
         cascade="all, delete-orphan",
     )
+    documents: Mapped[list["Document"]] = relationship(
+        "Document",
+        secondary=job_documents,
+    )
 
     def __repr__(self) -> str:
         return f"<Job(id={self.id}, status={self.status})>"
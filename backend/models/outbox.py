@@ -0,0 +1,54 @@
+"""
+Outbox model for messages committed alongside the rows they describe.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import String, DateTime, Integer, Text, func, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+
+from db import Base, GUID
+
+
+class OutboxMessage(Base):
+    """A message waiting to be published by the outbox relay."""
+
+    __tablename__ = "outbox_messages"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        GUID(),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    topic: Mapped[str] = mapped_column(
+        String(100),
+        nullable=False,
+    )
+    payload: Mapped[dict] = mapped_column(
+        JSON,
+        nullable=False,
+    )
+    attempts: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+    )
+    last_error: Mapped[str | None] = mapped_column(
+        Text,
+        nullable=True,
+    )
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        index=True,
+    )  # Not published before this time (backoff after failed attempts)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    def __repr__(self) -> str:
+        return f"<OutboxMessage(id={self.id}, topic={self.topic})>"
@@ -34,6 +34,7 @@ class EvidenceListResponse(BaseModel):
     passing: int
     failing: int
     needs_review: int
+    not_applicable: int = 0
 
 
 class GapResponse(BaseModel):
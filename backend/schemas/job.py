@@ -14,7 +14,7 @@ class JobCreate(BaseModel):
 
     framework: str = Field(
         default="soc2",
-        description="Compliance framework to check against",
+        description="Compliance framework to check against (soc2, iso27001, hipaa)",
     )
     document_ids: list[UUID] = Field(
         ...,
@@ -23,7 +23,10 @@ class JobCreate(BaseModel):
     )
     scan_type: Literal["quick", "full"] = Field(
         default="quick",
-        description="Scan type: 'quick' for 8 key controls, 'full' for all 51 controls",
+        description=(
+            "Scan type: 'quick' for the framework pack's quick-scan controls, "
+            "'full' for all framework controls"
+        ),
     )
 
 
@@ -42,6 +45,18 @@ class JobResponse(BaseModel):
     started_at: datetime | None
     completed_at: datetime | None
     created_at: datetime
+    queue_position: int | None = Field(
+        default=None,
+        description="Approximate place in the scheduler queue while the job waits to start",
+    )
+    source_job_id: UUID | None = Field(
+        default=None,
+        description="Job whose results were copied into this one instead of re-analyzing",
+    )
+    deduplicated: bool = Field(
+        default=False,
+        description="True when an identical in-flight or recent job answered the request",
+    )
 
 
 class JobListResponse(BaseModel):
@@ -57,3 +72,89 @@ class JobStatusUpdate(BaseModel):
     status: str
     progress: int | None = None
     error_message: str | None = None
+
+
+class DocumentMetrics(BaseModel):
+    """Text extraction telemetry for one document."""
+
+    document_id: UUID | None = None
+    filename: str
+    file_type: str
+    chars: int
+    extraction_ms: float
+    error: str | None = None
+
+
+class ControlMetrics(BaseModel):
+    """LLM telemetry for one evaluated control."""
+
+    control_id: str
+    status: str
+    tier: str | None = None
+    latency_ms: float | None = None
+    retries: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    prompt_tokens_estimated: int = 0
+    context_fill: float | None = None
+    cache_hit: bool = False
+    parse_failed: bool = False
+    parse_repaired: bool = False
+    prefiltered: bool = False
+    escalated: bool = False
+    escalation_reason: str | None = None
+
+
+class PackingMetrics(BaseModel):
+    """How the job's documents were packed into the prompt token budget."""
+
+    tokens: int
+    budget_tokens: int
+    fill_ratio: float
+    chunks_total: int
+    chunks_packed: int
+
+
+class MapReduceMetrics(BaseModel):
+    """Map step of a job whose documents did not fit the token budget."""
+
+    sections: int
+    groups: int
+    calls: int
+    cache_hits: int
+    errors: int
+    latency_ms: float
+    prompt_tokens: int
+    response_tokens: int
+
+
+class JobMetricsTotals(BaseModel):
+    """Aggregates over a job's documents and controls."""
+
+    extraction_ms: float = 0.0
+    llm_latency_ms: float = 0.0
+    max_control_latency_ms: float = 0.0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    parse_failures: int = 0
+    prefiltered: int = 0
+    escalations: int = 0
+    errors: int = 0
+    db_write_ms: float = 0.0
+
+
+class JobMetricsResponse(BaseModel):
+    """Schema for per-job performance telemetry."""
+
+    job_id: UUID
+    status: str
+    available: bool = Field(
+        description="False until the job has completed and recorded metrics",
+    )
+    documents: list[DocumentMetrics] = []
+    controls: list[ControlMetrics] = []
+    packing: PackingMetrics | None = None
+    map_reduce: MapReduceMetrics | None = None
+    totals: JobMetricsTotals = JobMetricsTotals()
@@ -0,0 +1,407 @@
+"""
+Compliance Framework Registry for ShieldAgent.
+
+Loads versioned control packs (JSON, or YAML when PyYAML is installed) from
+the frameworks directory. Each pack is parsed and compiled on first use into
+an indexed catalog with a precompiled prompt template per control, and the
+compiled catalog is memoized for the lifetime of the process.
+"""
+
+import json
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from core.config import settings
+
+
+PACK_SUFFIXES = (".json", ".yaml", ".yml")
+
+DEFAULT_FRAMEWORKS_DIR = Path(__file__).resolve().parent.parent / "frameworks"
+
+REQUIRED_PACK_FIELDS = ("framework_id", "name", "version", "sections")
+REQUIRED_CONTROL_FIELDS = ("control_id", "category", "title", "description")
+
+RESPONSE_FORMAT = """IMPORTANT: Respond ONLY with valid JSON in this exact format:
+{
+    "status": "pass" | "fail" | "needs_review",
+    "confidence": 0.0 to 1.0,
+    "summary": "Brief explanation of your findings",
+    "evidence_quote": "Direct quote from document if found, or null",
+    "gaps": ["List of identified gaps or missing elements"]
+}"""
+
+
+class FrameworkNotFoundError(ValueError):
+    """Raised when no pack exists for the requested framework."""
+
+
+class FrameworkPackError(ValueError):
+    """Raised when a framework pack is malformed."""
+
+
+class PromptTemplate(NamedTuple):
+    """
+    Precompiled prompt split around the document section.
+
+    The prefix only depends on the framework, so prefix + documents is the
+    same for every control in a job; everything control-specific lives in
+    the suffix.
+    """
+    prefix: str
+    suffix: str
+
+    def render(self, documents: str) -> str:
+        """Build the full prompt for the given document text."""
+        return f"{self.prefix}{documents}{self.suffix}"
+
+
+def normalize_framework_id(framework: str) -> str:
+    """Normalize user-supplied framework names ("ISO-27001" -> "iso27001")."""
+    return "".join(ch for ch in framework.lower() if ch.isalnum())
+
+
+def build_check_prompt(control: dict) -> str:
+    """Build the analysis instructions for a control from its pack entry."""
+    if control.get("check_prompt"):
+        return control["check_prompt"]
+
+    look_for = "\n".join(f"- {item}" for item in control.get("look_for", []))
+    return (
+        f"Analyze for evidence of {control['objective']}.\n"
+        f"Look for:\n{look_for}\n\n"
+        "Provide JSON response with: status, confidence, summary, evidence_quote, gaps"
+    )
+
+
+def build_document_prefix(expert_role: str) -> str:
+    """Build the framework-level preamble that precedes the documents."""
+    return f"""You are {expert_role} analyzing documents for evidence of security controls.
+
+DOCUMENTS TO ANALYZE:
+"""
+
+
+def compile_prompt_template(control: dict, expert_role: str) -> PromptTemplate:
+    """Compile the static parts of a control's analysis prompt."""
+    suffix = f"""
+
+CONTROL BEING EVALUATED:
+- Control ID: {control['control_id']}
+- Category: {control['category']}
+- Title: {control['title']}
+- Description: {control['description']}
+
+ANALYSIS INSTRUCTIONS:
+{control['check_prompt']}
+
+{RESPONSE_FORMAT}"""
+    return PromptTemplate(prefix=build_document_prefix(expert_role), suffix=suffix)
+
+
+@dataclass
+class FrameworkCatalog:
+    """Compiled, indexed view of a single framework pack."""
+    framework_id: str
+    name: str
+    short_name: str
+    version: str
+    expert_role: str
+    description: str
+    document_prefix: str
+    controls: list[dict]
+    sections: list[dict]
+    scan_profiles: dict[str, list[dict]]
+    _by_id: dict[str, dict] = field(default_factory=dict, repr=False)
+    _by_category: dict[str, list[dict]] = field(default_factory=dict, repr=False)
+    _by_section: dict[str, list[dict]] = field(default_factory=dict, repr=False)
+    _templates: dict[str, PromptTemplate] = field(default_factory=dict, repr=False)
+
+    def get_controls(self, scan_type: str = "full") -> list[dict]:
+        """Get the controls evaluated by a scan profile ("full" means all)."""
+        if scan_type == "full":
+            return list(self.controls)
+        return list(self.scan_profiles.get(scan_type, self.controls))
+
+    def control_count(self, scan_type: str = "full") -> int:
+        """Number of controls evaluated by a scan profile."""
+        if scan_type == "full":
+            return len(self.controls)
+        return len(self.scan_profiles.get(scan_type, self.controls))
+
+    def get_control(self, control_id: str) -> dict | None:
+        """Look up a control by ID (case-insensitive)."""
+        return self._by_id.get(control_id.upper())
+
+    def get_controls_by_category(self, category: str) -> list[dict]:
+        """Get controls filtered by category (case-insensitive)."""
+        return list(self._by_category.get(category.lower(), []))
+
+    def get_section_controls(self, section_id: str) -> list[dict]:
+        """Get controls belonging to a pack section (e.g. "CC" or "A.8")."""
+        return list(self._by_section.get(section_id, []))
+
+    def get_categories(self) -> list[dict]:
+        """Get list of control categories with counts."""
+        return [
+            {
+                "name": controls[0]["category"],
+                "count": len(controls),
+                "controls": [c["control_id"] for c in controls],
+            }
+            for controls in self._by_category.values()
+        ]
+
+    def get_prompt_template(self, control: dict) -> PromptTemplate:
+        """Get the precompiled prompt for a control, compiling ad-hoc controls."""
+        key = control["control_id"].upper()
+        if self._by_id.get(key) is control:
+            return self._templates[key]
+        return compile_prompt_template(control, self.expert_role)
+
+    def summary(self) -> dict:
+        """Summary statistics for the framework."""
+        return {
+            "framework": self.framework_id,
+            "version": self.version,
+            "total_controls": len(self.controls),
+            "categories": {
+                section["name"]: len(self._by_section[section["id"]])
+                for section in self.sections
+            },
+        }
+
+    def info(self) -> dict:
+        """Descriptive metadata for listings."""
+        return {
+            "framework_id": self.framework_id,
+            "name": self.name,
+            "short_name": self.short_name,
+            "version": self.version,
+            "description": self.description,
+            "total_controls": len(self.controls),
+            "scan_profiles": {
+                "full": len(self.controls),
+                **{name: len(ctrls) for name, ctrls in self.scan_profiles.items()},
+            },
+        }
+
+
+def _load_pack_file(path: Path) -> dict[str, Any]:
+    """Parse a pack file from disk."""
+    if path.suffix == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    try:
+        import yaml
+    except ImportError:
+        raise ImportError(
+            "PyYAML required for YAML framework packs. Install with: pip install PyYAML"
+        )
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def compile_pack(pack: dict[str, Any]) -> FrameworkCatalog:
+    """
+    Validate a parsed pack and compile it into an indexed catalog.
+
+    Args:
+        pack: Parsed pack contents.
+
+    Returns:
+        The compiled FrameworkCatalog.
+
+    Raises:
+        FrameworkPackError: If required fields are missing or IDs collide.
+    """
+    missing = [f for f in REQUIRED_PACK_FIELDS if f not in pack]
+    if missing:
+        raise FrameworkPackError(f"Framework pack missing fields: {', '.join(missing)}")
+
+    framework_id = normalize_framework_id(pack["framework_id"])
+    expert_role = pack.get("expert_role", f"a {pack['name']} compliance expert")
+
+    controls: list[dict] = []
+    by_id: dict[str, dict] = {}
+    by_category: dict[str, list[dict]] = {}
+    by_section: dict[str, list[dict]] = {}
+    templates: dict[str, PromptTemplate] = {}
+
+    for section in pack["sections"]:
+        section_controls = by_section.setdefault(section["id"], [])
+        for entry in section.get("controls", []):
+            missing = [f for f in REQUIRED_CONTROL_FIELDS if f not in entry]
+            if missing or not (entry.get("check_prompt") or entry.get("objective")):
+                raise FrameworkPackError(
+                    f"Control {entry.get('control_id', '?')} in {framework_id} "
+                    f"is missing fields: {', '.join(missing) or 'objective'}"
+                )
+
+            key = entry["control_id"].upper()
+            if key in by_id:
+                raise FrameworkPackError(
+                    f"Duplicate control ID {entry['control_id']} in {framework_id}"
+                )
+
+            control = {
+                "control_id": entry["control_id"],
+                "category": entry["category"],
+                "title": entry["title"],
+                "description": entry["description"],
+                "check_prompt": build_check_prompt(entry),
+                "section": section["id"],
+                "look_for": list(entry.get("look_for", [])),
+                "remediation": entry.get("remediation"),
+                "risk": entry.get("risk", "medium"),
+            }
+
+            controls.append(control)
+            by_id[key] = control
+            by_category.setdefault(control["category"].lower(), []).append(control)
+            section_controls.append(control)
+            templates[key] = compile_prompt_template(control, expert_role)
+
+    scan_profiles: dict[str, list[dict]] = {}
+    for profile, control_ids in pack.get("scan_profiles", {}).items():
+        unknown = [cid for cid in control_ids if cid.upper() not in by_id]
+        if unknown:
+            raise FrameworkPackError(
+                f"Scan profile '{profile}' in {framework_id} references "
+                f"unknown controls: {', '.join(unknown)}"
+            )
+        scan_profiles[profile] = [by_id[cid.upper()] for cid in control_ids]
+
+    return FrameworkCatalog(
+        framework_id=framework_id,
+        name=pack["name"],
+        short_name=pack.get("short_name", pack["name"]),
+        version=str(pack["version"]),
+        expert_role=expert_role,
+        description=pack.get("description", ""),
+        document_prefix=build_document_prefix(expert_role),
+        controls=controls,
+        sections=[{"id": s["id"], "name": s["name"]} for s in pack["sections"]],
+        scan_profiles=scan_profiles,
+        _by_id=by_id,
+        _by_category=by_category,
+        _by_section=by_section,
+        _templates=templates,
+    )
+
+
+class FrameworkRegistry:
+    """
+    Discovers framework packs on disk and memoizes their compiled catalogs.
+
+    Packs are keyed by the framework_id they declare, not by file name.
+    Discovery parses each pack once for its ID and keeps the parsed pack
+    until it is compiled on first request, so no pack is read twice and
+    adding large packs does not affect per-job setup.
+    """
+
+    def __init__(self, packs_dir: str | Path | None = None) -> None:
+        """
+        Initialize the registry.
+
+        Args:
+            packs_dir: Directory containing .json/.yaml packs.
+        """
+        self.packs_dir = Path(packs_dir) if packs_dir else DEFAULT_FRAMEWORKS_DIR
+        self._paths: dict[str, Path] | None = None
+        self._parsed: dict[str, dict[str, Any]] = {}
+        self._catalogs: dict[str, FrameworkCatalog] = {}
+        self._lock = threading.Lock()
+
+    def _discover(self) -> dict[str, Path]:
+        """
+        Map framework IDs to pack files (cached after the first scan).
+
+        Callers must hold the lock, so concurrent first calls scan once.
+
+        Raises:
+            FrameworkPackError: If a pack declares no framework_id, or two
+                packs declare the same one.
+        """
+        if self._paths is None:
+            paths: dict[str, Path] = {}
+            parsed: dict[str, dict[str, Any]] = {}
+            if self.packs_dir.is_dir():
+                for path in sorted(self.packs_dir.iterdir()):
+                    if path.suffix not in PACK_SUFFIXES:
+                        continue
+                    pack = _load_pack_file(path) or {}
+                    declared = pack.get("framework_id")
+                    if not declared:
+                        raise FrameworkPackError(f"Framework pack {path.name} has no framework_id")
+                    framework_id = normalize_framework_id(declared)
+                    if framework_id in paths:
+                        raise FrameworkPackError(
+                            f"Framework {framework_id} is defined by both "
+                            f"{paths[framework_id].name} and {path.name}"
+                        )
+                    paths[framework_id] = path
+                    parsed[framework_id] = pack
+            self._parsed = parsed
+            self._paths = paths
+        return self._paths
+
+    def available_frameworks(self) -> list[str]:
+        """IDs of all frameworks with a pack on disk."""
+        with self._lock:
+            return list(self._discover())
+
+    def has_framework(self, framework: str) -> bool:
+        """Check whether a pack exists for a framework."""
+        with self._lock:
+            return normalize_framework_id(framework) in self._discover()
+
+    def get(self, framework: str) -> FrameworkCatalog:
+        """
+        Get the compiled catalog for a framework, compiling it on first use.
+
+        Args:
+            framework: Framework ID or name (e.g. "soc2", "ISO-27001").
+
+        Returns:
+            The memoized FrameworkCatalog.
+
+        Raises:
+            FrameworkNotFoundError: If no pack exists for the framework.
+        """
+        framework_id = normalize_framework_id(framework)
+        catalog = self._catalogs.get(framework_id)
+        if catalog is not None:
+            return catalog
+
+        with self._lock:
+            catalog = self._catalogs.get(framework_id)
+            if catalog is None:
+                if framework_id not in self._discover():
+                    raise FrameworkNotFoundError(f"Unknown framework: {framework}")
+                catalog = compile_pack(self._parsed[framework_id])
+                self._catalogs[framework_id] = catalog
+                # The catalog supersedes the parsed pack
+                del self._parsed[framework_id]
+        return catalog
+
+    def clear(self) -> None:
+        """Drop memoized catalogs and rescan the packs directory on next use."""
+        with self._lock:
+            self._paths = None
+            self._parsed = {}
+            self._catalogs.clear()
+
+
+@lru_cache
+def get_framework_registry() -> FrameworkRegistry:
+    """Get the process-wide framework registry."""
+    return FrameworkRegistry(settings.frameworks_dir or None)
+
+
+def get_framework(framework: str = "soc2") -> FrameworkCatalog:
+    """Get the compiled catalog for a framework from the global registry."""
+    return get_framework_registry().get(framework)
@@ -1,23 +1,72 @@
 """
-Gemini AI Service for SOC 2 compliance document analysis.
-Uses Google's Gemini API to analyze documents against compliance controls.
+Gemini AI Service for compliance document analysis.
+Uses Google's Gemini API to analyze documents against compliance controls
+from any registered framework (SOC 2, ISO 27001, HIPAA).
 """
 
+import asyncio
+import contextlib
 import json
-import re
-from typing import Any
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, TypeVar
 from pathlib import Path
 
 import google.generativeai as genai
+from google.generativeai import caching
+from opentelemetry import trace
 
 from core.config import settings
-from services.soc2_controls import (
-    get_all_controls,
-    get_quick_scan_controls,
-    get_control_by_id,
-    get_control_categories,
-    CONTROL_SUMMARY,
+from core.logging import get_logger
+from core.metrics import (
+    EXTRACTION_DURATION,
+    LLM_CALL_DURATION,
+    LLM_CASCADE_DECISIONS,
+    LLM_CONTEXT_FILL,
+    LLM_ERRORS,
+    LLM_MAP_SECTIONS,
+    LLM_PARSE_FAILURES,
+    LLM_PARSE_RESULTS,
+    LLM_PREFILTERED,
+    LLM_RETRIES,
+    LLM_TOKENS,
 )
+from core.tracing import tracer
+from services.framework_registry import get_framework
+from services.llm_response import parse_verdict
+from services.map_reduce import (
+    FINDINGS_SCHEMA,
+    Finding,
+    MapResult,
+    build_map_instructions,
+    control_groups,
+    format_findings,
+    get_map_cache,
+    parse_findings,
+    section_digest,
+)
+from services.provider_pool import (
+    DEFAULT_TIER,
+    FAST_TIER,
+    ModelEndpoint,
+    escalation_policy,
+    get_provider_pool,
+    select_tier,
+)
+from services.relevance_filter import Relevance, get_relevance_filter
+from services.token_budget import (
+    Chunk,
+    PackedSegment,
+    TokenCounter,
+    context_window_tokens,
+    get_token_counter,
+    pack_documents,
+    split_chunks,
+)
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
 
 
 # Legacy controls for backwards compatibility
@@ -188,41 +237,53 @@ Provide your analysis as JSON with these fields:
 class GeminiService:
     """Service for interacting with Google Gemini AI for compliance analysis."""
 
-    def __init__(self, scan_type: str = "quick"):
+    def __init__(self, scan_type: str = "quick", framework: str = "soc2"):
         """
         Initialize Gemini client with API key from settings.
         
         Args:
-            scan_type: "quick" for 8 key controls, "full" for all 50+ controls
+            scan_type: "quick" for the pack's quick-scan controls, "full" for all controls
+            framework: Framework ID of the control pack to evaluate against
         """
-        if not settings.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not configured")
-        
-        genai.configure(api_key=settings.gemini_api_key)
-        self.model = genai.GenerativeModel(settings.gemini_model)
+        # Requests are routed across every configured key and model tier
+        self.pool = get_provider_pool()
         self.scan_type = scan_type
+        self.catalog = get_framework(framework)
+        
+        # Per-job cached context for the shared document segment
+        self._cached_content: caching.CachedContent | None = None
+        self._cached_model: genai.GenerativeModel | None = None
+        self._cached_segment: str | None = None
+        self._cached_endpoint: ModelEndpoint | None = None
+        self._cache_expires_at = 0.0
+        
+        # Last document segment built and its packing statistics
+        self._segment: str | None = None
+        self._packed: PackedSegment | None = None
         
         # Use comprehensive controls or quick scan
-        if scan_type == "full":
-            self.controls = get_all_controls()
-        else:
-            self.controls = get_quick_scan_controls()
+        self.controls = self.catalog.get_controls(scan_type)
+
+    @property
+    def model(self) -> genai.GenerativeModel:
+        """The primary key's default-tier model."""
+        return self.pool.primary.model
 
     def get_controls(self) -> list[dict]:
-        """Get all SOC 2 controls for analysis."""
+        """Get the controls evaluated by this scan."""
         return self.controls
     
     def get_all_available_controls(self) -> list[dict]:
-        """Get all available SOC 2 controls (full list)."""
-        return get_all_controls()
+        """Get all available controls for the framework (full list)."""
+        return self.catalog.get_controls("full")
     
     def get_control_categories_summary(self) -> list[dict]:
         """Get summary of control categories."""
-        return get_control_categories()
+        return self.catalog.get_categories()
     
     def get_control_stats(self) -> dict:
         """Get control statistics."""
-        return CONTROL_SUMMARY
+        return self.catalog.summary()
 
     async def extract_document_text(self, file_path: str) -> str:
         """
@@ -240,7 +301,21 @@ class GeminiService:
             raise FileNotFoundError(f"Document not found: {file_path}")
         
         file_ext = path.suffix.lower()
+        file_type = file_ext.lstrip(".")
+        if file_type not in settings.allowed_extensions:
+            file_type = "other"
         
+        started = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(
+                "extract_document_text", attributes={"document.file_type": file_type}
+            ):
+                return await self._extract_by_type(path, file_ext)
+        finally:
+            EXTRACTION_DURATION.labels(file_type).observe(time.perf_counter() - started)
+
+    async def _extract_by_type(self, path: Path, file_ext: str) -> str:
+        """Dispatch text extraction on the file extension."""
         if file_ext == ".pdf":
             return await self._extract_pdf_text(path)
         elif file_ext == ".csv":
@@ -304,127 +379,436 @@ class GeminiService:
         # Convert to formatted string
         return f"JSON Document:\n{json.dumps(data, indent=2)}"
 
+    @property
+    def token_counter(self) -> TokenCounter:
+        """Token counter for the pool's models (Gemini models share a tokenizer)."""
+        return get_token_counter(self.pool.primary.model_name)
+
+    def document_token_budget(self) -> int:
+        """
+        Tokens available to the document segment in every request.
+        
+        The segment is shared by all tiers, so it must fit the smallest
+        context window in the pool, less the reserve for the control
+        instructions and the reply.
+        """
+        window = min(context_window_tokens(e.model_name) for e in self.pool.endpoints)
+        budget = window - settings.gemini_prompt_reserve_tokens
+        if settings.gemini_max_document_tokens > 0:
+            budget = min(budget, settings.gemini_max_document_tokens)
+        return max(budget, 0)
+
+    async def calibrate_tokens(self, document_texts: list[str]) -> bool:
+        """Calibrate local token estimates with one exact count of the documents."""
+        backend, model = self.pool.backend, self.pool.primary.model
+        return await asyncio.to_thread(
+            self.token_counter.calibrate,
+            document_texts,
+            lambda texts: backend.count_tokens(model, texts),
+        )
+
+    def build_document_segment(self, document_texts: list[str]) -> str:
+        """
+        Build the document segment shared by every control prompt in a job.
+        
+        The segment leads each request and is identical across controls, so
+        it is built once per job and only the control instructions vary.
+        Documents are packed into document_token_budget(). When they do not
+        fit, the chunks mentioning the most "Look for" terms of the scan's
+        controls are kept, along with the start of each document (with
+        map-reduce enabled, analyze_documents then maps every section
+        instead of using the trimmed segment).
+        
+        Args:
+            document_texts: List of document text contents.
+            
+        Returns:
+            Framework preamble followed by the packed document text.
+        """
+        counter = self.token_counter
+        prefix = self.catalog.document_prefix
+        relevance_filter = get_relevance_filter(self.catalog)
+        control_ids = {c["control_id"] for c in self.controls}
+        
+        def priority(chunk: Chunk) -> float:
+            return relevance_filter.hits(chunk.text, control_ids) + (chunk.index == 0)
+        
+        packed = pack_documents(
+            document_texts,
+            budget_tokens=max(0, self.document_token_budget() - counter.count(prefix)),
+            counter=counter,
+            chunk_tokens=settings.gemini_chunk_tokens,
+            priority=priority,
+        )
+        if not packed.complete:
+            logger.warning(
+                "Documents trimmed to fit the context window",
+                chunks_packed=packed.chunks_packed,
+                chunks_total=packed.chunks_total,
+                budget_tokens=packed.budget_tokens,
+            )
+        
+        self._segment = f"{prefix}{packed.text}"
+        self._packed = packed
+        return self._segment
+
+    def _segment_tokens(self, document_segment: str) -> int:
+        """Estimated tokens of a document segment (free for the last one built)."""
+        if document_segment is self._segment and self._packed is not None:
+            return self._packed.tokens + self.token_counter.count(self.catalog.document_prefix)
+        return self.token_counter.count(document_segment)
+
+    async def open_document_cache(self, document_segment: str) -> bool:
+        """
+        Create a Gemini cached context holding the job's document segment.
+        
+        Segments below the model's minimum cacheable size, or any failure to
+        create the cache, fall back to sending the segment inline. The cache
+        is created for the model tier the scan's first pass routes to (the
+        fast tier under the cascade) and is owned by the primary API key, so
+        cached calls are pinned to that endpoint. Its TTL is short and is
+        extended while the job runs (see extend_document_cache).
+        
+        Args:
+            document_segment: Segment from build_document_segment.
+            
+        Returns:
+            True if subsequent calls will reference the cached context.
+        """
+        await self.close_document_cache()
+        
+        estimated_tokens = self._segment_tokens(document_segment)
+        if (
+            not settings.gemini_context_cache_enabled
+            or not self.pool.backend.supports_context_cache
+            or estimated_tokens < settings.gemini_cache_min_tokens
+        ):
+            return False
+        
+        endpoint = self.pool.primary_for(self._first_tier({}))
+        try:
+            # Blocking API calls; kept off the event loop
+            self._cached_content, self._cached_model = await asyncio.to_thread(
+                self._create_document_cache, endpoint, document_segment
+            )
+            self._cached_segment = document_segment
+            self._cached_endpoint = endpoint
+            self._cache_expires_at = time.monotonic() + settings.gemini_cache_ttl_seconds
+        except Exception as e:
+            logger.warning("Context cache unavailable, sending documents inline", error=str(e))
+            await self.close_document_cache()
+            return False
+        
+        return True
+
+    def _create_document_cache(
+        self,
+        endpoint: ModelEndpoint,
+        document_segment: str,
+    ) -> tuple[caching.CachedContent, genai.GenerativeModel]:
+        cached_content = caching.CachedContent.create(
+            model=endpoint.model.model_name,
+            display_name=f"shieldagent-{self.catalog.framework_id}",
+            contents=[document_segment],
+            ttl=timedelta(seconds=settings.gemini_cache_ttl_seconds),
+        )
+        cached_model = genai.GenerativeModel.from_cached_content(
+            cached_content,
+            generation_config=self.pool.backend.generation_config(),
+        )
+        return cached_content, cached_model
+
+    async def extend_document_cache(self) -> None:
+        """Renew the cached context's TTL once half of it has passed."""
+        cached_content = self._cached_content
+        ttl = settings.gemini_cache_ttl_seconds
+        if cached_content is None or time.monotonic() < self._cache_expires_at - ttl / 2:
+            return
+        try:
+            await asyncio.to_thread(cached_content.update, ttl=timedelta(seconds=ttl))
+            self._cache_expires_at = time.monotonic() + ttl
+        except Exception as e:
+            # Calls fall back to inline documents if the cache expires
+            logger.warning("Failed to extend context cache", error=str(e))
+
+    async def close_document_cache(self) -> None:
+        """Delete the job's cached context, if one was created."""
+        cached_content = self._cached_content
+        self._cached_content = None
+        self._cached_model = None
+        self._cached_segment = None
+        self._cached_endpoint = None
+        
+        if cached_content is not None:
+            try:
+                await asyncio.to_thread(cached_content.delete)
+            except Exception as e:
+                # The TTL expires it anyway
+                logger.warning("Failed to delete context cache", error=str(e))
+
     async def analyze_control(
         self,
         control: dict,
         document_texts: list[str],
+        document_segment: str | None = None,
+        tier: str | None = None,
     ) -> dict[str, Any]:
         """
-        Analyze documents against a specific SOC 2 control.
+        Analyze documents against a specific compliance control.
         
         Args:
             control: The control definition with check_prompt.
             document_texts: List of document text contents.
+            document_segment: Prebuilt shared segment from build_document_segment.
+            tier: Model tier to call (default: the tier select_tier routes to).
             
         Returns:
             Analysis result with status, confidence, summary, etc.
         """
-        # Prepare document content
-        combined_text = "\n\n=== DOCUMENT ===\n\n".join(document_texts)
-        
-        # Truncate if too long (Gemini has context limits)
-        max_chars = 30000
-        if len(combined_text) > max_chars:
-            combined_text = combined_text[:max_chars] + "\n\n[Document truncated due to length...]"
-        
-        # Build the prompt
-        prompt = f"""You are a SOC 2 compliance expert analyzing documents for evidence of security controls.
-
-CONTROL BEING EVALUATED:
-- Control ID: {control['control_id']}
-- Category: {control['category']}
-- Title: {control['title']}
-- Description: {control['description']}
-
-ANALYSIS INSTRUCTIONS:
-{control['check_prompt']}
-
-DOCUMENTS TO ANALYZE:
-{combined_text}
-
-IMPORTANT: Respond ONLY with valid JSON in this exact format:
-{{
-    "status": "pass" | "fail" | "needs_review",
-    "confidence": 0.0 to 1.0,
-    "summary": "Brief explanation of your findings",
-    "evidence_quote": "Direct quote from document if found, or null",
-    "gaps": ["List of identified gaps or missing elements"]
-}}"""
+        if document_segment is None:
+            document_segment = self.build_document_segment(document_texts)
+        
+        # Shared document segment first, then the control's precompiled instructions
+        template = self.catalog.get_prompt_template(control)
+        tier = tier or select_tier(self.scan_type, control)
+        prompt_estimate = (
+            self._segment_tokens(document_segment) + self.token_counter.count(template.suffix)
+        )
+        window = context_window_tokens(self.pool.primary_for(tier).model_name)
+        cached_endpoint = self._cached_endpoint
+        if (
+            self._cached_model is not None
+            and cached_endpoint is not None
+            and document_segment == self._cached_segment
+            and cached_endpoint.tier == self.pool.primary_for(tier).tier
+        ):
+            cached_model = self._cached_model
+            contents = [template.suffix]
 
-        try:
-            # Call Gemini API
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            def call(_model):
+                return cached_model.generate_content(contents)
+        else:
+            cached_endpoint = None
+            contents = [document_segment, template.suffix]
+
+            def call(model):
+                return model.generate_content(contents)
+
+        call_stats: dict[str, int] = {}
+        outcome = "cancelled"
+        started = time.perf_counter()
+        with tracer.start_as_current_span(
+            "analyze_control",
+            attributes={"control.id": control["control_id"], "llm.tier": tier},
+        ) as span:
+            try:
+                # Call Gemini on the least-loaded endpoint, retrying 429/5xx
+                with tracer.start_as_current_span("llm.generate", attributes={"llm.tier": tier}):
+                    response = await self.pool.call(
+                        call,
+                        tier=tier,
+                        stats=call_stats,
+                        endpoint=cached_endpoint,
+                    )
+                response_text = response.text.strip()
             
-            # Extract JSON from response
-            result = self._parse_json_response(response_text)
-            result["raw_response"] = response_text
-            result["control_id"] = control["control_id"]
+                # Extract JSON from response
+                with tracer.start_as_current_span("parse_response"):
+                    result, parse_method = parse_verdict(response_text)
+                result["raw_response"] = response_text
+                result["control_id"] = control["control_id"]
+                result["retries"] = call_stats.get("retries", 0)
+                result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                result["tier"] = tier
+                result["cache_hit"] = cached_endpoint is not None
+                result.update(self._token_usage(response))
+                result["prompt_tokens_estimated"] = prompt_estimate
+                result["context_fill"] = round(
+                    (result["prompt_tokens"] or prompt_estimate) / window, 4
+                )
+                LLM_CONTEXT_FILL.labels(tier).observe(result["context_fill"])
             
-            return result
+                result["parse_repaired"] = parse_method == "repaired"
+                outcome = "parse_failure" if result.get("parse_failed") else "ok"
+                LLM_PARSE_RESULTS.labels(tier, parse_method).inc()
+                if result.get("parse_failed"):
+                    LLM_PARSE_FAILURES.labels(tier, control["control_id"]).inc()
+                LLM_TOKENS.labels(tier, "prompt").inc(result["prompt_tokens"])
+                LLM_TOKENS.labels(tier, "response").inc(result["response_tokens"])
+                span.set_attributes({
+                    "control.status": str(result.get("status", "")),
+                    "llm.parse_method": parse_method,
+                    "llm.parse_failed": bool(result.get("parse_failed")),
+                    "llm.prompt_tokens": result["prompt_tokens"],
+                    "llm.prompt_tokens_estimated": prompt_estimate,
+                    "llm.context_fill": result["context_fill"],
+                    "llm.response_tokens": result["response_tokens"],
+                })
             
-        except Exception as e:
-            return {
-                "control_id": control["control_id"],
-                "status": "error",
-                "confidence": 0.0,
-                "summary": f"Error during analysis: {str(e)}",
-                "evidence_quote": None,
-                "gaps": ["Analysis could not be completed"],
-                "raw_response": str(e),
-            }
+                return result
+            
+            except Exception as e:
+                outcome = "error"
+                LLM_ERRORS.labels(tier, type(e).__name__).inc()
+                span.record_exception(e)
+                span.set_status(trace.StatusCode.ERROR, str(e))
+                return {
+                    "control_id": control["control_id"],
+                    "status": "error",
+                    "confidence": 0.0,
+                    "summary": f"Error during analysis: {str(e)}",
+                    "evidence_quote": None,
+                    "gaps": ["Analysis could not be completed"],
+                    "raw_response": str(e),
+                    "retries": call_stats.get("retries", 0),
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "tier": tier,
+                    "cache_hit": cached_endpoint is not None,
+                    "prompt_tokens_estimated": prompt_estimate,
+                    "context_fill": round(prompt_estimate / window, 4),
+                }
+            finally:
+                LLM_CALL_DURATION.labels(tier, outcome).observe(time.perf_counter() - started)
+                if call_stats.get("retries"):
+                    LLM_RETRIES.labels(tier).inc(call_stats["retries"])
+                span.set_attribute("llm.retries", call_stats.get("retries", 0))
 
-    def _parse_json_response(self, response_text: str) -> dict[str, Any]:
-        """Parse JSON from Gemini response, handling markdown code blocks."""
-        # Try to extract JSON from markdown code block
-        json_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?```", response_text, re.DOTALL)
-        if json_match:
-            response_text = json_match.group(1)
+    def _first_tier(self, control: dict) -> str:
+        """The tier a control is evaluated on first: fast when it is cascaded."""
+        if escalation_policy(control) is not None:
+            return FAST_TIER
+        return select_tier(self.scan_type, control)
+
+    async def evaluate_control(
+        self,
+        control: dict,
+        document_texts: list[str],
+        document_segment: str | None = None,
+    ) -> dict[str, Any]:
+        """
+        Evaluate a control, escalating uncertain fast-tier verdicts.
         
-        # Try direct JSON parse
-        try:
-            return json.loads(response_text)
-        except json.JSONDecodeError:
-            # Try to find JSON object in text
-            json_match = re.search(r"\{.*\}", response_text, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    pass
+        Without a cascade policy this is a single analyze_control call.
+        Otherwise the fast tier answers first, and a verdict the policy
+        rejects is re-evaluated on the default tier. If that second call
+        fails, the fast verdict is kept.
+        
+        Returns:
+            The final analysis. Latency, retries and tokens cover both
+            calls; "escalated", "escalation_reason" and "cascade" (each
+            pass's tier, status and confidence) describe the cascade.
+        """
+        policy = escalation_policy(control)
+        if policy is None:
+            return await self.analyze_control(control, document_texts, document_segment)
+        
+        first = await self.analyze_control(
+            control, document_texts, document_segment, tier=FAST_TIER
+        )
+        reason = policy.reason(first)
+        LLM_CASCADE_DECISIONS.labels(control.get("category", ""), reason or "accepted").inc()
+        passes = [first]
+        if reason is not None:
+            passes.append(await self.analyze_control(
+                control, document_texts, document_segment, tier=DEFAULT_TIER
+            ))
         
-        # Return default structure if parsing fails
+        result = passes[-1] if passes[-1]["status"] != "error" else first
+        result = dict(result)
+        for key in (
+            "latency_ms", "retries", "prompt_tokens", "response_tokens", "prompt_tokens_estimated"
+        ):
+            result[key] = sum(p.get(key, 0) for p in passes)
+        result["latency_ms"] = round(result["latency_ms"], 1)
+        result["escalated"] = reason is not None
+        result["escalation_reason"] = reason
+        result["cascade"] = [
+            {"tier": p["tier"], "status": p["status"], "confidence": p.get("confidence", 0.0)}
+            for p in passes
+        ]
+        return result
+
+    @staticmethod
+    def _token_usage(response: Any) -> dict[str, int]:
+        """Prompt and response token counts from the response usage metadata."""
+        usage = getattr(response, "usage_metadata", None)
         return {
-            "status": "needs_review",
-            "confidence": 0.0,
-            "summary": "Could not parse AI response",
-            "evidence_quote": None,
-            "gaps": ["Response parsing failed"],
+            "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+            "response_tokens": getattr(usage, "candidates_token_count", 0) or 0,
         }
 
+    def _parse_json_response(self, response_text: str) -> dict[str, Any]:
+        """Parse a verdict from a Gemini response (see services.llm_response)."""
+        return parse_verdict(response_text).verdict
+
     async def analyze_documents(
         self,
         document_paths: list[str],
-        progress_callback: callable = None,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+        cancel_check: Callable[[], Awaitable[bool]] | None = None,
     ) -> dict[str, Any]:
         """
-        Analyze multiple documents against all SOC 2 controls.
+        Analyze multiple documents against all controls in the scan.
         
         Args:
             document_paths: List of document file paths.
             progress_callback: Optional callback for progress updates.
+            cancel_check: Optional coroutine function returning True once the
+                job is cancelled. Checked before each control and every
+                job_cancel_poll_seconds during an LLM call.
             
         Returns:
-            Complete analysis results with evidence and gaps.
+            Complete analysis results with evidence and gaps. When cancelled,
+            "cancelled" is True and only finished controls are included.
         """
+        with tracer.start_as_current_span(
+            "analyze_documents",
+            attributes={
+                "scan.type": self.scan_type,
+                "scan.framework": self.catalog.framework_id,
+                "scan.documents": len(document_paths),
+                "scan.controls": len(self.controls),
+            },
+        ):
+            return await self._analyze_documents(document_paths, progress_callback, cancel_check)
+
+    async def _analyze_documents(
+        self,
+        document_paths: list[str],
+        progress_callback: Callable[[int, int, str], None] | None = None,
+        cancel_check: Callable[[], Awaitable[bool]] | None = None,
+    ) -> dict[str, Any]:
+        """Extract document text, then evaluate every control against it."""
         # Extract text from all documents
         document_texts = []
+        document_metrics = []
         for path in document_paths:
+            started = time.perf_counter()
+            error = None
             try:
                 text = await self.extract_document_text(path)
-                document_texts.append(text)
             except Exception as e:
-                document_texts.append(f"[Error extracting {path}: {str(e)}]")
+                error = str(e)
+                text = f"[Error extracting {path}: {error}]"
+            document_texts.append(text)
+            document_metrics.append({
+                "path": path,
+                "file_type": Path(path).suffix.lower().lstrip("."),
+                "chars": len(text),
+                "extraction_ms": round((time.perf_counter() - started) * 1000, 1),
+                "error": error,
+            })
+        
+        await self.calibrate_tokens(document_texts)
+        # Packing scans the whole corpus; kept off the event loop
+        document_segment = await asyncio.to_thread(self.build_document_segment, document_texts)
+        # Evidence that does not fit is mapped section by section instead,
+        # so each control gets its own reduce prompt and nothing is cached
+        packed = self._packed
+        map_reduce = (
+            settings.gemini_map_reduce_enabled and packed is not None and not packed.complete
+        )
+        cache_used = False if map_reduce else await self.open_document_cache(document_segment)
         
         # Analyze each control
         results = {
@@ -435,14 +819,83 @@ IMPORTANT: Respond ONLY with valid JSON in this exact format:
                 "passing": 0,
                 "failing": 0,
                 "needs_review": 0,
-            }
+                "not_applicable": 0,
+            },
+            "context_cache_used": cache_used,
+            "cancelled": False,
+            "metrics": {
+                "documents": document_metrics,
+                "controls": [],
+                "packing": packed.to_metrics() if packed is not None else {},
+            },
         }
         
+        try:
+            await self._analyze_controls(
+                document_texts,
+                document_segment,
+                results,
+                progress_callback,
+                cancel_check,
+                map_reduce=map_reduce,
+            )
+        finally:
+            await self.close_document_cache()
+        
+        return results
+
+    async def _analyze_controls(
+        self,
+        document_texts: list[str],
+        document_segment: str,
+        results: dict[str, Any],
+        progress_callback: Callable[[int, int, str], None] | None = None,
+        cancel_check: Callable[[], Awaitable[bool]] | None = None,
+        map_reduce: bool = False,
+    ) -> None:
+        """
+        Evaluate every control in the scan and accumulate results.
+        
+        With map_reduce, the controls that need the LLM are first mapped over
+        every section of the documents, and each is then evaluated against
+        its own findings rather than the shared segment.
+        """
+        relevance = await self.score_relevance(document_texts)
+        mapped: MapResult | None = None
+        if map_reduce:
+            to_map = [
+                c for c in self.controls
+                if c["control_id"] not in relevance
+                or relevance[c["control_id"]].score >= settings.relevance_min_score
+            ]
+            mapped = await self._run_cancellable(
+                self.map_documents(document_texts, to_map), cancel_check
+            )
+            if mapped is None:
+                results["cancelled"] = True
+                return
+            results["metrics"]["map_reduce"] = mapped.to_metrics()
+        
         for i, control in enumerate(self.controls):
+            if cancel_check and await cancel_check():
+                results["cancelled"] = True
+                break
             if progress_callback:
                 progress_callback(i, len(self.controls), control["control_id"])
+            await self.extend_document_cache()
             
-            analysis = await self.analyze_control(control, document_texts)
+            analysis = self._prefiltered_verdict(control, relevance.get(control["control_id"]))
+            if analysis is None:
+                segment = document_segment
+                if mapped is not None:
+                    segment = self.build_findings_segment(control, mapped)
+                analysis = await self._run_cancellable(
+                    self.evaluate_control(control, document_texts, document_segment=segment),
+                    cancel_check,
+                )
+            if analysis is None:
+                results["cancelled"] = True
+                break
             
             # Build evidence item
             evidence = {
@@ -452,8 +905,28 @@ IMPORTANT: Respond ONLY with valid JSON in this exact format:
                 "summary": analysis.get("summary", ""),
                 "evidence_quote": analysis.get("evidence_quote"),
                 "raw_llm_response": analysis.get("raw_response"),
+                "latency_ms": analysis.get("latency_ms"),
+                "retries": analysis.get("retries", 0),
             }
             results["evidence_items"].append(evidence)
+            results["metrics"]["controls"].append({
+                "control_id": control["control_id"],
+                "status": evidence["status"],
+                "tier": analysis.get("tier"),
+                "latency_ms": analysis.get("latency_ms"),
+                "retries": analysis.get("retries", 0),
+                "prompt_tokens": analysis.get("prompt_tokens", 0),
+                "response_tokens": analysis.get("response_tokens", 0),
+                "prompt_tokens_estimated": analysis.get("prompt_tokens_estimated", 0),
+                "context_fill": analysis.get("context_fill"),
+                "cache_hit": analysis.get("cache_hit", False),
+                "parse_failed": bool(analysis.get("parse_failed")),
+                "parse_repaired": bool(analysis.get("parse_repaired")),
+                "prefiltered": bool(analysis.get("prefiltered")),
+                "relevance": analysis.get("relevance"),
+                "escalated": bool(analysis.get("escalated")),
+                "escalation_reason": analysis.get("escalation_reason"),
+            })
             
             # Update summary counts
             status = analysis.get("status", "needs_review")
@@ -461,6 +934,8 @@ IMPORTANT: Respond ONLY with valid JSON in this exact format:
                 results["summary"]["passing"] += 1
             elif status == "fail":
                 results["summary"]["failing"] += 1
+            elif status == "not_applicable":
+                results["summary"]["not_applicable"] += 1
             else:
                 results["summary"]["needs_review"] += 1
             
@@ -475,32 +950,224 @@ IMPORTANT: Respond ONLY with valid JSON in this exact format:
                         "description": gap_desc,
                         "remediation_suggestion": self._get_remediation(control["control_id"], gap_desc),
                     })
+
+    async def map_documents(self, document_texts: list[str], controls: list[dict]) -> MapResult:
+        """
+        Map step: extract findings for controls from every document section.
         
-        return results
+        Each section is sent once per control group (controls of one
+        category), at most gemini_map_concurrency requests at a time.
+        Sections already mapped with the same instructions and model are
+        read from the map cache. A failed request leaves its section
+        unreviewed for the group's controls rather than failing the job.
+        
+        Args:
+            document_texts: Extracted text of each document.
+            controls: Controls to extract findings for.
+            
+        Returns:
+            Findings per control, in section order, with map statistics.
+        """
+        use_fast = settings.gemini_map_fast_tier and self.pool.has_tier(FAST_TIER)
+        tier = FAST_TIER if use_fast else DEFAULT_TIER
+        model_name = self.pool.primary_for(tier).model_name
+        counter = self.token_counter
+        prefix = self.catalog.document_prefix
+        groups = control_groups(controls, settings.gemini_map_group_size)
+        instructions = [build_map_instructions(group) for group in groups]
+        
+        # Sections fill the map model's window next to the longest instructions
+        room = (
+            context_window_tokens(model_name)
+            - settings.gemini_prompt_reserve_tokens
+            - counter.count(prefix)
+            - max((counter.count(text) for text in instructions), default=0)
+        )
+        chunk_tokens = max(1, min(settings.gemini_map_chunk_tokens, room))
+        sections = await asyncio.to_thread(lambda: [
+            chunk.text
+            for document, text in enumerate(document_texts)
+            for chunk in split_chunks(text, document, counter, chunk_tokens)
+        ])
+        
+        result = MapResult(sections=len(sections), groups=len(groups))
+        work = [
+            (section, group, section_digest(model_name, instructions[group], sections[section]))
+            for section in range(len(sections))
+            for group in range(len(groups))
+        ]
+        cache = get_map_cache()
+        cached = await asyncio.to_thread(cache.get_many, [digest for *_, digest in work])
+        config = self.pool.backend.generation_config(FINDINGS_SCHEMA)
+        semaphore = asyncio.Semaphore(max(1, settings.gemini_map_concurrency))
+        
+        async def map_section(section: int, group: int, digest: str) -> list[dict] | None:
+            if digest in cached:
+                result.cache_hits += 1
+                LLM_MAP_SECTIONS.labels("cached").inc()
+                return cached[digest]
+            
+            contents = [f"{prefix}{sections[section]}", instructions[group]]
+            call_stats: dict[str, int] = {}
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await self.pool.call(
+                        lambda model: model.generate_content(contents, generation_config=config),
+                        tier=tier,
+                        stats=call_stats,
+                    )
+                    findings = parse_findings(
+                        response.text, {c["control_id"] for c in groups[group]}
+                    )
+                    usage = self._token_usage(response)
+                    result.prompt_tokens += usage["prompt_tokens"]
+                    result.response_tokens += usage["response_tokens"]
+                    LLM_TOKENS.labels(tier, "prompt").inc(usage["prompt_tokens"])
+                    LLM_TOKENS.labels(tier, "response").inc(usage["response_tokens"])
+                except Exception as e:
+                    logger.warning("Map request failed", section=section, error=str(e))
+                    findings = None
+                finally:
+                    result.calls += 1
+                    result.latency_ms += (time.perf_counter() - started) * 1000
+            
+            LLM_MAP_SECTIONS.labels("error" if findings is None else "mapped").inc()
+            if findings is None:
+                result.errors += 1
+            else:
+                await asyncio.to_thread(cache.set_many, {digest: findings})
+            return findings
+        
+        with tracer.start_as_current_span(
+            "map_documents",
+            attributes={"map.sections": len(sections), "map.groups": len(groups), "llm.tier": tier},
+        ):
+            outputs = await asyncio.gather(*(map_section(*item) for item in work))
+        
+        for (section, group, _), findings in zip(work, outputs):
+            if findings is None:
+                for control in groups[group]:
+                    result.unreviewed.setdefault(control["control_id"], []).append(section)
+                continue
+            for finding in findings:
+                result.findings.setdefault(finding["control_id"], []).append(Finding(
+                    control_id=finding["control_id"],
+                    section=section,
+                    quote=finding["quote"],
+                    note=finding.get("note", ""),
+                ))
+        return result
+
+    def build_findings_segment(self, control: dict, mapped: MapResult) -> str:
+        """Reduce step input: the framework preamble and the control's findings."""
+        prefix = self.catalog.document_prefix
+        findings = format_findings(
+            mapped.findings.get(control["control_id"], []),
+            mapped.sections,
+            mapped.unreviewed.get(control["control_id"], []),
+            counter=self.token_counter,
+            max_tokens=self.document_token_budget() - self.token_counter.count(prefix),
+        )
+        return f"{prefix}{findings}"
+
+    async def score_relevance(self, document_texts: list[str]) -> dict[str, Relevance]:
+        """
+        Score the scan's controls against the documents with the local prefilter.
+
+        Returns:
+            Relevance by control ID, or an empty dict when the prefilter is
+            off for this scan type.
+        """
+        if self.scan_type not in settings.relevance_filter_scan_types:
+            return {}
+        relevance_filter = get_relevance_filter(self.catalog)
+        # One pass over the whole corpus; kept off the event loop
+        return await asyncio.to_thread(relevance_filter.score, document_texts, self.controls)
+
+    def _prefiltered_verdict(
+        self,
+        control: dict,
+        relevance: Relevance | None,
+    ) -> dict[str, Any] | None:
+        """Answer a control locally when too little of its evidence is mentioned."""
+        if relevance is None or relevance.score >= settings.relevance_min_score:
+            return None
+        
+        expected = ", ".join(relevance.missing[:3])
+        if relevance.matched:
+            status = "needs_review"
+            summary = (
+                f"Only {len(relevance.matched)} of {len(relevance.matched) + len(relevance.missing)} "
+                f"expected evidence items are mentioned ({', '.join(relevance.matched)}), "
+                "too few for AI analysis. Review manually."
+            )
+        else:
+            status = "not_applicable"
+            summary = (
+                f"No document mentions this control's expected evidence (e.g. {expected}), "
+                "so it was not sent for AI analysis."
+            )
+        LLM_PREFILTERED.labels(status).inc()
+        return {
+            "control_id": control["control_id"],
+            "status": status,
+            "confidence": 0.0,
+            "summary": summary,
+            "evidence_quote": None,
+            "gaps": [],
+            "retries": 0,
+            "latency_ms": None,
+            "prefiltered": True,
+            "relevance": round(relevance.score, 2),
+        }
+
+    @staticmethod
+    async def _run_cancellable(
+        coro: Awaitable[T],
+        cancel_check: Callable[[], Awaitable[bool]] | None,
+    ) -> T | None:
+        """Await an analysis, abandoning it (returning None) if the job is cancelled."""
+        if cancel_check is None:
+            return await coro
+        task = asyncio.ensure_future(coro)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=settings.job_cancel_poll_seconds)
+                if done:
+                    return task.result()
+                if await cancel_check():
+                    # Stops retries and backoff; a request already sent still completes
+                    task.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await task
+                    return None
+        finally:
+            # Cancelled from outside (task time limit, shutdown): the
+            # analysis must not keep running, and spending quota, unowned
+            if not task.done():
+                task.cancel()
 
     def _get_remediation(self, control_id: str, gap_description: str) -> str:
         """Generate remediation suggestion for a gap."""
-        remediations = {
-            "CC6.1": "Implement multi-factor authentication, establish role-based access controls, and document access policies.",
-            "CC6.2": "Create formal user registration procedures with management approval workflow and maintain access request records.",
-            "CC6.3": "Implement automated deprovisioning, conduct quarterly access reviews, and document termination procedures.",
-            "CC7.2": "Deploy SIEM solution, configure alerting thresholds, and establish 24/7 monitoring procedures.",
-            "CC7.3": "Develop incident response playbooks, define severity levels, and conduct regular tabletop exercises.",
-            "CC8.1": "Implement change management ticketing system, require testing before deployment, and maintain change logs.",
-            "CC9.1": "Conduct annual risk assessments, maintain risk register, and document risk treatment decisions.",
-            "A1.2": "Define RTO/RPO objectives, implement automated backups, and conduct regular recovery testing.",
-        }
-        return remediations.get(control_id, "Review control requirements and implement appropriate measures.")
+        control = self.catalog.get_control(control_id)
+        if control and control.get("remediation"):
+            return control["remediation"]
+        return "Review control requirements and implement appropriate measures."
 
 
-def get_gemini_service(scan_type: str = "quick") -> GeminiService:
+def get_gemini_service(scan_type: str = "quick", framework: str = "soc2") -> GeminiService:
     """
     Get a new Gemini service instance with specified scan type.
     
+    Services hold per-job state (the document cache) but route requests
+    through the process-wide provider pool and its long-lived clients.
+    
     Args:
-        scan_type: "quick" for 8 key controls, "full" for all 51 controls
+        scan_type: "quick" for the pack's quick-scan controls, "full" for all controls
+        framework: Framework ID of the control pack to evaluate against
         
     Returns:
         GeminiService instance configured for the scan type
     """
-    return GeminiService(scan_type=scan_type)
+    return GeminiService(scan_type=scan_type, framework=framework)
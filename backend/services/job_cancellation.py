@@ -0,0 +1,64 @@
+"""
+Cooperative cancellation of running analysis jobs.
+
+POST /jobs/{id}/cancel sets a flag in Redis. The process running the job,
+a Celery worker or the in-process executor, checks the flag before each
+control and while a control's LLM call is in flight. Once it sees the
+flag it abandons the remaining controls, keeps the evidence already
+produced and finalizes the job as cancelled.
+"""
+
+import asyncio
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "shieldagent:cancel:"
+
+
+def _get_redis():
+    from core.redis import get_redis_client
+
+    return get_redis_client()
+
+
+def request_cancellation(job_id: str) -> None:
+    """Flag a job as cancelled; raises on Redis errors."""
+    _get_redis().set(
+        f"{KEY_PREFIX}{job_id}", "1", ex=settings.job_cancel_flag_ttl_seconds
+    )
+
+
+def revoke_task(task_id: str) -> None:
+    """Revoke a queued Celery task, logging rather than raising on broker errors."""
+    from worker.celery_app import celery_app
+
+    try:
+        celery_app.control.revoke(task_id)
+    except Exception as e:
+        logger.warning("Failed to revoke task", task_id=task_id, error=str(e))
+
+
+class CancellationFlag:
+    """Read side of a job's cancellation flag, checked from async code."""
+
+    def __init__(self, job_id: str) -> None:
+        self.key = f"{KEY_PREFIX}{job_id}"
+        self._requested = False
+
+    async def is_requested(self) -> bool:
+        """
+        Whether cancellation has been requested.
+
+        Once seen, the answer stays True. Redis errors count as not
+        requested so an outage does not abort running jobs.
+        """
+        if self._requested:
+            return True
+        try:
+            self._requested = bool(await asyncio.to_thread(_get_redis().exists, self.key))
+        except Exception as e:
+            logger.warning("Failed to check cancellation flag", key=self.key, error=str(e))
+        return self._requested
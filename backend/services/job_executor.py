@@ -0,0 +1,164 @@
+"""
+Bounded in-process executor for analysis jobs.
+
+Deployments without Celery start jobs through POST /jobs/{id}/run. The
+executor queues those jobs and runs them on a fixed number of asyncio
+workers inside the API process. The request returns as soon as the job is
+queued, so no request handler or request session is held for the length
+of an analysis. Jobs run through the same code as the Celery worker
+(worker.tasks.run_analysis).
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.logging import get_logger
+from core.metrics import JOB_EXECUTOR_ACTIVE
+from models.job import Job, JobStatus
+
+logger = get_logger(__name__)
+
+
+class ExecutorUnavailableError(Exception):
+    """Raised when the executor is not running or its queue is full."""
+
+
+class JobExecutor:
+    """Fixed pool of asyncio workers draining a bounded job queue."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        max_workers: int = 2,
+        max_queued: int = 32,
+    ) -> None:
+        """
+        Initialize the executor.
+
+        Args:
+            session_factory: Creates the sessions jobs run with.
+            max_workers: Jobs analyzed at once.
+            max_queued: Jobs waiting for a worker before submissions are refused.
+        """
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._queue: asyncio.Queue[tuple[str, str, str]] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._active: set[str] = set()  # queued or running job IDs
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Start the workers on the running event loop."""
+        if self._workers:
+            return
+        queue: asyncio.Queue[tuple[str, str, str]] = asyncio.Queue(maxsize=self.max_queued)
+        self._queue = queue
+        self._workers = [
+            asyncio.create_task(self._work(queue), name=f"job-executor-{i}")
+            for i in range(self.max_workers)
+        ]
+        logger.info("In-process job executor started", workers=self.max_workers)
+
+    def submit(self, job_id: str, scan_type: str, framework: str) -> bool:
+        """
+        Queue a job for analysis.
+
+        Returns:
+            False if the job is already queued or running.
+
+        Raises:
+            ExecutorUnavailableError: If the executor is stopped or full.
+        """
+        if not self._workers or self._queue is None:
+            raise ExecutorUnavailableError("In-process job executor is not running")
+        if job_id in self._active:
+            return False
+        try:
+            self._queue.put_nowait((job_id, scan_type, framework))
+        except asyncio.QueueFull:
+            raise ExecutorUnavailableError("In-process job queue is full") from None
+        self._active.add(job_id)
+        JOB_EXECUTOR_ACTIVE.inc()
+        return True
+
+    async def join(self) -> None:
+        """Wait until every queued job has finished."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """
+        Let queued jobs finish for up to timeout seconds, then cancel the rest.
+
+        Jobs interrupted mid-analysis are marked failed; jobs that never
+        started stay pending and can be run again.
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Cancelling unfinished in-process jobs", jobs=len(self._active))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        JOB_EXECUTOR_ACTIVE.dec(len(self._active))
+        self._active.clear()
+
+    async def _work(self, queue: asyncio.Queue[tuple[str, str, str]]) -> None:
+        from worker.tasks import run_analysis
+
+        while True:
+            job_id, scan_type, framework = await queue.get()
+            try:
+                await run_analysis(
+                    job_id,
+                    [],
+                    scan_type,
+                    framework,
+                    session_factory=self.session_factory,
+                    progress_callback=None,
+                )
+            except asyncio.CancelledError:
+                await self._mark_interrupted(job_id)
+                raise
+            except Exception as e:
+                # run_analysis has already marked the job failed
+                logger.error("In-process job failed", job_id=job_id, error=str(e))
+            finally:
+                if job_id in self._active:
+                    self._active.discard(job_id)
+                    JOB_EXECUTOR_ACTIVE.dec()
+                queue.task_done()
+
+    async def _mark_interrupted(self, job_id: str) -> None:
+        async with self.session_factory() as db:
+            job = await db.get(Job, UUID(job_id))
+            if job is not None and job.status == JobStatus.RUNNING.value:
+                job.status = JobStatus.FAILED.value
+                job.error_message = "Interrupted by API shutdown"
+                job.completed_at = datetime.now(timezone.utc)
+                await db.commit()
+
+
+@lru_cache
+def get_job_executor() -> JobExecutor:
+    """Get the process-wide executor configured from settings."""
+    from db import async_session_maker
+
+    return JobExecutor(
+        async_session_maker,
+        max_workers=settings.inprocess_executor_workers,
+        max_queued=settings.inprocess_executor_queue_size,
+    )
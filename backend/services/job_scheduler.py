@@ -0,0 +1,412 @@
+"""
+Tenant-aware fair scheduling of analysis jobs in front of Celery.
+
+Jobs are held in Redis and released to Celery only when capacity allows.
+Each lane (scan type) is scheduled on its own, with at most
+scheduler_max_running_jobs running and scheduler_max_jobs_per_user per
+user, so full scans never hold the slots quick scans need. Within a lane,
+waiting jobs are ordered by weighted fair queuing. Each job gets a virtual
+finish tag,
+
+    finish = max(virtual clock, user's previous finish) + cost / weight
+
+where cost is the job's control count. A user with one quick scan is then
+served ahead of another user's backlog of full scans, and users who were
+idle do not build up credit. All state lives in Redis and changes through
+Lua scripts, so every API instance and worker shares one schedule.
+"""
+
+import json
+import time
+from functools import lru_cache
+from typing import Any, Callable
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "shieldagent:sched:"
+
+# Pending jobs inspected per dispatch when looking for one whose user is
+# below the concurrency limit
+DISPATCH_SCAN_WINDOW = 200
+
+# Per-user and per-lane keys are derived inside the scripts, so the
+# schedule must live on a single Redis node (not a cluster). Each lane has
+# its own queue, virtual clock and running limits under
+# <prefix>lane:<lane>:; the job hash (<prefix>job:<id>) records its lane.
+SUBMIT_SCRIPT = """
+local prefix = ARGV[1]
+local job_id = ARGV[2]
+local tenant = ARGV[3]
+local cost = tonumber(ARGV[4])
+local weight = tonumber(ARGV[5])
+local lane = ARGV[7]
+local lp = prefix .. 'lane:' .. lane .. ':'
+
+if redis.call('ZSCORE', lp .. 'pending', job_id) then
+    return redis.call('ZRANK', lp .. 'pending', job_id) + 1
+end
+
+local vclock = tonumber(redis.call('GET', lp .. 'vclock')) or 0
+local last = tonumber(redis.call('GET', lp .. 'tenant:' .. tenant .. ':finish')) or 0
+local finish = math.max(vclock, last) + cost / weight
+
+redis.call('SET', lp .. 'tenant:' .. tenant .. ':finish', tostring(finish))
+redis.call('HSET', prefix .. 'job:' .. job_id, 'tenant', tenant, 'payload', ARGV[6], 'lane', lane)
+redis.call('SADD', prefix .. 'lanes', lane)
+redis.call('ZADD', lp .. 'pending', finish, job_id)
+return redis.call('ZRANK', lp .. 'pending', job_id) + 1
+"""
+
+# Returns {job_id, payload, finish tag} for the next job to run in a lane,
+# or nil
+DISPATCH_SCRIPT = """
+local prefix = ARGV[1]
+local now = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local max_running = tonumber(ARGV[4])
+local per_tenant = tonumber(ARGV[5])
+local window = tonumber(ARGV[6])
+local lp = prefix .. 'lane:' .. ARGV[7] .. ':'
+
+-- Leases of crashed workers expire so their slots are reclaimed
+redis.call('ZREMRANGEBYSCORE', lp .. 'running', '-inf', now)
+if max_running > 0 and redis.call('ZCARD', lp .. 'running') >= max_running then
+    return nil
+end
+
+local candidates = redis.call('ZRANGE', lp .. 'pending', 0, window - 1)
+for _, job_id in ipairs(candidates) do
+    local job_key = prefix .. 'job:' .. job_id
+    local tenant = redis.call('HGET', job_key, 'tenant')
+    if not tenant then
+        redis.call('ZREM', lp .. 'pending', job_id)
+    else
+        local tenant_key = lp .. 'running:' .. tenant
+        redis.call('ZREMRANGEBYSCORE', tenant_key, '-inf', now)
+        if per_tenant <= 0 or redis.call('ZCARD', tenant_key) < per_tenant then
+            local finish = redis.call('ZSCORE', lp .. 'pending', job_id)
+            redis.call('ZREM', lp .. 'pending', job_id)
+            redis.call('ZADD', lp .. 'running', now + lease, job_id)
+            redis.call('ZADD', tenant_key, now + lease, job_id)
+            redis.call('PEXPIRE', job_key, lease)
+            if tonumber(finish) > (tonumber(redis.call('GET', lp .. 'vclock')) or 0) then
+                redis.call('SET', lp .. 'vclock', finish)
+            end
+            return {job_id, redis.call('HGET', job_key, 'payload'), finish}
+        end
+    end
+end
+return nil
+"""
+
+# Puts a dispatched job back in the queue (its publish failed)
+REQUEUE_SCRIPT = """
+local prefix = ARGV[1]
+local job_id = ARGV[2]
+local job_key = prefix .. 'job:' .. job_id
+local tenant = redis.call('HGET', job_key, 'tenant')
+local lane = redis.call('HGET', job_key, 'lane')
+if tenant and lane then
+    local lp = prefix .. 'lane:' .. lane .. ':'
+    redis.call('ZREM', lp .. 'running', job_id)
+    redis.call('ZREM', lp .. 'running:' .. tenant, job_id)
+    redis.call('PERSIST', job_key)
+    redis.call('ZADD', lp .. 'pending', ARGV[3], job_id)
+end
+return 1
+"""
+
+# Frees a running job's slot, or withdraws a job that is still waiting
+RELEASE_SCRIPT = """
+local prefix = ARGV[1]
+local job_id = ARGV[2]
+local job_key = prefix .. 'job:' .. job_id
+local tenant = redis.call('HGET', job_key, 'tenant')
+local lane = redis.call('HGET', job_key, 'lane')
+local removed = 0
+if tenant and lane then
+    local lp = prefix .. 'lane:' .. lane .. ':'
+    removed = redis.call('ZREM', lp .. 'pending', job_id)
+    removed = removed + redis.call('ZREM', lp .. 'running', job_id)
+    redis.call('ZREM', lp .. 'running:' .. tenant, job_id)
+end
+redis.call('DEL', job_key)
+return removed
+"""
+
+# Extends a running job's lease (called when a worker starts the task)
+RENEW_SCRIPT = """
+local prefix = ARGV[1]
+local job_id = ARGV[2]
+local deadline = tonumber(ARGV[3])
+local job_key = prefix .. 'job:' .. job_id
+local tenant = redis.call('HGET', job_key, 'tenant')
+local lane = redis.call('HGET', job_key, 'lane')
+if not tenant or not lane then
+    return 0
+end
+local lp = prefix .. 'lane:' .. lane .. ':'
+if not redis.call('ZSCORE', lp .. 'running', job_id) then
+    return 0
+end
+redis.call('ZADD', lp .. 'running', deadline, job_id)
+redis.call('ZADD', lp .. 'running:' .. tenant, deadline, job_id)
+redis.call('PEXPIREAT', job_key, deadline)
+return 1
+"""
+
+
+def publish_analysis(job_id: str, payload: dict[str, Any]) -> None:
+    """
+    Send a dispatched job to Celery, using the job ID as the task ID.
+
+    Trace headers captured when the job was submitted go out with the
+    message, so the worker continues the submitting request's trace.
+    """
+    from worker.tasks import run_compliance_analysis
+
+    run_compliance_analysis.apply_async(
+        args=[job_id, payload["document_ids"], payload["scan_type"], payload["framework"]],
+        task_id=job_id,
+        headers=payload.get("trace_headers") or None,
+    )
+
+
+class DispatchError(RuntimeError):
+    """Raised when a job taken from the queue could not be published."""
+
+    def __init__(self, job_id: str, error: Exception) -> None:
+        super().__init__(f"Failed to dispatch job {job_id}: {error}")
+        self.job_id = job_id
+
+
+class FairScheduler:
+    """Redis-backed weighted fair queues (one per lane) with per-user concurrency limits."""
+
+    def __init__(
+        self,
+        redis_client: Any,
+        dispatch_fn: Callable[[str, dict[str, Any]], None] = publish_analysis,
+        max_running: int = 8,
+        max_per_tenant: int = 2,
+        lease_seconds: float = 900.0,
+        weights: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.time,
+        prefix: str = KEY_PREFIX,
+        lane_max_running: dict[str, int] | None = None,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            redis_client: Synchronous Redis client.
+            dispatch_fn: Starts a job; called with the job ID and its payload.
+            max_running: Jobs running at once per lane, across all users
+                (0 = unlimited).
+            max_per_tenant: Jobs running at once per lane and user
+                (0 = unlimited).
+            lease_seconds: How long a running slot is held without renewal.
+            weights: Scheduling weight per user ID (default 1.0).
+            clock: Wall clock in seconds, injectable for tests.
+            prefix: Redis key prefix.
+            lane_max_running: max_running overrides by lane, e.g. the
+                concurrency of the workers consuming each scan type.
+        """
+        self.redis = redis_client
+        self.dispatch_fn = dispatch_fn
+        self.max_running = max_running
+        self.lane_max_running = lane_max_running or {}
+        self.max_per_tenant = max_per_tenant
+        self.lease_seconds = lease_seconds
+        self.weights = weights or {}
+        self.prefix = prefix
+        self._clock = clock
+        self._submit = redis_client.register_script(SUBMIT_SCRIPT)
+        self._dispatch = redis_client.register_script(DISPATCH_SCRIPT)
+        self._requeue = redis_client.register_script(REQUEUE_SCRIPT)
+        self._release = redis_client.register_script(RELEASE_SCRIPT)
+        self._renew = redis_client.register_script(RENEW_SCRIPT)
+
+    def _now_ms(self) -> int:
+        return int(self._clock() * 1000)
+
+    def submit(
+        self,
+        job_id: str,
+        tenant: str,
+        cost: int,
+        payload: dict[str, Any],
+        lane: str = "default",
+    ) -> int:
+        """
+        Queue a job and start whatever the limits allow.
+
+        Args:
+            job_id: Job UUID string.
+            tenant: User ID the job counts against.
+            cost: Work estimate, e.g. the number of controls.
+            payload: Arguments passed to the dispatch function.
+            lane: Queue the job waits in and whose limits it counts
+                against (e.g. the scan type).
+
+        Returns:
+            The job's queue position in its lane at submission (1 = next
+            to run).
+
+        Raises:
+            DispatchError: If this job was started but its publish failed.
+                The job stays queued; submitting it again is safe.
+        """
+        weight = self.weights.get(tenant, 1.0)
+        position = self._submit(args=[
+            self.prefix, job_id, tenant, max(cost, 1), weight, json.dumps(payload), lane,
+        ])
+        try:
+            # Only this lane's queue changed
+            self._dispatch_lane(lane, [])
+        except DispatchError as e:
+            # Another job's failure is retried by the periodic dispatch
+            if e.job_id == job_id:
+                raise
+        return int(position)
+
+    def dispatch(self) -> list[str]:
+        """
+        Start pending jobs in every lane until its concurrency limits are reached.
+
+        Returns:
+            IDs of the jobs started.
+
+        Raises:
+            DispatchError: If publishing a job failed (the first failure,
+                after every lane was tried). The job is put back in its
+                place and later jobs in its lane wait for the next dispatch.
+        """
+        started: list[str] = []
+        failure: DispatchError | None = None
+        lanes = sorted(
+            v.decode() if isinstance(v, bytes) else v
+            for v in self.redis.smembers(f"{self.prefix}lanes")
+        )
+        for lane in lanes:
+            try:
+                self._dispatch_lane(lane, started)
+            except DispatchError as e:
+                failure = failure or e
+        if failure is not None:
+            raise failure
+        return started
+
+    def _dispatch_lane(self, lane: str, started: list[str]) -> None:
+        while True:
+            entry = self._dispatch(args=[
+                self.prefix,
+                self._now_ms(),
+                int(self.lease_seconds * 1000),
+                self.lane_max_running.get(lane, self.max_running),
+                self.max_per_tenant,
+                DISPATCH_SCAN_WINDOW,
+                lane,
+            ])
+            if not entry:
+                return
+
+            job_id, payload, finish = (
+                v.decode() if isinstance(v, bytes) else v for v in entry
+            )
+            try:
+                self.dispatch_fn(job_id, json.loads(payload))
+            except Exception as e:
+                # Keep the job's place in line and try again on the next dispatch
+                self._requeue(args=[self.prefix, job_id, finish])
+                logger.error("Failed to dispatch job", job_id=job_id, error=str(e))
+                raise DispatchError(job_id, e) from e
+            started.append(job_id)
+
+    def release(self, job_id: str) -> bool:
+        """
+        Free a finished job's slot (or withdraw a waiting job) and dispatch more.
+
+        Returns:
+            True if the job was known to the scheduler.
+        """
+        removed = self._release(args=[self.prefix, job_id])
+        try:
+            self.dispatch()
+        except DispatchError:
+            pass  # logged; retried by the periodic dispatch
+        return bool(removed)
+
+    def renew(self, job_id: str) -> bool:
+        """Extend a running job's lease from now; False if it is not running."""
+        deadline = self._now_ms() + int(self.lease_seconds * 1000)
+        return bool(self._renew(args=[self.prefix, job_id, deadline]))
+
+    def position(self, job_id: str) -> int | None:
+        """Approximate queue position of a waiting job in its lane (1 = next), or None."""
+        lane = self.redis.hget(f"{self.prefix}job:{job_id}", "lane")
+        if lane is None:
+            return None
+        lane = lane.decode() if isinstance(lane, bytes) else lane
+        rank = self.redis.zrank(f"{self.prefix}lane:{lane}:pending", job_id)
+        return None if rank is None else rank + 1
+
+
+@lru_cache
+def get_job_scheduler() -> FairScheduler:
+    """Get the process-wide scheduler configured from settings."""
+    from core.redis import get_redis_client
+
+    return FairScheduler(
+        get_redis_client(),
+        max_running=settings.scheduler_max_running_jobs,
+        max_per_tenant=settings.scheduler_max_jobs_per_user,
+        lease_seconds=settings.scheduler_lease_seconds,
+        weights=settings.scheduler_tenant_weights,
+        # Never hold back jobs the scan workers have room for
+        lane_max_running={
+            "quick": settings.worker_quick_concurrency,
+            "full": settings.worker_full_concurrency,
+        },
+    )
+
+
+def dispatch_pending_jobs() -> None:
+    """
+    Start whatever waiting jobs the limits allow.
+
+    Run periodically (by the outbox relay) so that requeued jobs and jobs
+    behind an expired lease start even when nothing is submitted or
+    released. Logs rather than raises on Redis or broker errors.
+    """
+    if not settings.scheduler_enabled:
+        return
+    try:
+        get_job_scheduler().dispatch()
+    except DispatchError:
+        pass  # logged by dispatch; retried next time
+    except Exception as e:
+        logger.warning("Failed to dispatch pending jobs", error=str(e))
+
+
+def release_job(job_id: str) -> None:
+    """Release a job's scheduler slot, logging rather than raising on Redis errors."""
+    if not settings.scheduler_enabled:
+        return
+    try:
+        get_job_scheduler().release(job_id)
+    except Exception as e:
+        logger.warning("Failed to release scheduler slot", job_id=job_id, error=str(e))
+
+
+def renew_job_lease(job_id: str) -> None:
+    """Renew a job's scheduler lease, logging rather than raising on Redis errors."""
+    if not settings.scheduler_enabled:
+        return
+    try:
+        get_job_scheduler().renew(job_id)
+    except Exception as e:
+        logger.warning("Failed to renew scheduler lease", job_id=job_id, error=str(e))
@@ -2,15 +2,25 @@
 Job service for compliance analysis job management.
 """
 
-from datetime import datetime, timezone
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
 from uuid import UUID
 
-from sqlalchemy import select, func
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.job import Job, JobStatus
+from core.config import settings
+from core.metrics import JOB_DEDUP_HITS
+from models.job import Job, JobStatus, job_documents
 from models.evidence import EvidenceItem, Gap, EvidenceStatus, GapSeverity
-from schemas.job import JobCreate, JobResponse, JobListResponse
+from models.document import Document
+from schemas.job import JobCreate, JobResponse, JobListResponse, JobMetricsResponse
+from services.framework_registry import get_framework
+from services.outbox import analysis_message
 from schemas.evidence import (
     EvidenceListResponse,
     EvidenceItemResponse,
@@ -19,6 +29,77 @@ from schemas.evidence import (
 )
 
 
+def build_job_metrics(
+    analysis_metrics: dict[str, Any],
+    documents: list[Document],
+    db_write_ms: float,
+) -> dict[str, Any]:
+    """
+    Build the telemetry stored on Job.metrics from an analysis run.
+
+    Args:
+        analysis_metrics: The "metrics" entry of GeminiService.analyze_documents.
+        documents: Analyzed documents, in the order their paths were passed.
+        db_write_ms: Time spent writing and committing the results.
+
+    Returns:
+        JSON-serializable metrics with per-document, per-control, packing,
+        map-reduce and total values.
+    """
+    by_path = {doc.file_path: doc for doc in documents}
+    document_metrics = []
+    for entry in analysis_metrics.get("documents", []):
+        entry = dict(entry)
+        path = entry.pop("path")
+        doc = by_path.get(path)
+        # Report the document rather than its location on the server
+        entry["document_id"] = str(doc.id) if doc else None
+        entry["filename"] = doc.original_filename if doc else Path(path).name
+        document_metrics.append(entry)
+
+    controls = analysis_metrics.get("controls", [])
+    latencies = [c["latency_ms"] for c in controls if c.get("latency_ms") is not None]
+    totals = {
+        "extraction_ms": round(sum(d["extraction_ms"] for d in document_metrics), 1),
+        "llm_latency_ms": round(sum(latencies), 1),
+        "max_control_latency_ms": max(latencies, default=0.0),
+        "prompt_tokens": sum(c.get("prompt_tokens", 0) for c in controls),
+        "response_tokens": sum(c.get("response_tokens", 0) for c in controls),
+        "cache_hits": sum(1 for c in controls if c.get("cache_hit")),
+        "retries": sum(c.get("retries", 0) for c in controls),
+        "parse_failures": sum(1 for c in controls if c.get("parse_failed")),
+        "prefiltered": sum(1 for c in controls if c.get("prefiltered")),
+        "escalations": sum(1 for c in controls if c.get("escalated")),
+        "errors": sum(1 for c in controls if c.get("status") == "error"),
+        "db_write_ms": round(db_write_ms, 1),
+    }
+
+    return {
+        "documents": document_metrics,
+        "controls": controls,
+        "packing": analysis_metrics.get("packing"),
+        "map_reduce": analysis_metrics.get("map_reduce"),
+        "totals": totals,
+    }
+
+
+def job_dedup_key(
+    user_id: UUID,
+    framework_id: str,
+    scan_type: str,
+    documents: list[Document],
+) -> str:
+    """
+    Identify an evidence run by what it analyzes rather than by its IDs.
+
+    Documents are keyed by content hash, so re-uploading the same file
+    still matches. Order does not matter.
+    """
+    contents = sorted(doc.content_hash or f"id:{doc.id}" for doc in documents)
+    material = "\n".join([str(user_id), framework_id, scan_type, *contents])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
 class JobService:
     """Service class for job-related operations."""
 
@@ -35,35 +116,222 @@ class JobService:
         self,
         job_data: JobCreate,
         user_id: UUID,
+        documents: list[Document] | None = None,
+        dedup_key: str | None = None,
     ) -> Job:
         """
-        Create a new compliance analysis job.
+        Create a new compliance analysis job and queue it for analysis.
+
+        The job and its outbox message are committed together; the outbox
+        relay publishes the message to the task queue.
 
         Args:
             job_data: The job creation data.
             user_id: The ID of the user creating the job.
+            documents: The documents the job analyzes.
+            dedup_key: Identity of the run for de-duplication (see job_dedup_key).
 
         Returns:
             The created Job object.
+
+        Raises:
+            FrameworkNotFoundError: If the framework has no control pack.
         """
-        # Determine total controls based on scan type
-        total_controls = 51 if job_data.scan_type == "full" else 8
+        # Determine total controls from the framework's scan profile
+        catalog = get_framework(job_data.framework)
+        total_controls = catalog.control_count(job_data.scan_type)
         
+        job_id = uuid.uuid4()
         job = Job(
+            id=job_id,
             user_id=user_id,
-            job_type=job_data.framework,
+            job_type=catalog.framework_id,
             scan_type=job_data.scan_type,
             status=JobStatus.PENDING.value,
             progress=0,
             total_controls=total_controls,
+            dedup_key=dedup_key,
+            documents=list(documents or []),
+            # Both publish paths use the job ID as the Celery task ID
+            celery_task_id=str(job_id),
         )
 
         self.db.add(job)
+        self.db.add(analysis_message(
+            job_id=str(job_id),
+            user_id=str(user_id),
+            cost=total_controls,
+            document_ids=[str(doc.id) for doc in documents or []],
+            scan_type=job_data.scan_type,
+            framework=catalog.framework_id,
+        ))
         await self.db.commit()
         await self.db.refresh(job)
 
         return job
 
+    async def create_or_reuse_job(
+        self,
+        job_data: JobCreate,
+        user_id: UUID,
+        documents: list[Document],
+    ) -> tuple[Job, bool]:
+        """
+        Create a job unless an identical one can answer the request.
+
+        A duplicate of a pending or running job returns that job. A
+        duplicate of a job that succeeded within the freshness window
+        gets a new job holding copies of its results. Neither case
+        costs any LLM calls.
+
+        Args:
+            job_data: The job creation data.
+            user_id: The ID of the user creating the job.
+            documents: The documents to analyze.
+
+        Returns:
+            The job, and whether it was newly created (and queued).
+
+        Raises:
+            FrameworkNotFoundError: If the framework has no control pack.
+        """
+        if not settings.job_dedup_enabled:
+            return await self.create_job(job_data, user_id, documents), True
+
+        catalog = get_framework(job_data.framework)
+        dedup_key = job_dedup_key(user_id, catalog.framework_id, job_data.scan_type, documents)
+
+        active = await self._find_active_job(dedup_key)
+        if active is not None:
+            JOB_DEDUP_HITS.labels("attached").inc()
+            return active, False
+
+        recent = await self._find_recent_result(dedup_key)
+        if recent is not None:
+            JOB_DEDUP_HITS.labels("cloned").inc()
+            return await self._clone_job(recent, documents), False
+
+        try:
+            return await self.create_job(job_data, user_id, documents, dedup_key), True
+        except IntegrityError:
+            # A concurrent identical submission created the job first
+            await self.db.rollback()
+            active = await self._find_active_job(dedup_key)
+            if active is None:
+                raise
+            JOB_DEDUP_HITS.labels("attached").inc()
+            return active, False
+
+    async def reset_for_rerun(self, job: Job) -> Job | None:
+        """
+        Move a pending or failed job back to PENDING so it can run again.
+
+        A failed job gave up its de-duplication key, so an identical job may
+        have started since; at most one active job may hold the key.
+
+        Args:
+            job: The job to re-run.
+
+        Returns:
+            None if the job was reset, or the identical active job that
+            holds its key (the job is left unchanged).
+        """
+        if job.dedup_key is not None and job.status == JobStatus.FAILED.value:
+            active = await self._find_active_job(job.dedup_key)
+            if active is not None and active.id != job.id:
+                return active
+
+        job.status = JobStatus.PENDING.value
+        job.progress = 0
+        job.error_message = None
+        job.completed_at = None
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            # An identical job became active since the check
+            await self.db.rollback()
+            active = await self._find_active_job(job.dedup_key) if job.dedup_key else None
+            if active is None:
+                raise
+            return active
+        return None
+
+    async def _find_active_job(self, dedup_key: str) -> Job | None:
+        result = await self.db.execute(
+            select(Job).where(
+                Job.dedup_key == dedup_key,
+                Job.status.in_([JobStatus.PENDING.value, JobStatus.RUNNING.value]),
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def _find_recent_result(self, dedup_key: str) -> Job | None:
+        freshness = settings.job_dedup_freshness_seconds
+        if freshness <= 0:
+            return None
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=freshness)
+        result = await self.db.execute(
+            select(Job)
+            .where(
+                Job.dedup_key == dedup_key,
+                Job.status == JobStatus.SUCCEEDED.value,
+                Job.completed_at >= cutoff,
+            )
+            .order_by(Job.completed_at.desc())
+            .limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def _clone_job(self, source: Job, documents: list[Document]) -> Job:
+        """Create a succeeded job holding copies of another job's results."""
+        now = datetime.now(timezone.utc)
+        job = Job(
+            user_id=source.user_id,
+            job_type=source.job_type,
+            scan_type=source.scan_type,
+            status=JobStatus.SUCCEEDED.value,
+            progress=100,
+            total_controls=source.total_controls,
+            dedup_key=source.dedup_key,
+            source_job_id=source.id,
+            started_at=now,
+            completed_at=now,
+            documents=list(documents),
+        )
+        self.db.add(job)
+        await self.db.flush()
+
+        evidence_items = await self.db.execute(
+            select(EvidenceItem).where(EvidenceItem.job_id == source.id)
+        )
+        for item in evidence_items.scalars():
+            self.db.add(EvidenceItem(
+                job_id=job.id,
+                control_id=item.control_id,
+                status=item.status,
+                confidence=item.confidence,
+                summary=item.summary,
+                evidence_quote=item.evidence_quote,
+                source_location=item.source_location,
+                raw_llm_response=item.raw_llm_response,
+                source_document_ids=item.source_document_ids,
+                evidence_metadata=item.evidence_metadata,
+            ))
+
+        gaps = await self.db.execute(select(Gap).where(Gap.job_id == source.id))
+        for gap in gaps.scalars():
+            self.db.add(Gap(
+                job_id=job.id,
+                control_id=gap.control_id,
+                severity=gap.severity,
+                description=gap.description,
+                remediation_suggestion=gap.remediation_suggestion,
+            ))
+
+        await self.db.commit()
+        await self.db.refresh(job)
+        return job
+
     async def get_job(
         self,
         job_id: UUID,
@@ -87,6 +355,77 @@ class JobService:
         )
         return result.scalar_one_or_none()
 
+    async def get_job_documents(self, job_id: UUID) -> list[Document]:
+        """
+        Get the documents a job was created for.
+
+        Args:
+            job_id: The job UUID.
+
+        Returns:
+            The job's documents, oldest upload first.
+        """
+        result = await self.db.execute(
+            select(Document)
+            .join(job_documents, job_documents.c.document_id == Document.id)
+            .where(job_documents.c.job_id == job_id)
+            .order_by(Document.uploaded_at, Document.id)
+        )
+        return list(result.scalars().all())
+
+    async def link_owner_documents(self, job: Job) -> list[Document]:
+        """
+        Link a job with no document rows to all of its owner's documents.
+
+        Jobs created before job_documents existed, and never analyzed, have
+        no rows to backfill from; they analyze the owner's documents as runs
+        did then. The rows are committed with the job's next update.
+
+        Args:
+            job: The job to link.
+
+        Returns:
+            The linked documents, oldest upload first.
+        """
+        result = await self.db.execute(
+            select(Document)
+            .where(Document.user_id == job.user_id)
+            .order_by(Document.uploaded_at, Document.id)
+        )
+        documents = list(result.scalars().all())
+        if documents:
+            await self.db.execute(
+                insert(job_documents),
+                [{"job_id": job.id, "document_id": doc.id} for doc in documents],
+            )
+        return documents
+
+    async def list_document_jobs(
+        self,
+        document_id: UUID,
+        user_id: UUID,
+    ) -> list[Job]:
+        """
+        Get the jobs that analyzed a document, newest first.
+
+        Args:
+            document_id: The document UUID.
+            user_id: The user's UUID.
+
+        Returns:
+            Jobs whose document set includes the document.
+        """
+        result = await self.db.execute(
+            select(Job)
+            .join(job_documents, job_documents.c.job_id == Job.id)
+            .where(
+                job_documents.c.document_id == document_id,
+                Job.user_id == user_id,
+            )
+            .order_by(Job.created_at.desc())
+        )
+        return list(result.scalars().all())
+
     async def list_jobs(
         self,
         user_id: UUID,
@@ -211,6 +550,10 @@ class JobService:
             1 for e in evidence_items
             if e.status == EvidenceStatus.NEEDS_REVIEW.value
         )
+        not_applicable = sum(
+            1 for e in evidence_items
+            if e.status == EvidenceStatus.NOT_APPLICABLE.value
+        )
 
         return EvidenceListResponse(
             evidence_items=[
@@ -220,6 +563,7 @@ class JobService:
             passing=passing,
             failing=failing,
             needs_review=needs_review,
+            not_applicable=not_applicable,
         )
 
     async def get_job_gaps(
@@ -267,6 +611,32 @@ class JobService:
             by_severity=by_severity,
         )
 
+    async def get_job_metrics(
+        self,
+        job_id: UUID,
+        user_id: UUID,
+    ) -> JobMetricsResponse | None:
+        """
+        Get the performance telemetry recorded for a job.
+
+        Args:
+            job_id: The job UUID.
+            user_id: The user's UUID.
+
+        Returns:
+            JobMetricsResponse if job exists, None otherwise.
+        """
+        job = await self.get_job(job_id, user_id)
+        if not job:
+            return None
+
+        return JobMetricsResponse(
+            job_id=job.id,
+            status=job.status,
+            available=job.metrics is not None,
+            **(job.metrics or {}),
+        )
+
     async def delete_job(
         self,
         job_id: UUID,
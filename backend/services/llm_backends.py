@@ -0,0 +1,359 @@
+"""
+LLM backends for compliance analysis.
+
+The provider pool builds its models through a backend, so the analysis
+pipeline can run against Google Gemini or against a deterministic offline
+stub. The stub needs no API key or network access and has configurable
+latency, error rates and 429 injection, which makes it suitable for
+benchmarks, load tests and demos.
+
+Gemini models share one gRPC client per API key for the life of the
+process. Its channel sends keep-alive pings while idle and is connected at
+startup, so no job pays for channel setup or a TLS handshake.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+import grpc
+from google.ai.generativelanguage_v1beta.services.generative_service.transports import (
+    GenerativeServiceGrpcTransport,
+)
+
+from core.config import settings
+from services.llm_response import VERDICT_SCHEMA
+
+
+class LLMBackend(ABC):
+    """Creates model handles exposing `model_name` and `generate_content()`."""
+
+    name: str = ""
+    supports_context_cache: bool = False
+
+    def configure(self, api_key: str) -> None:
+        """Apply process-wide configuration for the primary API key."""
+
+    def generation_config(self, schema: dict[str, Any] = VERDICT_SCHEMA) -> Any:
+        """Generation settings for replies matching a schema (None for defaults)."""
+        return None
+
+    def warm_up(self, model: Any, timeout: float) -> None:
+        """Open the model's connection ahead of its first request."""
+
+    def count_tokens(self, model: Any, texts: list[str]) -> int | None:
+        """Exact token count of texts taken together (None if unsupported)."""
+        return None
+
+    @abstractmethod
+    def create_model(self, api_key: str, model_name: str, primary: bool) -> Any:
+        """
+        Create a model handle billed to an API key.
+
+        Args:
+            api_key: Key the model's requests are made with.
+            model_name: Model to call.
+            primary: Whether this is the globally configured key.
+
+        Returns:
+            Object with `model_name` and a blocking `generate_content(contents)`
+            returning a response with a `.text` attribute.
+        """
+
+
+# genai.configure() replaces module-level client state, so concurrent
+# callers must not interleave; the key is applied once per process
+_configure_lock = threading.Lock()
+_configured_key: str | None = None
+
+
+def configure_genai(api_key: str) -> None:
+    """Point genai's default clients at an API key, once per process."""
+    global _configured_key
+    with _configure_lock:
+        if _configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+
+
+def _keepalive_channel(host: str, options: list | None = None, **kwargs) -> grpc.Channel:
+    """Create the transport's gRPC channel with keep-alive pings enabled."""
+    keepalive_ms = int(settings.gemini_keepalive_seconds * 1000)
+    options = [*(options or [])]
+    if keepalive_ms > 0:
+        options += [
+            ("grpc.keepalive_time_ms", keepalive_ms),
+            ("grpc.keepalive_timeout_ms", 20000),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0),
+        ]
+    return GenerativeServiceGrpcTransport.create_channel(host, options=options, **kwargs)
+
+
+def _keepalive_transport(**kwargs) -> GenerativeServiceGrpcTransport:
+    return GenerativeServiceGrpcTransport(channel=_keepalive_channel, **kwargs)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai."""
+
+    name = "gemini"
+    supports_context_cache = True
+
+    def __init__(self) -> None:
+        self._clients: dict[str, glm.GenerativeServiceClient] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, api_key: str) -> None:
+        configure_genai(api_key)
+
+    def generation_config(
+        self, schema: dict[str, Any] = VERDICT_SCHEMA
+    ) -> genai.GenerationConfig | None:
+        if not settings.gemini_json_mode:
+            return None
+        # Constrain output to a single object (a verdict by default) so it
+        # parses in one pass
+        return genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=schema,
+        )
+
+    def client_for(self, api_key: str) -> glm.GenerativeServiceClient:
+        """Get the backend's client for an API key, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = glm.GenerativeServiceClient(
+                    client_options={"api_key": api_key},
+                    transport=_keepalive_transport,
+                )
+                self._clients[api_key] = client
+        return client
+
+    def create_model(self, api_key: str, model_name: str, primary: bool) -> genai.GenerativeModel:
+        model = genai.GenerativeModel(model_name, generation_config=self.generation_config())
+        # Bind every model to its key's long-lived client: requests are billed
+        # to the endpoint's key, and models of one key share a channel
+        model._client = self.client_for(api_key)
+        return model
+
+    def warm_up(self, model: genai.GenerativeModel, timeout: float) -> None:
+        grpc.channel_ready_future(model._client.transport.grpc_channel).result(timeout=timeout)
+
+    def count_tokens(self, model: genai.GenerativeModel, texts: list[str]) -> int | None:
+        return model.count_tokens(texts).total_tokens
+
+
+class StubAPIError(Exception):
+    """Injected API failure carrying an HTTP status like google.api_core errors."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the offline stub model."""
+    latency_ms: float = 800.0
+    latency_distribution: str = "lognormal"  # fixed | uniform | lognormal
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    seed: int = 0
+
+
+class StubUsage:
+    """Usage metadata estimated at four characters per token."""
+
+    def __init__(self, prompt_chars: int, response_chars: int):
+        self.prompt_token_count = prompt_chars // 4
+        self.candidates_token_count = response_chars // 4
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class StubResponse:
+    """Minimal response with the attributes the pipeline reads."""
+
+    def __init__(self, text: str, usage_metadata: StubUsage | None = None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+# Words too generic to count as evidence for a "Look for" item
+_STOP_WORDS = {"with", "from", "that", "this", "their", "there", "which", "where"}
+
+
+# Map-step instructions list their controls under this heading
+_MAP_HEADING = re.compile(r"^CONTROLS:$", re.MULTILINE)
+_MAP_CONTROL = re.compile(r"^- (\S+) \(")
+
+# Request digests whose attempt counts are kept for retries
+_MAX_TRACKED_REQUESTS = 4096
+
+
+def _look_for_items(instructions: str) -> list[str]:
+    """Extract the bullet list following "Look for:" in control instructions."""
+    match = re.search(r"Look for:\n((?:- .*\n?)+)", instructions)
+    if not match:
+        return []
+    return [line[2:].strip() for line in match.group(1).splitlines() if line.startswith("- ")]
+
+
+def _map_controls(instructions: str) -> dict[str, list[str]]:
+    """Control IDs and their "Look for" items listed in map-step instructions."""
+    controls: dict[str, list[str]] = {}
+    current: list[str] | None = None
+    for line in instructions.splitlines():
+        match = _MAP_CONTROL.match(line)
+        if match:
+            current = controls.setdefault(match.group(1), [])
+        elif current is not None and line.startswith("  Look for: "):
+            current.extend(item.strip() for item in line[12:].split(";") if item.strip())
+    return controls
+
+
+def _item_keywords(item: str) -> list[str]:
+    """Words of a "Look for" item that count as evidence when found."""
+    return [w for w in re.findall(r"[a-z][a-z/-]{3,}", item.lower()) if w not in _STOP_WORDS]
+
+
+class StubModel:
+    """
+    Deterministic stand-in for a Gemini model.
+
+    Verdicts depend only on the request: a control passes when most of its
+    "Look for" items share a keyword with the documents. Map-step requests
+    get findings instead: the first line of the section holding a keyword
+    of each such item. Latency and injected
+    failures are drawn from a generator seeded by the request and its attempt
+    number, so reruns with the same seed reproduce the same trace while
+    retries of a failed request can still succeed.
+    """
+
+    def __init__(self, model_name: str, config: StubConfig):
+        self.model_name = model_name
+        self.config = config
+        # Attempts of requests that failed, oldest first; requests that are
+        # never retried to success are evicted past _MAX_TRACKED_REQUESTS
+        self._attempts: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _rng(self, digest: str) -> random.Random:
+        with self._lock:
+            attempt = self._attempts.pop(digest, 0)
+            self._attempts[digest] = attempt + 1
+            while len(self._attempts) > _MAX_TRACKED_REQUESTS:
+                self._attempts.popitem(last=False)
+        return random.Random(f"{self.config.seed}:{digest}:{attempt}")
+
+    def _latency_seconds(self, rng: random.Random) -> float:
+        mean = self.config.latency_ms / 1000
+        if self.config.latency_distribution == "fixed":
+            return mean
+        if self.config.latency_distribution == "uniform":
+            return rng.uniform(0, 2 * mean)
+        # Lognormal with the configured median
+        return rng.lognormvariate(math.log(mean), self.config.latency_sigma) if mean > 0 else 0.0
+
+    def _verdict(self, documents: str, instructions: str) -> dict:
+        items = _look_for_items(instructions)
+        text = documents.lower()
+        found = [item for item in items if any(w in text for w in _item_keywords(item))]
+
+        ratio = len(found) / len(items) if items else 0.0
+        if ratio >= 0.5:
+            status = "pass"
+        elif found:
+            status = "needs_review"
+        else:
+            status = "fail"
+
+        return {
+            "status": status,
+            "confidence": round(0.5 + ratio / 2, 2),
+            "summary": f"Stub analysis matched {len(found)} of {len(items)} expected evidence items.",
+            "evidence_quote": found[0] if found else None,
+            "gaps": [item for item in items if item not in found],
+        }
+
+    def _findings(self, documents: str, instructions: str) -> dict:
+        lines = [line.strip() for line in documents.splitlines() if line.strip()]
+        findings = []
+        for control_id, items in _map_controls(instructions).items():
+            for item in items:
+                words = _item_keywords(item)
+                quote = next((line for line in lines if any(w in line.lower() for w in words)), None)
+                if quote is not None:
+                    findings.append({"control_id": control_id, "quote": quote[:200], "note": item})
+        return {"findings": findings}
+
+    def generate_content(self, contents, **kwargs) -> StubResponse:
+        """Simulate a blocking generate_content call."""
+        if isinstance(contents, str):
+            contents = [contents]
+        parts = [str(part) for part in contents]
+        digest = hashlib.sha256(
+            "\x00".join([self.model_name, *parts]).encode()
+        ).hexdigest()
+
+        rng = self._rng(digest)
+        time.sleep(self._latency_seconds(rng))
+
+        roll = rng.random()
+        if roll < self.config.throttle_rate:
+            raise StubAPIError(429, "Resource has been exhausted (stub)")
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            raise StubAPIError(503, "Service unavailable (stub)")
+
+        with self._lock:
+            self._attempts.pop(digest, None)
+
+        documents = "\n".join(parts[:-1])
+        if _MAP_HEADING.search(parts[-1]):
+            text = json.dumps(self._findings(documents, parts[-1]))
+        else:
+            text = json.dumps(self._verdict(documents, parts[-1]))
+        return StubResponse(text, StubUsage(sum(map(len, parts)), len(text)))
+
+
+class StubBackend(LLMBackend):
+    """Offline backend returning deterministic stub verdicts."""
+
+    name = "stub"
+    supports_context_cache = False
+
+    def __init__(self, config: StubConfig | None = None):
+        self.config = config or StubConfig()
+
+    def create_model(self, api_key: str, model_name: str, primary: bool) -> StubModel:
+        return StubModel(model_name, self.config)
+
+    def count_tokens(self, model: StubModel, texts: list[str]) -> int | None:
+        # Same four-characters-per-token rule as StubUsage
+        return sum(map(len, texts)) // 4
+
+
+def get_llm_backend() -> LLMBackend:
+    """Build the backend selected by settings.llm_backend."""
+    if settings.llm_backend == "stub":
+        return StubBackend(StubConfig(
+            latency_ms=settings.llm_stub_latency_ms,
+            latency_distribution=settings.llm_stub_latency_distribution,
+            latency_sigma=settings.llm_stub_latency_sigma,
+            error_rate=settings.llm_stub_error_rate,
+            throttle_rate=settings.llm_stub_throttle_rate,
+            seed=settings.llm_stub_seed,
+        ))
+    return GeminiBackend()
@@ -0,0 +1,121 @@
+"""
+Structured verdict output: the response schema requested from the model
+and the parser for its replies.
+
+With JSON mode on, Gemini returns exactly one JSON object matching
+VERDICT_SCHEMA. A single strict orjson parse handles that. Replies from
+models or prompts without JSON mode can still be wrapped in code fences
+or prose, or carry trailing commas. A bounded repair step handles these:
+a fixed set of linear-time fixes, each tried at most once.
+"""
+
+import re
+from typing import Any, Literal, NamedTuple
+
+import orjson
+
+VERDICT_STATUSES = ("pass", "fail", "needs_review")
+
+# OpenAPI-subset schema accepted by GenerationConfig.response_schema
+VERDICT_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "status": {"type": "string", "enum": list(VERDICT_STATUSES)},
+        "confidence": {"type": "number"},
+        "summary": {"type": "string"},
+        "evidence_quote": {"type": "string", "nullable": True},
+        "gaps": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["status", "confidence", "summary", "gaps"],
+}
+
+ParseMethod = Literal["strict", "repaired", "failed"]
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+class ParsedVerdict(NamedTuple):
+    """A parsed verdict and how it was obtained."""
+
+    verdict: dict[str, Any]
+    method: ParseMethod
+
+
+def _loads_object(text: str) -> dict | None:
+    try:
+        value = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _repair_candidates(text: str):
+    """Yield progressively repaired versions of a malformed reply."""
+    # Outermost braces drop code fences and surrounding prose
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return
+    body = text[start:end + 1]
+    yield body
+    yield _TRAILING_COMMA.sub(r"\1", body)
+
+
+def _normalize(verdict: dict[str, Any]) -> dict[str, Any]:
+    """Coerce verdict fields to the types the rest of the pipeline expects."""
+    status = str(verdict.get("status", "")).lower()
+    verdict["status"] = status if status in VERDICT_STATUSES else "needs_review"
+
+    try:
+        confidence = float(verdict.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        confidence = 0.0
+    verdict["confidence"] = min(max(confidence, 0.0), 1.0)
+
+    gaps = verdict.get("gaps") or []
+    verdict["gaps"] = [str(g) for g in gaps] if isinstance(gaps, list) else [str(gaps)]
+    verdict.setdefault("summary", "")
+    verdict.setdefault("evidence_quote", None)
+    return verdict
+
+
+def parse_json_object(response_text: str) -> tuple[dict | None, ParseMethod]:
+    """
+    Parse a reply expected to hold one JSON object, repairing it if needed.
+
+    Returns:
+        The object (None if nothing parses) and the parse method.
+    """
+    value = _loads_object(response_text)
+    if value is not None:
+        return value, "strict"
+
+    for candidate in _repair_candidates(response_text):
+        value = _loads_object(candidate)
+        if value is not None:
+            return value, "repaired"
+    return None, "failed"
+
+
+def parse_verdict(response_text: str) -> ParsedVerdict:
+    """
+    Parse a model reply into a verdict dict.
+
+    Args:
+        response_text: Raw response text.
+
+    Returns:
+        The normalized verdict and the parse method. When nothing parses,
+        the verdict is a needs_review placeholder with parse_failed set.
+    """
+    verdict, method = parse_json_object(response_text)
+    if verdict is not None:
+        return ParsedVerdict(_normalize(verdict), method)
+
+    return ParsedVerdict({
+        "status": "needs_review",
+        "confidence": 0.0,
+        "summary": "Could not parse AI response",
+        "evidence_quote": None,
+        "gaps": ["Response parsing failed"],
+        "parse_failed": True,
+    }, "failed")
@@ -0,0 +1,260 @@
+"""
+Map-reduce evaluation for evidence sets larger than the context window.
+
+When a job's documents do not fit the prompt token budget, they are split
+into sections of whole paragraphs. The map step asks a model, for each
+section and each group of controls from one category, for findings:
+quotes and facts bearing on the controls. Sections are mapped in
+parallel, on the fast tier when one is configured. The reduce step is the
+usual verdict prompt for each control, with its findings from every
+section in place of the documents, so no part of the evidence is dropped.
+
+Map outputs are cached in Redis under a hash of the section text and the
+map instructions (which name the controls), so unchanged sections of a
+re-run are never mapped again.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any
+
+import orjson
+
+from core.config import settings
+from core.logging import get_logger
+from services.llm_response import parse_json_object
+from services.relevance_filter import look_for_items
+from services.token_budget import TokenCounter
+
+logger = get_logger(__name__)
+
+KEY_PREFIX = "shieldagent:map:"
+
+# Findings kept per control and section, and characters kept per quote
+MAX_FINDINGS_PER_SECTION = 5
+MAX_QUOTE_CHARS = 500
+
+# OpenAPI-subset schema for map replies
+FINDINGS_SCHEMA: dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "control_id": {"type": "string"},
+                    "quote": {"type": "string"},
+                    "note": {"type": "string"},
+                },
+                "required": ["control_id", "quote"],
+            },
+        },
+    },
+    "required": ["findings"],
+}
+
+MAP_INSTRUCTIONS = """
+
+The text above is one section of a larger evidence set. Extract findings
+from this section only, for the controls below: direct quotes or specific
+facts showing that a control is, or is not, in place. Skip controls the
+section says nothing about.
+
+CONTROLS:
+{controls}
+
+Respond with JSON: {{"findings": [{{"control_id": "...", "quote": "...", "note": "..."}}]}}"""
+
+
+@dataclass(frozen=True)
+class Finding:
+    """Evidence for one control found in one section."""
+
+    control_id: str
+    section: int
+    quote: str
+    note: str = ""
+
+
+@dataclass
+class MapResult:
+    """Findings of the map step over every section and control group."""
+
+    sections: int
+    groups: int
+    findings: dict[str, list[Finding]] = field(default_factory=dict)
+    # Sections whose map call failed, by control ID
+    unreviewed: dict[str, list[int]] = field(default_factory=dict)
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    latency_ms: float = 0.0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+
+    def to_metrics(self) -> dict:
+        """Map-step statistics for job telemetry."""
+        return {
+            "sections": self.sections,
+            "groups": self.groups,
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "errors": self.errors,
+            "latency_ms": round(self.latency_ms, 1),
+            "prompt_tokens": self.prompt_tokens,
+            "response_tokens": self.response_tokens,
+        }
+
+
+def control_groups(controls: list[dict], max_size: int) -> list[list[dict]]:
+    """Group controls by category, splitting categories larger than max_size."""
+    by_category: dict[str, list[dict]] = {}
+    for control in controls:
+        by_category.setdefault(str(control.get("category", "")).lower(), []).append(control)
+
+    size = max(1, max_size)
+    return [
+        members[start:start + size]
+        for members in by_category.values()
+        for start in range(0, len(members), size)
+    ]
+
+
+def build_map_instructions(group: list[dict]) -> str:
+    """Map-step instructions following a section, listing the group's controls."""
+    lines = []
+    for control in group:
+        lines.append(f"- {control['control_id']} ({control['title']}): {control['description']}")
+        items = look_for_items(control)
+        if items:
+            lines.append(f"  Look for: {'; '.join(items)}")
+    return MAP_INSTRUCTIONS.format(controls="\n".join(lines))
+
+
+def section_digest(model_name: str, instructions: str, text: str) -> str:
+    """Cache key of a section mapped with some instructions on a model."""
+    return hashlib.sha256(
+        "\x00".join([model_name, instructions, text]).encode()
+    ).hexdigest()
+
+
+def parse_findings(response_text: str, control_ids: set[str]) -> list[dict] | None:
+    """
+    Parse a map reply into finding dicts for the group's controls.
+
+    Returns:
+        Findings with control_id, quote and note (at most
+        MAX_FINDINGS_PER_SECTION per control), or None if the reply does
+        not parse.
+    """
+    value, _ = parse_json_object(response_text)
+    if value is None or not isinstance(value.get("findings"), list):
+        return None
+
+    by_id = {c.upper(): c for c in control_ids}
+    kept: dict[str, int] = {}
+    findings = []
+    for item in value["findings"]:
+        if not isinstance(item, dict):
+            continue
+        control_id = by_id.get(str(item.get("control_id", "")).upper())
+        quote = str(item.get("quote") or "").strip()
+        if control_id is None or not quote or kept.get(control_id, 0) >= MAX_FINDINGS_PER_SECTION:
+            continue
+        kept[control_id] = kept.get(control_id, 0) + 1
+        findings.append({
+            "control_id": control_id,
+            "quote": quote[:MAX_QUOTE_CHARS],
+            "note": str(item.get("note") or "").strip()[:MAX_QUOTE_CHARS],
+        })
+    return findings
+
+
+def format_findings(
+    findings: list[Finding],
+    sections: int,
+    unreviewed: list[int],
+    counter: TokenCounter,
+    max_tokens: int,
+) -> str:
+    """
+    Render a control's findings as the document text of its reduce prompt.
+
+    Args:
+        findings: The control's findings, in section order.
+        sections: Number of sections the evidence was split into.
+        unreviewed: Sections whose map call failed.
+        counter: Token counter of the reduce model.
+        max_tokens: Budget for the text; findings past it are left out
+            and counted in a note.
+    """
+    lines = [
+        f"[The evidence set was too large to send whole. It was split into {sections} "
+        "sections, and these findings for the control below were extracted from all of them.]",
+        "",
+    ]
+    notes = []
+    if unreviewed:
+        listed = ", ".join(str(s + 1) for s in unreviewed)
+        noun = "Section" if len(unreviewed) == 1 else "Sections"
+        notes.append(f"[{noun} {listed} could not be reviewed; treat the evidence as incomplete.]")
+    if not findings:
+        lines.append("No section contained evidence for this control.")
+
+    # Leave room for the notes, including one about omitted findings
+    remaining = max_tokens - counter.count("\n".join(lines + notes)) - 32
+    for index, finding in enumerate(findings):
+        line = f'- Section {finding.section + 1}: "{finding.quote}"'
+        if finding.note:
+            line += f" ({finding.note})"
+        tokens = counter.count(line)
+        if tokens > remaining:
+            notes.insert(0, f"[{len(findings) - index} further findings omitted for length.]")
+            break
+        lines.append(line)
+        remaining -= tokens
+    if notes:
+        lines += ["", *notes]
+    return "\n".join(lines)
+
+
+class MapCache:
+    """Redis-backed cache of map-step findings by section digest."""
+
+    def __init__(self, redis_client: Any, ttl_seconds: int, prefix: str = KEY_PREFIX) -> None:
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get_many(self, digests: list[str]) -> dict[str, list[dict]]:
+        """Cached findings by digest; misses and Redis errors are left out."""
+        if not digests:
+            return {}
+        try:
+            values = self.redis.mget([f"{self.prefix}{d}" for d in digests])
+        except Exception as e:
+            logger.warning("Map cache unavailable", error=str(e))
+            return {}
+        return {d: orjson.loads(v) for d, v in zip(digests, values) if v is not None}
+
+    def set_many(self, entries: dict[str, list[dict]]) -> None:
+        """Store findings by digest, logging rather than raising on Redis errors."""
+        if not entries:
+            return
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for digest, findings in entries.items():
+                pipeline.set(f"{self.prefix}{digest}", orjson.dumps(findings), ex=self.ttl_seconds)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning("Failed to store map findings", error=str(e))
+
+
+@lru_cache
+def get_map_cache() -> MapCache:
+    """Get the process-wide map cache."""
+    from core.redis import get_redis_client
+
+    return MapCache(get_redis_client(), ttl_seconds=settings.gemini_map_cache_ttl_seconds)
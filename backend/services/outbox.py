@@ -0,0 +1,255 @@
+"""
+Transactional outbox for handing jobs to the task queue.
+
+The API does not talk to the broker. A new job is committed together
+with an outbox row describing the work (see JobService.create_job). A
+relay then reads due rows in batches and publishes them. Analysis
+messages go to the fair scheduler, or straight to Celery when the
+scheduler is off. Published rows are deleted. A failed publish is
+retried with capped exponential backoff. Request latency therefore does
+not depend on broker health, and a job is never committed without its
+message.
+
+Delivery is at least once: a relay that dies between publishing and
+deleting republishes the row. The task ID is the job ID, and the worker
+skips jobs that have already finished.
+
+The relay runs inside the API process (outbox_relay_embedded) or as its
+own process: python -m worker.outbox_relay. Relays lock rows with
+SKIP LOCKED, so any number of them can run side by side. The relay loop
+also runs periodic work (the scheduler's dispatch, which starts jobs that
+were requeued or whose slots freed up by lease expiry).
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.logging import get_logger
+from core.metrics import OUTBOX_LAG, OUTBOX_PUBLISHED
+from core.tracing import capture_trace_headers
+from models.outbox import OutboxMessage
+from services.job_scheduler import dispatch_pending_jobs, get_job_scheduler, publish_analysis
+
+logger = get_logger(__name__)
+
+ANALYSIS_TOPIC = "analysis.submit"
+
+
+def analysis_message(
+    job_id: str,
+    user_id: str,
+    cost: int,
+    document_ids: list[str],
+    scan_type: str,
+    framework: str,
+) -> OutboxMessage:
+    """
+    Build the outbox row that starts a job's analysis.
+
+    The row carries the submitting request's trace context and the
+    submission time, which the task message is published with.
+    """
+    return OutboxMessage(
+        topic=ANALYSIS_TOPIC,
+        payload={
+            "job_id": job_id,
+            "user_id": user_id,
+            "cost": cost,
+            "document_ids": document_ids,
+            "scan_type": scan_type,
+            "framework": framework,
+            "trace_headers": capture_trace_headers(),
+        },
+    )
+
+
+def _publish_analysis(payload: dict[str, Any]) -> None:
+    task_args = {
+        "document_ids": payload["document_ids"],
+        "scan_type": payload["scan_type"],
+        "framework": payload["framework"],
+        "trace_headers": payload.get("trace_headers") or {},
+    }
+    if settings.scheduler_enabled:
+        # The fair scheduler starts the task (task ID = job ID) when the
+        # user and the cluster have capacity; each scan type is its own lane
+        get_job_scheduler().submit(
+            payload["job_id"],
+            payload["user_id"],
+            payload["cost"],
+            task_args,
+            lane=payload["scan_type"],
+        )
+    else:
+        publish_analysis(payload["job_id"], task_args)
+
+
+PUBLISHERS: dict[str, Callable[[dict[str, Any]], None]] = {
+    ANALYSIS_TOPIC: _publish_analysis,
+}
+
+
+def publish_message(topic: str, payload: dict[str, Any]) -> None:
+    """Publish one outbox message; raises if the broker rejects it."""
+    PUBLISHERS[topic](payload)
+
+
+class OutboxRelay:
+    """Publishes due outbox rows in batches."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        publish_fn: Callable[[str, dict[str, Any]], None] = publish_message,
+        batch_size: int = 100,
+        poll_interval: float = 0.5,
+        retry_max_seconds: float = 60.0,
+        periodic_fn: Callable[[], Any] | None = None,
+        periodic_interval: float = 5.0,
+    ) -> None:
+        """
+        Initialize the relay.
+
+        Args:
+            session_factory: Creates the sessions the relay reads rows with.
+            publish_fn: Publishes one message given its topic and payload.
+            batch_size: Rows read and published per transaction.
+            poll_interval: Sleep between polls when no rows were due.
+            retry_max_seconds: Cap on the backoff after failed publishes.
+            periodic_fn: Blocking work run from the relay loop (in a thread)
+                every periodic_interval seconds.
+            periodic_interval: Seconds between periodic_fn runs.
+        """
+        self.session_factory = session_factory
+        self.publish_fn = publish_fn
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_max_seconds = retry_max_seconds
+        self.periodic_fn = periodic_fn
+        self.periodic_interval = periodic_interval
+        self._periodic_at = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def relay_once(self) -> int:
+        """
+        Publish one batch of due messages.
+
+        Returns:
+            Number of messages published.
+        """
+        async with self.session_factory() as db:
+            now = datetime.now(timezone.utc)
+            result = await db.execute(
+                select(OutboxMessage)
+                .where(OutboxMessage.available_at <= now)
+                .order_by(OutboxMessage.available_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            messages = list(result.scalars().all())
+            if not messages:
+                return 0
+
+            # One thread hop per batch; publishing is blocking broker I/O
+            errors = await asyncio.to_thread(self._publish_batch, messages)
+
+            published = []
+            for message, error in zip(messages, errors):
+                if error is None:
+                    published.append(message.id)
+                    OUTBOX_PUBLISHED.labels(message.topic, "published").inc()
+                    if message.created_at is not None:
+                        created_at = message.created_at
+                        if created_at.tzinfo is None:
+                            created_at = created_at.replace(tzinfo=timezone.utc)
+                        OUTBOX_LAG.observe(max((now - created_at).total_seconds(), 0.0))
+                    continue
+
+                OUTBOX_PUBLISHED.labels(message.topic, "failed").inc()
+                message.attempts += 1
+                message.last_error = error
+                delay = min(self.retry_max_seconds, 2 ** message.attempts)
+                message.available_at = now + timedelta(seconds=random.uniform(delay / 2, delay))
+                logger.warning(
+                    "Failed to publish outbox message",
+                    message_id=str(message.id),
+                    topic=message.topic,
+                    attempts=message.attempts,
+                    error=error,
+                )
+
+            if published:
+                await db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(published)))
+            await db.commit()
+            return len(published)
+
+    def _publish_batch(self, messages: list[OutboxMessage]) -> list[str | None]:
+        errors: list[str | None] = []
+        for message in messages:
+            try:
+                self.publish_fn(message.topic, message.payload)
+                errors.append(None)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+        return errors
+
+    async def run(self) -> None:
+        """Relay messages (and run the periodic work) until cancelled."""
+        while True:
+            await self._run_periodic()
+            try:
+                published = await self.relay_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Database unavailable; the rows are still there next time
+                logger.error("Outbox relay failed", error=str(e))
+                published = 0
+            if published < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run_periodic(self) -> None:
+        if self.periodic_fn is None or time.monotonic() < self._periodic_at:
+            return
+        self._periodic_at = time.monotonic() + self.periodic_interval
+        try:
+            await asyncio.to_thread(self.periodic_fn)
+        except Exception as e:
+            logger.error("Outbox relay periodic work failed", error=str(e))
+
+    def start(self) -> None:
+        """Run the relay as a background task on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="outbox-relay")
+            logger.info("Outbox relay started")
+
+    async def stop(self) -> None:
+        """Stop a relay started with start()."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+@lru_cache
+def get_outbox_relay() -> OutboxRelay:
+    """Get the process-wide relay configured from settings."""
+    from db import async_session_maker
+
+    return OutboxRelay(
+        async_session_maker,
+        batch_size=settings.outbox_batch_size,
+        poll_interval=settings.outbox_poll_interval_seconds,
+        retry_max_seconds=settings.outbox_retry_max_seconds,
+        periodic_fn=dispatch_pending_jobs if settings.scheduler_enabled else None,
+        periodic_interval=settings.scheduler_dispatch_interval_seconds,
+    )
@@ -0,0 +1,439 @@
+"""
+Gemini provider pool: routes requests across API keys and model tiers.
+
+Every configured API key is paired with each model tier to form an endpoint
+with its own rate limiter, since Gemini quotas are per key and model.
+Requests go to the least-loaded healthy endpoint of their tier, so throughput
+grows with the number of keys. Endpoints whose circuit is open, or whose key
+is rejected, are ejected from routing until they recover.
+
+With the cascade on, controls are evaluated on the fast tier first and only
+uncertain verdicts are escalated to the default tier (see EscalationPolicy).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from core.config import settings
+from core.logging import get_logger
+from services.llm_backends import GeminiBackend, LLMBackend, get_llm_backend
+from services.rate_limiter import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimiter,
+    api_key_id,
+    get_rate_limiter,
+    is_auth_error,
+    is_retryable_error,
+)
+
+logger = get_logger(__name__)
+
+DEFAULT_TIER = "default"
+FAST_TIER = "fast"
+
+
+class NoHealthyEndpointError(RuntimeError):
+    """Raised when every endpoint for a tier is ejected or already tried."""
+
+
+@dataclass(eq=False)
+class ModelEndpoint:
+    """One (API key, model) pair requests can be routed to."""
+    key_id: str
+    model_name: str
+    tier: str
+    model: Any
+    limiter: RateLimiter
+    in_flight: int = 0
+    requests: int = 0
+    throttled: int = 0
+    failures: int = 0
+    ejected_until: float = 0.0
+
+    @property
+    def load(self) -> float:
+        """In-flight requests relative to the endpoint's current concurrency limit."""
+        return self.in_flight / max(1, self.limiter.concurrency.limit)
+
+    def is_healthy(self, now: float) -> bool:
+        """Whether the endpoint should receive new requests."""
+        return (
+            now >= self.ejected_until
+            and self.limiter.breaker.state != CircuitBreaker.OPEN
+        )
+
+    def snapshot(self, now: float) -> dict:
+        """Routing and quota counters for monitoring."""
+        return {
+            "key_id": self.key_id,
+            "model": self.model_name,
+            "tier": self.tier,
+            "healthy": self.is_healthy(now),
+            "circuit": self.limiter.breaker.state,
+            "in_flight": self.in_flight,
+            "concurrency_limit": self.limiter.concurrency.limit,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "failures": self.failures,
+        }
+
+
+class ProviderPool:
+    """Least-loaded router over a set of model endpoints."""
+
+    def __init__(
+        self,
+        endpoints: list[ModelEndpoint],
+        ejection_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+        backend: LLMBackend | None = None,
+    ) -> None:
+        """
+        Initialize the pool.
+
+        Args:
+            endpoints: Endpoints in priority order; the first endpoint of each
+                tier belongs to the primary (globally configured) key.
+            ejection_seconds: How long a key rejected by the API is ejected.
+            clock: Monotonic clock (injectable for tests).
+            backend: Backend the endpoint models were created by (Gemini
+                by default).
+        """
+        if not endpoints:
+            raise ValueError("Provider pool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.backend = backend or GeminiBackend()
+        self.ejection_seconds = ejection_seconds
+        self._clock = clock
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> ModelEndpoint:
+        """The primary key's default-tier endpoint."""
+        return self.primary_for(DEFAULT_TIER)
+
+    def has_tier(self, tier: str) -> bool:
+        """Check whether any endpoint serves a tier."""
+        return any(e.tier == tier for e in self.endpoints)
+
+    def primary_for(self, tier: str) -> ModelEndpoint:
+        """The primary key's endpoint for a tier (default tier if absent)."""
+        return self._candidates(tier)[0]
+
+    def _candidates(self, tier: str) -> list[ModelEndpoint]:
+        candidates = [e for e in self.endpoints if e.tier == tier]
+        return candidates or [e for e in self.endpoints if e.tier == DEFAULT_TIER] or self.endpoints
+
+    def select(self, tier: str = DEFAULT_TIER, exclude: tuple = ()) -> ModelEndpoint:
+        """
+        Pick the least-loaded healthy endpoint of a tier and reserve a slot on it.
+
+        Ties rotate so idle endpoints share traffic evenly. If every endpoint
+        is ejected, the remaining ones are still tried and their circuit
+        breakers decide.
+
+        Args:
+            tier: Model tier to route to (falls back to the default tier).
+            exclude: Endpoints already tried for this request.
+
+        Returns:
+            The chosen endpoint, with in_flight already incremented.
+
+        Raises:
+            NoHealthyEndpointError: If no untried endpoint remains.
+        """
+        candidates = [e for e in self._candidates(tier) if e not in exclude]
+        if not candidates:
+            raise NoHealthyEndpointError(f"No untried Gemini endpoint for tier '{tier}'")
+
+        now = self._clock()
+        with self._lock:
+            healthy = [e for e in candidates if e.is_healthy(now)] or candidates
+            self._cursor = (self._cursor + 1) % len(healthy)
+            rotated = healthy[self._cursor:] + healthy[:self._cursor]
+            endpoint = min(rotated, key=lambda e: e.load)
+            endpoint.in_flight += 1
+        return endpoint
+
+    def _reserve(self, endpoint: ModelEndpoint) -> ModelEndpoint:
+        with self._lock:
+            endpoint.in_flight += 1
+        return endpoint
+
+    def _release(self, endpoint: ModelEndpoint, call_stats: dict, failed: bool) -> None:
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.requests += 1 + call_stats.get("retries", 0)
+            endpoint.throttled += call_stats.get("throttled", 0)
+            if failed:
+                endpoint.failures += 1
+
+    def _should_fail_over(self, endpoint: ModelEndpoint, error: Exception) -> bool:
+        """Decide whether an error is specific to the endpoint, ejecting bad keys."""
+        if is_auth_error(error):
+            endpoint.ejected_until = self._clock() + self.ejection_seconds
+            logger.warning(
+                "Ejecting Gemini endpoint after auth error",
+                key_id=endpoint.key_id,
+                model=endpoint.model_name,
+                error=str(error),
+            )
+            return True
+        return isinstance(error, CircuitOpenError) or is_retryable_error(error)
+
+    async def call(
+        self,
+        fn: Callable[[Any], Any],
+        tier: str = DEFAULT_TIER,
+        stats: dict | None = None,
+        endpoint: ModelEndpoint | None = None,
+    ) -> Any:
+        """
+        Run a blocking model call on the best endpoint, failing over on errors.
+
+        Args:
+            fn: Callable taking the endpoint's model and performing the request.
+            tier: Model tier to route to.
+            stats: Optional dict; "retries", "throttled" and "failovers" are added.
+            endpoint: Pin the call to one endpoint (e.g. one holding a cached
+                context); pinned calls do not fail over.
+
+        Returns:
+            The callable's result.
+
+        Raises:
+            Exception: The last endpoint's error once failover is exhausted,
+                or any client error immediately.
+        """
+        tried: list[ModelEndpoint] = []
+        while True:
+            if endpoint is not None:
+                current = self._reserve(endpoint)
+            else:
+                current = self.select(tier, exclude=tuple(tried))
+
+            call_stats: dict[str, int] = {}
+            failed = False
+            try:
+                return await current.limiter.call(lambda: fn(current.model), stats=call_stats)
+            except Exception as e:
+                failed = True
+                tried.append(current)
+                can_fail_over = (
+                    endpoint is None
+                    and self._should_fail_over(current, e)
+                    and len(tried) < len(self._candidates(tier))
+                )
+                if not can_fail_over:
+                    raise
+                logger.info(
+                    "Failing over to another Gemini endpoint",
+                    key_id=current.key_id,
+                    model=current.model_name,
+                    error=str(e),
+                )
+                if stats is not None:
+                    stats["failovers"] = stats.get("failovers", 0) + 1
+            finally:
+                self._release(current, call_stats, failed)
+                if stats is not None:
+                    for name, count in call_stats.items():
+                        stats[name] = stats.get(name, 0) + count
+
+    def warm_up(self, timeout: float) -> None:
+        """
+        Connect every endpoint ahead of its first request.
+
+        Endpoints connect concurrently; one that cannot connect within the
+        timeout is logged and left to connect on first use.
+        """
+        def connect(endpoint: ModelEndpoint) -> None:
+            try:
+                self.backend.warm_up(endpoint.model, timeout)
+            except Exception as e:
+                logger.warning(
+                    "Failed to warm up Gemini endpoint",
+                    key_id=endpoint.key_id,
+                    model=endpoint.model_name,
+                    error=str(e) or type(e).__name__,
+                )
+
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as executor:
+            list(executor.map(connect, self.endpoints))
+
+    def snapshot(self) -> list[dict]:
+        """Per-endpoint routing and quota counters."""
+        now = self._clock()
+        return [e.snapshot(now) for e in self.endpoints]
+
+
+def select_tier(scan_type: str, control: dict) -> str:
+    """
+    Choose the model tier for a control.
+
+    Quick scans and low-risk controls go to the fast tier when one is
+    configured; everything else uses the default model.
+    """
+    if not settings.gemini_fast_model:
+        return DEFAULT_TIER
+    if (
+        scan_type in settings.gemini_fast_scan_types
+        or control.get("risk") in settings.gemini_fast_risk_levels
+    ):
+        return FAST_TIER
+    return DEFAULT_TIER
+
+
+@dataclass(frozen=True)
+class EscalationPolicy:
+    """When a fast-tier verdict is re-evaluated on the default tier."""
+    enabled: bool = True
+    min_confidence: float = 0.7
+    statuses: tuple[str, ...] = field(default=("needs_review", "error"))
+    on_parse_failure: bool = True
+
+    def reason(self, result: dict) -> str | None:
+        """
+        Why a fast-tier result should be escalated.
+
+        Returns:
+            "parse_failure", the escalating status, "low_confidence", or None
+            to accept the result.
+        """
+        if not self.enabled:
+            return None
+        if self.on_parse_failure and result.get("parse_failed"):
+            return "parse_failure"
+        status = result.get("status")
+        if status in self.statuses:
+            return status
+        if result.get("confidence", 0.0) < self.min_confidence:
+            return "low_confidence"
+        return None
+
+
+def escalation_policy(control: dict) -> EscalationPolicy | None:
+    """
+    The cascade policy for a control, from settings and its category override.
+
+    Returns:
+        The policy, or None when the control is not cascaded (cascade off,
+        no fast tier, or disabled for its category).
+    """
+    if not settings.gemini_cascade_enabled or not settings.gemini_fast_model:
+        return None
+    overrides = {
+        category.lower(): policy
+        for category, policy in settings.gemini_cascade_policies.items()
+    }.get(str(control.get("category", "")).lower(), {})
+    policy = EscalationPolicy(
+        enabled=overrides.get("enabled", True),
+        min_confidence=overrides.get("min_confidence", settings.gemini_cascade_min_confidence),
+        statuses=tuple(overrides.get("statuses", settings.gemini_cascade_escalate_statuses)),
+        on_parse_failure=overrides.get("on_parse_failure", True),
+    )
+    return policy if policy.enabled else None
+
+
+def _configured_keys() -> list[str]:
+    keys = [settings.gemini_api_key, *settings.gemini_api_keys]
+    keys = list(dict.fromkeys(k for k in keys if k))
+    if not keys and settings.llm_backend == "stub":
+        # The offline stub needs no credentials
+        keys = ["stub"]
+    return keys
+
+
+def build_provider_pool() -> ProviderPool:
+    """
+    Build a pool from settings: every API key paired with every model tier.
+
+    Raises:
+        ValueError: If no API key is configured.
+    """
+    keys = _configured_keys()
+    if not keys:
+        raise ValueError("GEMINI_API_KEY not configured")
+
+    backend = get_llm_backend()
+    backend.configure(keys[0])
+
+    tiers = [(DEFAULT_TIER, settings.gemini_model, settings.gemini_requests_per_minute)]
+    if settings.gemini_fast_model:
+        tiers.append((
+            FAST_TIER,
+            settings.gemini_fast_model,
+            settings.gemini_fast_requests_per_minute or settings.gemini_requests_per_minute,
+        ))
+
+    endpoints = [
+        ModelEndpoint(
+            key_id=api_key_id(api_key),
+            model_name=model_name,
+            tier=tier,
+            model=backend.create_model(api_key, model_name, primary=index == 0),
+            limiter=get_rate_limiter(api_key, model_name, requests_per_minute=rpm),
+        )
+        for index, api_key in enumerate(keys)
+        for tier, model_name, rpm in tiers
+    ]
+    return ProviderPool(
+        endpoints,
+        ejection_seconds=settings.gemini_endpoint_ejection_seconds,
+        backend=backend,
+    )
+
+
+_pools: dict[tuple, ProviderPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_provider_pool() -> ProviderPool:
+    """
+    Get the process-wide provider pool for the current settings.
+
+    Returns:
+        The ProviderPool shared by every GeminiService in the process.
+    """
+    config = (
+        settings.llm_backend,
+        tuple(_configured_keys()),
+        settings.gemini_model,
+        settings.gemini_fast_model,
+    )
+    pool = _pools.get(config)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(config)
+        if pool is None:
+            pool = build_provider_pool()
+            _pools[config] = pool
+    return pool
+
+
+def init_provider_pool() -> ProviderPool | None:
+    """
+    Build the process-wide pool and connect its endpoints.
+
+    Called when the API or a worker process starts, so the first job
+    neither builds clients nor waits on a handshake.
+
+    Returns:
+        The pool, or None if no API key is configured.
+    """
+    try:
+        pool = get_provider_pool()
+    except ValueError as e:
+        logger.warning("LLM provider pool not initialized", error=str(e))
+        return None
+    if settings.gemini_warmup_timeout_seconds > 0:
+        pool.warm_up(settings.gemini_warmup_timeout_seconds)
+    logger.info("LLM provider pool ready", endpoints=len(pool.endpoints))
+    return pool
@@ -0,0 +1,604 @@
+"""
+Rate limiting, retry/backoff and circuit breaking for Gemini API calls.
+
+Each API key gets a token bucket (shared across workers through Redis, or
+in-process as a fallback), a circuit breaker, and an adaptive concurrency
+limit that halves on throttling and recovers additively on success.
+Requests themselves are blocking client calls; they run on a process-wide
+thread pool so the event loop keeps serving other jobs while they wait.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# HTTP status codes worth retrying
+THROTTLE_STATUS_CODES = {429}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Errors meaning the key itself is unusable (revoked, disabled, no access)
+AUTH_ERROR_STATUS_CODES = {401, 403}
+
+# Atomic token bucket: returns 0 when a token was taken, otherwise the
+# number of milliseconds to wait. A cooldown key set after throttling
+# makes every worker back off together.
+TOKEN_BUCKET_SCRIPT = """
+local cooldown = redis.call('PTTL', KEYS[2])
+if cooldown > 0 then
+    return cooldown
+end
+
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = math.ceil((requested - tokens) * 1000 / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when calls are rejected because the circuit breaker is open."""
+
+
+def _status_code(error: Exception) -> int | None:
+    """Extract an HTTP status code from a Google API or HTTP client error."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Check whether an error signals quota exhaustion (HTTP 429)."""
+    return _status_code(error) in THROTTLE_STATUS_CODES
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether an error is transient (429 or 5xx) and worth retrying."""
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def is_auth_error(error: Exception) -> bool:
+    """Check whether an error means the API key was rejected (401/403)."""
+    return _status_code(error) in AUTH_ERROR_STATUS_CODES
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter for the given retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class LocalTokenBucket:
+    """In-process token bucket keyed by API key."""
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Initialize the bucket.
+
+        Args:
+            rate_per_second: Token refill rate.
+            capacity: Maximum burst size.
+            clock: Monotonic clock, injectable for tests.
+        """
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._clock = clock
+        self._state: dict[str, tuple[float, float]] = {}
+        self._cooldown_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def try_acquire(self, key: str, tokens: int = 1) -> float:
+        """
+        Try to take tokens from the bucket.
+
+        Returns:
+            0 if tokens were taken, otherwise seconds to wait before retrying.
+        """
+        with self._lock:
+            now = self._clock()
+            cooldown = self._cooldown_until.get(key, 0.0) - now
+            if cooldown > 0:
+                return cooldown
+
+            available, last = self._state.get(key, (float(self.capacity), now))
+            available = min(self.capacity, available + (now - last) * self.rate)
+            if available >= tokens:
+                self._state[key] = (available - tokens, now)
+                return 0.0
+
+            self._state[key] = (available, now)
+            return (tokens - available) / self.rate
+
+    def penalize(self, key: str, seconds: float) -> None:
+        """Block all acquisitions for a key for the given duration."""
+        with self._lock:
+            until = self._clock() + seconds
+            self._cooldown_until[key] = max(self._cooldown_until.get(key, 0.0), until)
+
+
+class RedisTokenBucket:
+    """
+    Token bucket stored in Redis so every worker shares one budget per key.
+
+    Falls back to a local bucket while Redis is unreachable.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        rate_per_second: float,
+        capacity: int,
+        fallback: LocalTokenBucket | None = None,
+        retry_after_seconds: float = 30.0,
+    ) -> None:
+        """
+        Initialize the bucket.
+
+        Args:
+            redis_client: Synchronous Redis client.
+            rate_per_second: Token refill rate.
+            capacity: Maximum burst size.
+            fallback: Local bucket used while Redis is down.
+            retry_after_seconds: How long to stay on the fallback after an error.
+        """
+        self.redis = redis_client
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.fallback = fallback or LocalTokenBucket(rate_per_second, capacity)
+        self.retry_after_seconds = retry_after_seconds
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._unavailable_until = 0.0
+
+    @staticmethod
+    def _keys(key: str) -> list[str]:
+        return [f"shieldagent:ratelimit:{key}", f"shieldagent:ratelimit:{key}:cooldown"]
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._unavailable_until
+
+    def _mark_unavailable(self, error: Exception) -> None:
+        logger.warning("Redis rate limiter unavailable, using local bucket", error=str(error))
+        self._unavailable_until = time.monotonic() + self.retry_after_seconds
+
+    def try_acquire(self, key: str, tokens: int = 1) -> float:
+        """
+        Try to take tokens from the shared bucket.
+
+        Returns:
+            0 if tokens were taken, otherwise seconds to wait before retrying.
+        """
+        if self._redis_available():
+            try:
+                wait_ms = self._script(
+                    keys=self._keys(key),
+                    args=[self.rate, self.capacity, tokens],
+                )
+                return int(wait_ms) / 1000
+            except Exception as e:
+                self._mark_unavailable(e)
+        return self.fallback.try_acquire(key, tokens)
+
+    def penalize(self, key: str, seconds: float) -> None:
+        """Make every worker back off for the given duration."""
+        self.fallback.penalize(key, seconds)
+        if self._redis_available():
+            try:
+                self.redis.set(self._keys(key)[1], 1, px=max(1, int(seconds * 1000)))
+            except Exception as e:
+                self._mark_unavailable(e)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated transient failures.
+
+    closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` one trial call is allowed (half-open), and its outcome
+    closes or re-opens the circuit. A trial abandoned without an outcome
+    (e.g. cancelled) frees the slot, and one running past `trial_timeout`
+    no longer blocks the next.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+        trial_timeout: float = 120.0,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.trial_timeout = trial_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current breaker state."""
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def before_call(self) -> None:
+        """
+        Admit or reject a call.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or a trial call is in flight.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if self._state == self.OPEN:
+                remaining = self.reset_timeout - (self._clock() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Gemini circuit open, retry in {remaining:.1f}s"
+                    )
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            now = self._clock()
+            if self._trial_in_flight and now - self._trial_started_at < self.trial_timeout:
+                raise CircuitOpenError("Gemini circuit half-open, trial call in flight")
+            self._trial_in_flight = True
+            self._trial_started_at = now
+
+    def release_call(self) -> None:
+        """Give up an admitted call without an outcome, freeing a half-open trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """Record a successful call and close the circuit."""
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a transient failure, opening the circuit past the threshold."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit shared by every event loop in the process.
+
+    The limit halves on throttling (at most once per `decrease_interval`)
+    and grows by one after a full window of successful calls. Waiters are
+    plain futures woken thread-safely, so the limiter works across the
+    per-task event loops Celery creates.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_interval = decrease_interval
+        self._clock = clock
+        self._limit = float(max_limit)
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._waiters: deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        """Wait for a free slot."""
+        while True:
+            with self._lock:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        # Already woken for a free slot; pass the wake-up on
+                        pass
+                    self._wake_waiters()
+                raise
+
+    def release(self) -> None:
+        """Release a slot and wake the next waiter."""
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        # Woken waiters re-check for a slot; one cancelled before it runs
+        # wakes the next waiter in its place (see acquire)
+        free = self.limit - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+                free -= 1
+
+    def on_success(self) -> None:
+        """Additive increase after a successful call."""
+        with self._lock:
+            if self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._wake_waiters()
+
+    def on_throttle(self) -> None:
+        """Multiplicative decrease after a 429."""
+        with self._lock:
+            now = self._clock()
+            if now - self._last_decrease >= self.decrease_interval:
+                self._limit = max(self.min_limit, self._limit / 2)
+                self._last_decrease = now
+
+
+def _resolve(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+@dataclass
+class RetryPolicy:
+    """Retry settings for transient Gemini errors."""
+    max_retries: int
+    backoff_base: float
+    backoff_max: float
+
+
+class RateLimiter:
+    """Admission control for calls made with a single API key."""
+
+    def __init__(
+        self,
+        key: str,
+        bucket: LocalTokenBucket | RedisTokenBucket,
+        breaker: CircuitBreaker,
+        concurrency: AdaptiveConcurrencyLimiter,
+        retry_policy: RetryPolicy,
+    ) -> None:
+        self.key = key
+        self.bucket = bucket
+        self.breaker = breaker
+        self.concurrency = concurrency
+        self.retry_policy = retry_policy
+
+    async def _bucket_call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if isinstance(self.bucket, RedisTokenBucket):
+            # A Redis round trip; kept off the event loop
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def _wait_for_token(self) -> None:
+        while True:
+            wait = await self._bucket_call(self.bucket.try_acquire, self.key)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    async def call(self, fn: Callable[[], Any], stats: dict | None = None) -> Any:
+        """
+        Run a blocking API call under the rate limit with retries.
+
+        Args:
+            fn: Zero-argument callable performing the request.
+            stats: Optional dict; "retries" and "throttled" counts are added.
+
+        Returns:
+            The callable's result.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the call.
+            Exception: The last error once retries are exhausted, or any
+                non-retryable error immediately.
+        """
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                await self._wait_for_token()
+                await self.concurrency.acquire()
+            except BaseException:
+                self.breaker.release_call()
+                raise
+
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    get_call_executor(), contextvars.copy_context().run, fn
+                )
+            except asyncio.CancelledError:
+                # No outcome to record; a half-open trial must not stay taken
+                self.breaker.release_call()
+                raise
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # Client errors say nothing about service health
+                    self.breaker.record_success()
+                    raise
+
+                self.breaker.record_failure()
+                attempt += 1
+                delay = backoff_delay(
+                    attempt,
+                    self.retry_policy.backoff_base,
+                    self.retry_policy.backoff_max,
+                )
+                if is_throttle_error(e):
+                    self.concurrency.on_throttle()
+                    await self._bucket_call(
+                        self.bucket.penalize,
+                        self.key,
+                        max(delay, self.retry_policy.backoff_base),
+                    )
+                    if stats is not None:
+                        stats["throttled"] = stats.get("throttled", 0) + 1
+
+                if attempt > self.retry_policy.max_retries:
+                    raise
+                if stats is not None:
+                    stats["retries"] = stats.get("retries", 0) + 1
+                logger.info(
+                    "Retrying Gemini call",
+                    attempt=attempt,
+                    delay=round(delay, 2),
+                    error=str(e),
+                )
+            else:
+                self.breaker.record_success()
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.release()
+
+            await asyncio.sleep(delay)
+
+
+@lru_cache
+def get_call_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide thread pool that blocking API requests run on.
+
+    Its size (settings.llm_max_concurrent_calls) caps in-flight requests
+    per process across every key, job and event loop.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.llm_max_concurrent_calls,
+        thread_name_prefix="llm-call",
+    )
+
+
+def api_key_id(api_key: str) -> str:
+    """Stable, non-reversible identifier for an API key."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _build_bucket(requests_per_minute: int) -> LocalTokenBucket | RedisTokenBucket:
+    rate = requests_per_minute / 60
+    local = LocalTokenBucket(rate, settings.gemini_rate_limit_burst)
+    if settings.gemini_rate_limit_backend != "redis":
+        return local
+
+    from core.redis import get_redis_client
+    return RedisTokenBucket(
+        get_redis_client(),
+        rate,
+        settings.gemini_rate_limit_burst,
+        fallback=local,
+    )
+
+
+def get_rate_limiter(
+    api_key: str,
+    model_name: str | None = None,
+    requests_per_minute: int | None = None,
+) -> RateLimiter:
+    """
+    Get the process-wide rate limiter for an API key.
+
+    Args:
+        api_key: The Gemini API key the calls are billed to.
+        model_name: Optional model; Gemini quotas are per key and model.
+        requests_per_minute: Quota override (defaults to
+            settings.gemini_requests_per_minute).
+
+    Returns:
+        The RateLimiter shared by every caller using that key and model.
+    """
+    key = api_key_id(api_key)
+    if model_name:
+        key = f"{key}:{model_name}"
+    limiter = _limiters.get(key)
+    if limiter is not None:
+        return limiter
+
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(
+                key=key,
+                bucket=_build_bucket(requests_per_minute or settings.gemini_requests_per_minute),
+                breaker=CircuitBreaker(
+                    settings.gemini_circuit_failure_threshold,
+                    settings.gemini_circuit_reset_seconds,
+                    trial_timeout=settings.gemini_circuit_trial_timeout_seconds,
+                ),
+                concurrency=AdaptiveConcurrencyLimiter(settings.gemini_max_concurrency),
+                retry_policy=RetryPolicy(
+                    max_retries=settings.gemini_max_retries,
+                    backoff_base=settings.gemini_backoff_base_seconds,
+                    backoff_max=settings.gemini_backoff_max_seconds,
+                ),
+            )
+            _limiters[key] = limiter
+    return limiter
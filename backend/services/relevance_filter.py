@@ -0,0 +1,272 @@
+"""
+Local relevance prefilter: skips LLM calls for controls the evidence never
+mentions.
+
+Every control's "Look for" items are reduced to search terms: the whole
+phrase, its "/"-separated alternatives and its distinctive words. A word is
+distinctive when few controls of the framework use it, so "data" alone does
+not tie a privacy control to an infrastructure document. The terms
+of all controls in a framework are compiled into one Aho-Corasick automaton,
+so scoring a job is a single linear pass over the extracted text, however
+many controls and terms there are. A control's score is the fraction of its
+items with at least one matching term. Controls below the threshold get a
+local verdict instead of a Gemini request.
+"""
+
+import re
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Generic, Iterable, Iterator, TypeVar
+
+from services.framework_registry import FrameworkCatalog
+
+# Words too generic to show a document covers a particular control
+GENERIC_WORDS = {
+    "with", "from", "that", "this", "their", "there", "which", "where", "such",
+    "policy", "policies", "procedure", "procedures", "process", "processes",
+    "program", "programs", "documentation", "documented", "records", "evidence",
+    "controls", "management", "requirements", "practices", "mechanisms",
+    "descriptions", "activities", "statements", "other", "security", "information",
+    "systems", "regular", "periodic", "control", "used", "based",
+}
+
+_LOOK_FOR = re.compile(r"Look for:\n((?:- .*\n?)+)")
+
+P = TypeVar("P")
+
+
+def stem(word: str) -> str:
+    """Strip common inflections so "reviews" and "reviewed" match "review"."""
+    if len(word) > 5 and word.endswith("ies"):
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed", "s"):
+        if word.endswith(suffix) and not word.endswith("ss") and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def normalize(text: str) -> str:
+    """Lowercase, stem, and collapse everything but letters and digits to single spaces."""
+    return " ".join(stem(w) for w in re.findall(r"[a-z0-9]+", text.lower()))
+
+
+class AhoCorasick(Generic[P]):
+    """
+    Multi-pattern matcher over normalized text.
+
+    Patterns are added with a payload, compiled once with build(), and then
+    every occurrence in a text is found in one pass. Matches must start and
+    end on word boundaries.
+    """
+
+    def __init__(self) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, P]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, payload: P) -> None:
+        """Add a normalized pattern; it reports `payload` when matched."""
+        if self._built:
+            raise RuntimeError("Cannot add patterns after build()")
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((len(pattern), payload))
+
+    def build(self) -> "AhoCorasick[P]":
+        """Compute failure links (breadth-first) and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str) -> Iterator[P]:
+        """Yield the payload of every whole-word match in normalized text."""
+        if not self._built:
+            raise RuntimeError("Automaton not built")
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        last = len(text) - 1
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state] or (end < last and text[end + 1] != " "):
+                continue
+            for length, payload in out[state]:
+                start = end - length + 1
+                if start == 0 or text[start - 1] == " ":
+                    yield payload
+
+
+def look_for_items(control: dict) -> list[str]:
+    """A control's "Look for" items, from the pack or its check prompt."""
+    if control.get("look_for"):
+        return list(control["look_for"])
+    match = _LOOK_FOR.search(control.get("check_prompt", ""))
+    if not match:
+        return []
+    return [line[2:].strip() for line in match.group(1).splitlines() if line.startswith("- ")]
+
+
+def item_words(item: str) -> set[str]:
+    """Candidate single-word terms of a "Look for" item (normalized)."""
+    return {
+        stem(w) for w in re.findall(r"[a-z0-9]+", item.lower())
+        if len(w) >= 4 and w not in GENERIC_WORDS and stem(w) not in GENERIC_WORDS
+    }
+
+
+def item_phrases(item: str) -> set[str]:
+    """Normalized phrases of a "Look for" item: the whole item and its alternatives."""
+    # Parenthesized examples are alternatives too: "Authentication (MFA, SSO)"
+    phrases = {normalize(item)}
+    phrases.update(normalize(alt) for alt in re.split(r"[/(),]", item))
+    return {p for p in phrases if len(p) >= 3 and p not in GENERIC_WORDS}
+
+
+@dataclass
+class Relevance:
+    """How well the evidence covers a control's "Look for" items."""
+
+    control_id: str
+    score: float
+    matched: list[str]
+    missing: list[str]
+
+
+class RelevanceFilter:
+    """
+    Scores controls against document text with one compiled automaton.
+
+    An item is supported when one of its phrases appears, or when two of
+    its distinctive words do (one if it has only one).
+    """
+
+    def __init__(self, controls: Iterable[dict], max_word_share: float = 0.05) -> None:
+        """
+        Compile the terms of every control.
+
+        Args:
+            controls: Control definitions (usually a whole framework).
+            max_word_share: A word is distinctive if at most this share of
+                the controls (and at least two) use it.
+        """
+        self._items: dict[str, list[str]] = {
+            control["control_id"].upper(): look_for_items(control) for control in controls
+        }
+
+        usage: Counter[str] = Counter()
+        for items in self._items.values():
+            usage.update(set().union(*(item_words(item) for item in items)))
+        limit = max(2, int(max_word_share * len(self._items)))
+        common_words = {word for word, count in usage.items() if count > limit}
+
+        # Payload: (control key, item index, word, or None for a phrase)
+        self._automaton: AhoCorasick[tuple[str, int, str | None]] = AhoCorasick()
+        # Distinct words each item needs to count as supported
+        self._words_needed: dict[tuple[str, int], int] = {}
+        for key, items in self._items.items():
+            for index, item in enumerate(items):
+                phrases = item_phrases(item)
+                words = item_words(item) - common_words - phrases
+                for phrase in phrases:
+                    self._automaton.add(phrase, (key, index, None))
+                for word in words:
+                    self._automaton.add(word, (key, index, word))
+                self._words_needed[(key, index)] = min(2, len(words))
+        self._automaton.build()
+
+    def score(self, document_texts: list[str], controls: list[dict]) -> dict[str, Relevance]:
+        """
+        Score controls against the documents in one pass over the text.
+
+        Controls without "Look for" items, or not compiled into this
+        filter, cannot be judged locally and always score 1.0.
+
+        Returns:
+            Relevance by control ID (as given in `controls`).
+        """
+        supported: set[tuple[str, int]] = set()
+        words: dict[tuple[str, int], set[str]] = {}
+        for text in document_texts:
+            for key, index, word in self._automaton.iter_matches(normalize(text)):
+                if word is None:
+                    supported.add((key, index))
+                else:
+                    words.setdefault((key, index), set()).add(word)
+        for item, found in words.items():
+            if len(found) >= self._words_needed[item]:
+                supported.add(item)
+
+        scores = {}
+        for control in controls:
+            key = control["control_id"].upper()
+            items = self._items.get(key)
+            if not items:
+                scores[control["control_id"]] = Relevance(control["control_id"], 1.0, [], [])
+                continue
+            matched = [item for i, item in enumerate(items) if (key, i) in supported]
+            scores[control["control_id"]] = Relevance(
+                control_id=control["control_id"],
+                score=len(matched) / len(items),
+                matched=matched,
+                missing=[item for item in items if item not in matched],
+            )
+        return scores
+
+    def hits(self, text: str, control_ids: set[str] | None = None) -> int:
+        """
+        Count the distinct terms of some controls that appear in a text.
+
+        Used to rank chunks of a document by how much evidence they hold.
+
+        Args:
+            text: Raw (unnormalized) text.
+            control_ids: Controls whose terms count (default: all).
+        """
+        keys = {c.upper() for c in control_ids} if control_ids is not None else None
+        found = {
+            match for match in self._automaton.iter_matches(normalize(text))
+            if keys is None or match[0] in keys
+        }
+        return len(found)
+
+
+_filters: dict[tuple[str, str], RelevanceFilter] = {}
+_filters_lock = threading.Lock()
+
+
+def get_relevance_filter(catalog: FrameworkCatalog) -> RelevanceFilter:
+    """Get the compiled filter for a framework, compiling it on first use."""
+    key = (catalog.framework_id, catalog.version)
+    relevance_filter = _filters.get(key)
+    if relevance_filter is not None:
+        return relevance_filter
+
+    with _filters_lock:
+        relevance_filter = _filters.get(key)
+        if relevance_filter is None:
+            relevance_filter = RelevanceFilter(catalog.controls)
+            _filters[key] = relevance_filter
+    return relevance_filter
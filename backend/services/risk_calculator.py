@@ -88,7 +88,11 @@ class RiskCalculator:
         Returns:
             RiskScore with detailed breakdown
         """
-        controls = analysis_results.get("controls", [])
+        # Controls the evidence does not cover are left out of the score
+        controls = [
+            c for c in analysis_results.get("controls", [])
+            if c.get("status") != "not_applicable"
+        ]
         
         if not controls:
             return RiskScore(
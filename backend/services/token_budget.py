@@ -0,0 +1,324 @@
+"""
+Token accounting for prompts: local estimates calibrated against the API,
+and packing of document text into a per-model token budget.
+
+Counting every prompt with the API would add a round trip per call, so
+tokens are estimated locally: words of up to eight letters count as one
+token, each further eight letters as another, and every digit and symbol
+as one. Once per job, a sample of each new document goes to
+the model's count-tokens endpoint in a single batched request. The ratio
+of exact to estimated tokens, accumulated over every sample so far,
+scales later estimates. Samples are remembered by hash, so the same
+documents are never counted twice.
+
+The document segment is packed into the smallest context window of the
+models a job can call, minus a reserve for the control instructions and
+the reply. If the documents do not fit, they are split into chunks and the
+highest-priority chunks are kept, in their original order.
+"""
+
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+from core.config import settings
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+DOCUMENT_SEPARATOR = "\n\n=== DOCUMENT ===\n\n"
+OMITTED_MARKER = "\n\n[... sections omitted to fit the context window ...]\n\n"
+
+_PIECES = re.compile(r"[^\W\d_]+|\S")
+
+
+def local_token_estimate(text: str) -> int:
+    """Estimate tokens without a tokenizer: words by length, one per digit or symbol."""
+    return sum(1 + (len(piece) - 1) // 8 for piece in _PIECES.findall(text))
+
+
+def context_window_tokens(model_name: str) -> int:
+    """Input token limit of a model, from settings (default for unknown models)."""
+    name = model_name.removeprefix("models/")
+    return settings.gemini_context_window_tokens.get(
+        name, settings.gemini_default_context_window_tokens
+    )
+
+
+class TokenCounter:
+    """Local token estimates scaled by a ratio calibrated with exact counts."""
+
+    def __init__(self, sample_chars: int = 20000, max_remembered: int = 4096) -> None:
+        """
+        Initialize the counter.
+
+        Args:
+            sample_chars: Characters of each text sent for an exact count.
+            max_remembered: Sample hashes remembered to avoid recounting.
+        """
+        self.sample_chars = sample_chars
+        self.max_remembered = max_remembered
+        self.ratio = 1.0
+        self._estimated = 0
+        self._exact = 0
+        self._sampled: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        """Calibrated token estimate of a text."""
+        return math.ceil(local_token_estimate(text) * self.ratio)
+
+    def calibrate(self, texts: list[str], count_fn: Callable[[list[str]], int | None]) -> bool:
+        """
+        Refine the ratio with one exact count over samples of new texts.
+
+        Blocking: count_fn calls the API.
+
+        Args:
+            texts: Texts about to be packed (e.g. a job's documents).
+            count_fn: Exact token count of a list of texts taken together,
+                or None when the backend cannot count.
+
+        Returns:
+            True if the ratio was updated.
+        """
+        samples: dict[str, str] = {}
+        with self._lock:
+            for text in texts:
+                sample = text[:self.sample_chars]
+                digest = hashlib.sha256(sample.encode()).hexdigest()
+                if sample.strip() and digest not in self._sampled:
+                    samples[digest] = sample
+        if not samples:
+            return False
+
+        try:
+            exact = count_fn(list(samples.values()))
+        except Exception as e:
+            logger.warning("Token count calibration failed", error=str(e))
+            return False
+        estimated = sum(local_token_estimate(s) for s in samples.values())
+        if not exact or not estimated:
+            return False
+
+        with self._lock:
+            self._estimated += estimated
+            self._exact += exact
+            self.ratio = self._exact / self._estimated
+            for digest in samples:
+                self._sampled[digest] = None
+            while len(self._sampled) > self.max_remembered:
+                self._sampled.popitem(last=False)
+        return True
+
+
+_counters: dict[str, TokenCounter] = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name: str) -> TokenCounter:
+    """Get the process-wide counter for a model's tokenizer."""
+    counter = _counters.get(model_name)
+    if counter is not None:
+        return counter
+
+    with _counters_lock:
+        counter = _counters.get(model_name)
+        if counter is None:
+            counter = TokenCounter(sample_chars=settings.gemini_token_calibration_chars)
+            _counters[model_name] = counter
+    return counter
+
+
+@dataclass
+class Chunk:
+    """A run of whole paragraphs from one document."""
+
+    document: int
+    index: int
+    text: str
+    tokens: int
+    priority: float = 0.0
+
+
+@dataclass
+class PackedSegment:
+    """Document text packed into a token budget, with packing statistics."""
+
+    text: str
+    tokens: int
+    budget_tokens: int
+    chunks_total: int
+    chunks_packed: int
+
+    @property
+    def fill_ratio(self) -> float:
+        """Share of the budget used."""
+        return round(self.tokens / self.budget_tokens, 4) if self.budget_tokens else 0.0
+
+    @property
+    def complete(self) -> bool:
+        """Whether every chunk of every document was packed."""
+        return self.chunks_packed == self.chunks_total
+
+    def to_metrics(self) -> dict:
+        """Packing statistics for job telemetry."""
+        return {
+            "tokens": self.tokens,
+            "budget_tokens": self.budget_tokens,
+            "fill_ratio": self.fill_ratio,
+            "chunks_total": self.chunks_total,
+            "chunks_packed": self.chunks_packed,
+        }
+
+
+def split_chunks(
+    text: str,
+    document: int,
+    counter: TokenCounter,
+    max_tokens: int,
+) -> list[Chunk]:
+    """
+    Split a document into chunks of whole paragraphs of at most max_tokens.
+
+    Paragraphs longer than max_tokens are cut between words.
+    """
+    pieces: list[tuple[str, int]] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        if not paragraph.strip():
+            continue
+        tokens = counter.count(paragraph)
+        if tokens <= max_tokens:
+            pieces.append((paragraph, tokens))
+            continue
+        words: list[str] = []
+        words_tokens = 0
+        for word in re.findall(r"\S+\s*", paragraph):
+            word_tokens = counter.count(word)
+            if words and words_tokens + word_tokens > max_tokens:
+                pieces.append(("".join(words).rstrip(), words_tokens))
+                words, words_tokens = [], 0
+            words.append(word)
+            words_tokens += word_tokens
+        if words:
+            pieces.append(("".join(words).rstrip(), words_tokens))
+
+    chunks: list[Chunk] = []
+    current: list[str] = []
+    current_tokens = 0
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(Chunk(document, len(chunks), "\n\n".join(current), current_tokens))
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        chunks.append(Chunk(document, len(chunks), "\n\n".join(current), current_tokens))
+    return chunks
+
+
+def pack_documents(
+    document_texts: list[str],
+    budget_tokens: int,
+    counter: TokenCounter,
+    chunk_tokens: int = 1024,
+    priority: Callable[[Chunk], float] | None = None,
+) -> PackedSegment:
+    """
+    Pack documents into a token budget.
+
+    Documents that fit together are joined whole. Otherwise they are split
+    into chunks, and chunks are taken by priority (then document order)
+    while they fit. Kept chunks stay in document order, with a marker where
+    text was left out, including the tail of a document before the next
+    one starts. Every chunk is charged for a separator and a marker on each
+    side, so the result never exceeds the budget.
+
+    Args:
+        document_texts: Extracted text of each document.
+        budget_tokens: Tokens available for the documents.
+        counter: Token counter of the model tokenizer.
+        chunk_tokens: Target chunk size when splitting.
+        priority: Scores a chunk; higher is packed first (default: all equal).
+
+    Returns:
+        The packed segment text and its statistics.
+    """
+    separator_tokens = counter.count(DOCUMENT_SEPARATOR)
+    tokens = [counter.count(text) for text in document_texts]
+    total = sum(tokens) + separator_tokens * max(0, len(document_texts) - 1)
+    if total <= budget_tokens:
+        return PackedSegment(
+            text=DOCUMENT_SEPARATOR.join(document_texts),
+            tokens=total,
+            budget_tokens=budget_tokens,
+            chunks_total=len(document_texts),
+            chunks_packed=len(document_texts),
+        )
+
+    chunks = [
+        chunk
+        for document, text in enumerate(document_texts)
+        for chunk in split_chunks(text, document, counter, chunk_tokens)
+    ]
+    if priority is not None:
+        for chunk in chunks:
+            chunk.priority = priority(chunk)
+
+    # Each chunk may be preceded by a separator and a marker and followed by
+    # a marker; one more marker stands in for the text if nothing fits
+    marker_tokens = counter.count(OMITTED_MARKER)
+    overhead = separator_tokens + 2 * marker_tokens
+    remaining = budget_tokens - marker_tokens
+    kept: list[Chunk] = []
+    for chunk in sorted(chunks, key=lambda c: (-c.priority, c.document, c.index)):
+        cost = chunk.tokens + overhead
+        if cost <= remaining:
+            kept.append(chunk)
+            remaining -= cost
+    kept.sort(key=lambda c: (c.document, c.index))
+
+    last_index: dict[int, int] = {}
+    for chunk in chunks:
+        last_index[chunk.document] = chunk.index
+    last_document = max(last_index, default=0)
+
+    def tail_dropped(previous: Chunk, next_document: int) -> bool:
+        """Whether text between a kept chunk and the next document was left out."""
+        return previous.index != last_index[previous.document] or any(
+            document in last_index for document in range(previous.document + 1, next_document)
+        )
+
+    parts: list[str] = []
+    previous: Chunk | None = None
+    for chunk in kept:
+        if previous is None:
+            if (chunk.document, chunk.index) != (min(last_index), 0):
+                parts.append(OMITTED_MARKER)
+        elif chunk.document != previous.document:
+            if tail_dropped(previous, chunk.document):
+                parts.append(OMITTED_MARKER)
+            parts.append(DOCUMENT_SEPARATOR)
+            if chunk.index > 0:
+                parts.append(OMITTED_MARKER)
+        elif chunk.index != previous.index + 1:
+            parts.append(OMITTED_MARKER)
+        parts.append(chunk.text)
+        previous = chunk
+    if previous is None:
+        if chunks:
+            parts.append(OMITTED_MARKER)
+    elif tail_dropped(previous, last_document + 1):
+        parts.append(OMITTED_MARKER)
+
+    return PackedSegment(
+        text="".join(parts),
+        tokens=counter.count("".join(parts)),
+        budget_tokens=budget_tokens,
+        chunks_total=len(chunks),
+        chunks_packed=len(kept),
+    )
@@ -17,11 +17,14 @@ from sqlalchemy.ext.asyncio import (
 
 from main import app
 from db import Base
+from core.config import settings
 from core.dependencies import get_db
 from core.security import get_password_hash
 from models.user import User
 from models.document import Document
 from models.job import Job, JobStatus
+from services.gemini_service import GeminiService
+from services.outbox import OutboxRelay
 
 
 # Test database URL (use SQLite for testing)
@@ -147,6 +150,25 @@ async def test_job(test_db: AsyncSession, test_user: User) -> Job:
     return job
 
 
+@pytest.fixture
+def relay_outbox(test_db: AsyncSession):
+    """Publish pending outbox messages as the relay would; returns the count."""
+    relay = OutboxRelay(async_sessionmaker(test_db.bind, expire_on_commit=False))
+    return relay.relay_once
+
+
+@pytest.fixture
+def stub_service(monkeypatch) -> GeminiService:
+    """GeminiService running on the offline stub backend."""
+    monkeypatch.setattr(settings, "llm_backend", "stub")
+    monkeypatch.setattr(settings, "llm_stub_latency_ms", 0.0)
+    monkeypatch.setattr(settings, "gemini_rate_limit_backend", "local")
+    monkeypatch.setattr(settings, "gemini_requests_per_minute", 600000)
+    monkeypatch.setattr("services.rate_limiter._limiters", {})
+    monkeypatch.setattr("services.provider_pool._pools", {})
+    return GeminiService(scan_type="quick")
+
+
 @pytest.fixture
 def sample_security_policy() -> dict:
     """Return a sample security policy for testing."""
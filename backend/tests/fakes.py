@@ -0,0 +1,59 @@
+"""
+Test doubles shared across the unit tests.
+"""
+
+import asyncio
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ApiError(Exception):
+    """Error carrying an HTTP status code like google.api_core errors."""
+
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeGemini:
+    """
+    Analysis backend for worker tests: reports one gap without any LLM call.
+
+    With hold=True, analyze_documents waits until `release` is set. It
+    checks for cancellation once and reports it like GeminiService.
+    """
+
+    def __init__(self, controls: tuple[str, ...] = ("CC6.1",), hold: bool = False):
+        self.controls = [{"control_id": control_id} for control_id in controls]
+        self.hold = hold
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.calls = 0
+        self.paths: list[str] = []
+
+    def get_controls(self):
+        return self.controls
+
+    async def analyze_documents(self, paths, progress_callback=None, cancel_check=None):
+        self.calls += 1
+        self.paths.extend(paths)
+        self.started.set()
+        if self.hold:
+            await self.release.wait()
+        cancelled = await cancel_check() if cancel_check else False
+        # Evidence rows need PostgreSQL arrays, so report the gap only
+        return {
+            "evidence_items": [],
+            "gaps": [{"control_id": self.controls[0]["control_id"], "description": "No MFA policy"}],
+            "metrics": {},
+            "summary": {},
+            "cancelled": cancelled,
+        }
@@ -0,0 +1,129 @@
+"""
+Tests for the benchmark and load-test tooling.
+"""
+
+import httpx
+import pytest
+from httpx import ASGITransport
+
+from benchmarks.client import ApiClient, DeduplicatedRunError
+from benchmarks.load_test import LatencyRecorder, compare_to_baseline
+from benchmarks.stats import percentile, summarize
+from core.dependencies import get_db
+from main import app
+
+
+class TestStats:
+    """Tests for latency percentiles."""
+
+    def test_percentile_interpolates(self):
+        values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+        assert percentile(values, 50) == pytest.approx(5.5)
+        assert percentile(values, 100) == 10
+        assert percentile(values, 0) == 1
+
+    def test_empty(self):
+        assert percentile([], 95) == 0.0
+        assert summarize([])["count"] == 0
+
+
+class TestBaselineComparison:
+    """Tests for SLO regression detection."""
+
+    BASELINE = {"GET /jobs/{id}": {"p50": 20.0, "p95": 40.0, "p99": 60.0, "error_rate": 0.0}}
+
+    def test_detects_slowdown(self):
+        current = {"GET /jobs/{id}": {"p50": 21.0, "p95": 80.0, "p99": 61.0, "error_rate": 0.0}}
+
+        regressions = compare_to_baseline(current, self.BASELINE)
+
+        assert [(r["endpoint"], r["metric"]) for r in regressions] == [("GET /jobs/{id}", "p95")]
+        assert regressions[0]["change_pct"] == 100.0
+
+    def test_ignores_small_absolute_changes(self):
+        baseline = {"GET /health": {"p50": 1.0, "p95": 2.0, "p99": 3.0, "error_rate": 0.0}}
+        current = {"GET /health": {"p50": 2.0, "p95": 4.0, "p99": 6.0, "error_rate": 0.0}}
+
+        assert compare_to_baseline(current, baseline) == []
+
+    def test_detects_error_rate_increase(self):
+        current = {"GET /jobs/{id}": {"p50": 20.0, "p95": 40.0, "p99": 60.0, "error_rate": 0.1}}
+
+        regressions = compare_to_baseline(current, self.BASELINE)
+
+        assert [r["metric"] for r in regressions] == ["error_rate"]
+
+    def test_new_endpoints_ignored(self):
+        current = {"GET /new": {"p50": 500.0, "p95": 900.0, "p99": 999.0, "error_rate": 0.5}}
+        assert compare_to_baseline(current, self.BASELINE) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("final_status", ["SUCCEEDED", "FAILED", "CANCELLED"])
+async def test_wait_for_job_stops_at_terminal_status(final_status):
+    """Polling ends on the API's own status values, including cancellation."""
+    statuses = iter(["PENDING", "RUNNING", final_status])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"id": "job-1", "status": next(statuses)})
+
+    async with ApiClient("http://test", transport=httpx.MockTransport(handler)) as client:
+        job = await client.wait_for_job("job-1", poll_interval=0, timeout=5)
+
+    assert job["status"] == final_status
+
+
+@pytest.mark.asyncio
+async def test_deduplicated_run_rejected():
+    """A run answered by de-duplication would skew the benchmark."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(201, json={"id": "job-1", "deduplicated": True})
+
+    async with ApiClient("http://test", transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(DeduplicatedRunError):
+            await client.create_run(["doc-1"])
+
+    async with ApiClient(
+        "http://test", transport=httpx.MockTransport(handler), allow_dedup=True
+    ) as client:
+        assert (await client.create_run(["doc-1"]))["deduplicated"]
+
+
+@pytest.mark.asyncio
+async def test_client_records_user_journey(test_db, tmp_path):
+    """The load-test journey should run against the app and time each endpoint."""
+    async def override_get_db():
+        yield test_db
+
+    app.dependency_overrides[get_db] = override_get_db
+    document = tmp_path / "policy.txt"
+    document.write_text("All users must use MFA.")
+    recorder = LatencyRecorder()
+
+    try:
+        async with ApiClient(
+            "http://test", recorder=recorder, transport=ASGITransport(app=app)
+        ) as client:
+            await client.register("journey@example.com", "journey-password")
+            await client.login("journey@example.com", "journey-password")
+            document_id = await client.upload(document)
+            job = await client.create_run([document_id])
+            await client.get_job(job["id"])
+            await client.list_evidence(job["id"])
+            await client.list_gaps(job["id"])
+            await client.download_report(job["id"])
+    finally:
+        app.dependency_overrides.clear()
+
+    report = recorder.report(elapsed_seconds=1.0)
+    assert set(report) == {
+        "POST /auth/register",
+        "POST /auth/login",
+        "POST /documents/upload",
+        "POST /jobs/evidence-run",
+        "GET /jobs/{id}",
+        "GET /jobs/{id}/evidence",
+        "GET /jobs/{id}/gaps",
+        "GET /reports/pdf/{id}",
+    }
+    assert all(stats["errors"] == 0 for stats in report.values())
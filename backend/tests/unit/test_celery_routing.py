@@ -0,0 +1,51 @@
+"""
+Tests for Celery queue routing.
+"""
+
+import pytest
+
+from worker.celery_app import (
+    DEFAULT_QUEUE,
+    FULL_SCAN_QUEUE,
+    QUICK_SCAN_QUEUE,
+    celery_app,
+)
+
+
+def routed_queue(name: str, args=(), kwargs=None) -> str:
+    """Queue Celery would publish a task to."""
+    route = celery_app.amqp.router.route({}, name, args, kwargs or {})
+    return route["queue"].name
+
+
+class TestQueueRouting:
+    """Tests for routing tasks to per-workload queues."""
+
+    @pytest.mark.parametrize("scan_type,queue", [
+        ("quick", QUICK_SCAN_QUEUE),
+        ("full", FULL_SCAN_QUEUE),
+    ])
+    def test_analysis_routed_by_scan_type(self, scan_type, queue):
+        args = ("job-id", ["doc-id"], scan_type, "soc2")
+
+        assert routed_queue("worker.tasks.run_compliance_analysis", args) == queue
+
+    def test_scan_type_keyword(self):
+        kwargs = {"scan_type": "full"}
+
+        assert routed_queue(
+            "worker.tasks.run_compliance_analysis", ("job-id", ["doc-id"]), kwargs
+        ) == FULL_SCAN_QUEUE
+
+    def test_missing_scan_type_is_quick(self):
+        assert routed_queue(
+            "worker.tasks.run_compliance_analysis", ("job-id", ["doc-id"])
+        ) == QUICK_SCAN_QUEUE
+
+    def test_unrouted_tasks_use_default_queue(self):
+        assert routed_queue("worker.tasks.cleanup") == DEFAULT_QUEUE
+
+    def test_all_queues_declared(self):
+        declared = {q.name for q in celery_app.conf.task_queues}
+
+        assert declared == {DEFAULT_QUEUE, QUICK_SCAN_QUEUE, FULL_SCAN_QUEUE}
@@ -151,3 +151,33 @@ class TestGetControl:
         data = response.json()
         assert data["control_id"] == "P1.1"
         assert "Privacy" in data["category"]
+
+
+@pytest.mark.asyncio
+class TestFrameworks:
+    """Tests for multi-framework control listing."""
+
+    async def test_list_frameworks(self, client: AsyncClient):
+        """All installed framework packs should be listed."""
+        response = await client.get("/api/controls/frameworks")
+
+        assert response.status_code == 200
+        ids = [f["framework_id"] for f in response.json()["frameworks"]]
+        assert {"soc2", "iso27001", "hipaa"} <= set(ids)
+
+    async def test_list_iso_controls(self, client: AsyncClient):
+        """Controls should be listed for non-SOC 2 frameworks."""
+        response = await client.get(
+            "/api/controls?framework=iso27001&scan_type=full"
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 93
+        assert data["controls"][0]["framework"] == "ISO27001"
+
+    async def test_unknown_framework(self, client: AsyncClient):
+        """Unknown frameworks should return 404."""
+        response = await client.get("/api/controls?framework=nope")
+
+        assert response.status_code == 404
@@ -0,0 +1,219 @@
+"""
+Tests for the compliance framework registry.
+"""
+
+import json
+import threading
+
+import pytest
+
+from services.framework_registry import (
+    FrameworkRegistry,
+    FrameworkNotFoundError,
+    FrameworkPackError,
+    compile_pack,
+    get_framework,
+    normalize_framework_id,
+)
+
+
+@pytest.fixture
+def minimal_pack():
+    """A small valid framework pack."""
+    return {
+        "framework_id": "test-fw",
+        "name": "Test Framework",
+        "version": "1.0",
+        "sections": [
+            {
+                "id": "T",
+                "name": "Test Section",
+                "controls": [
+                    {
+                        "control_id": "T.1",
+                        "category": "Testing",
+                        "title": "First Control",
+                        "description": "The first test control.",
+                        "objective": "test coverage",
+                        "look_for": ["Unit tests", "Integration tests"],
+                    },
+                    {
+                        "control_id": "T.2",
+                        "category": "Testing",
+                        "title": "Second Control",
+                        "description": "The second test control.",
+                        "check_prompt": "Analyze for anything. Provide JSON response.",
+                    },
+                ],
+            }
+        ],
+        "scan_profiles": {"quick": ["T.2"]},
+    }
+
+
+class TestBuiltinPacks:
+    """Tests for the packs shipped with the application."""
+
+    def test_soc2_pack(self):
+        """SOC 2 pack should keep the 51 controls and 8-control quick scan."""
+        catalog = get_framework("soc2")
+        assert catalog.short_name == "SOC2"
+        assert catalog.control_count("full") == 51
+        assert catalog.control_count("quick") == 8
+
+    def test_iso27001_pack(self):
+        """ISO 27001 pack should cover all Annex A controls."""
+        catalog = get_framework("ISO-27001")
+        assert catalog.framework_id == "iso27001"
+        assert catalog.control_count("full") == 93
+        assert catalog.get_control("a.8.5")["title"] == "Secure Authentication"
+
+    def test_hipaa_pack(self):
+        """HIPAA pack should load with a quick scan profile."""
+        catalog = get_framework("hipaa")
+        assert catalog.control_count("quick") == 8
+        assert catalog.get_control("164.312(b)") is not None
+
+    def test_catalog_is_memoized(self):
+        """Repeated lookups should return the same compiled catalog."""
+        assert get_framework("soc2") is get_framework("SOC 2")
+
+    def test_unknown_framework(self):
+        """Unknown framework should raise FrameworkNotFoundError."""
+        with pytest.raises(FrameworkNotFoundError):
+            get_framework("pci-dss-99")
+
+
+class TestCompilePack:
+    """Tests for pack compilation."""
+
+    def test_compiles_check_prompt_from_look_for(self, minimal_pack):
+        """Structured entries should compile into the standard check prompt."""
+        control = compile_pack(minimal_pack).get_control("T.1")
+        assert control["check_prompt"].startswith("Analyze for evidence of test coverage.")
+        assert "- Unit tests" in control["check_prompt"]
+        assert "json" in control["check_prompt"].lower()
+
+    def test_explicit_check_prompt_kept(self, minimal_pack):
+        """An explicit check_prompt should be used verbatim."""
+        control = compile_pack(minimal_pack).get_control("T.2")
+        assert control["check_prompt"] == "Analyze for anything. Provide JSON response."
+
+    def test_scan_profiles(self, minimal_pack):
+        """Scan profiles should resolve to control dicts."""
+        catalog = compile_pack(minimal_pack)
+        assert [c["control_id"] for c in catalog.get_controls("quick")] == ["T.2"]
+        assert catalog.control_count("full") == 2
+
+    def test_prompt_template(self, minimal_pack):
+        """Precompiled templates should wrap the document section."""
+        catalog = compile_pack(minimal_pack)
+        control = catalog.get_control("T.1")
+        prompt = catalog.get_prompt_template(control).render("DOC TEXT")
+        assert "a Test Framework compliance expert" in prompt
+        assert "Control ID: T.1" in prompt
+        assert "DOCUMENTS TO ANALYZE:\nDOC TEXT\n\nCONTROL BEING EVALUATED" in prompt
+        assert prompt.endswith("}")
+
+    def test_prompt_prefix_shared_across_controls(self, minimal_pack):
+        """Only the suffix should depend on the control."""
+        catalog = compile_pack(minimal_pack)
+        first = catalog.get_prompt_template(catalog.get_control("T.1"))
+        second = catalog.get_prompt_template(catalog.get_control("T.2"))
+        assert first.prefix == second.prefix == catalog.document_prefix
+        assert first.suffix != second.suffix
+
+    def test_prompt_template_is_precompiled(self, minimal_pack):
+        """Catalog controls should reuse the same template object."""
+        catalog = compile_pack(minimal_pack)
+        control = catalog.get_control("T.1")
+        assert catalog.get_prompt_template(control) is catalog.get_prompt_template(control)
+
+    def test_duplicate_control_ids(self, minimal_pack):
+        """Duplicate control IDs should be rejected."""
+        minimal_pack["sections"][0]["controls"][1]["control_id"] = "t.1"
+        with pytest.raises(FrameworkPackError):
+            compile_pack(minimal_pack)
+
+    def test_unknown_profile_control(self, minimal_pack):
+        """Scan profiles must only reference known controls."""
+        minimal_pack["scan_profiles"]["quick"].append("T.9")
+        with pytest.raises(FrameworkPackError):
+            compile_pack(minimal_pack)
+
+    def test_missing_fields(self, minimal_pack):
+        """Packs without required fields should be rejected."""
+        del minimal_pack["version"]
+        with pytest.raises(FrameworkPackError):
+            compile_pack(minimal_pack)
+
+
+class TestFrameworkRegistry:
+    """Tests for pack discovery and memoization."""
+
+    def test_discovers_packs(self, tmp_path, minimal_pack):
+        """Registry should discover packs in its directory."""
+        (tmp_path / "test-fw.json").write_text(json.dumps(minimal_pack))
+        (tmp_path / "notes.txt").write_text("ignored")
+
+        registry = FrameworkRegistry(tmp_path)
+        assert registry.available_frameworks() == ["testfw"]
+        assert registry.has_framework("Test-FW")
+        assert registry.get("testfw").name == "Test Framework"
+
+    def test_keyed_by_declared_framework_id(self, tmp_path, minimal_pack):
+        """The pack's framework_id, not its file name, identifies it."""
+        (tmp_path / "controls-v2.json").write_text(json.dumps(minimal_pack))
+
+        registry = FrameworkRegistry(tmp_path)
+
+        assert registry.available_frameworks() == ["testfw"]
+        assert not registry.has_framework("controls-v2")
+        assert registry.get("testfw").framework_id == "testfw"
+
+    def test_duplicate_framework_ids_rejected(self, tmp_path, minimal_pack):
+        (tmp_path / "a.json").write_text(json.dumps(minimal_pack))
+        (tmp_path / "b.json").write_text(json.dumps(minimal_pack))
+
+        with pytest.raises(FrameworkPackError, match="a.json and b.json"):
+            FrameworkRegistry(tmp_path).available_frameworks()
+
+    def test_clear_reloads(self, tmp_path, minimal_pack):
+        """clear() should drop memoized catalogs."""
+        (tmp_path / "testfw.json").write_text(json.dumps(minimal_pack))
+        registry = FrameworkRegistry(tmp_path)
+        first = registry.get("testfw")
+
+        registry.clear()
+        assert registry.get("testfw") is not first
+
+    def test_each_pack_parsed_once(self, tmp_path, minimal_pack, monkeypatch):
+        """Discovery's parse should be reused when the pack is compiled."""
+        import services.framework_registry as registry_module
+
+        (tmp_path / "testfw.json").write_text(json.dumps(minimal_pack))
+        loads = []
+        load = registry_module._load_pack_file
+        monkeypatch.setattr(
+            registry_module, "_load_pack_file", lambda path: loads.append(path) or load(path)
+        )
+        registry = FrameworkRegistry(tmp_path)
+
+        barrier = threading.Barrier(4)
+
+        def first_use():
+            barrier.wait()
+            registry.get("testfw")
+
+        threads = [threading.Thread(target=first_use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loads == [tmp_path / "testfw.json"]
+
+    def test_normalize_framework_id(self):
+        """Framework names should normalize to pack IDs."""
+        assert normalize_framework_id("ISO 27001") == "iso27001"
+        assert normalize_framework_id("SOC-2") == "soc2"
@@ -0,0 +1,580 @@
+"""
+Unit tests for the Gemini service that do not call the Gemini API.
+"""
+
+import json
+import re
+
+import fakeredis
+import pytest
+from prometheus_client import REGISTRY
+
+from core.config import settings
+from services.gemini_service import GeminiService
+from services.map_reduce import MapCache
+from services.provider_pool import DEFAULT_TIER, FAST_TIER, ModelEndpoint, ProviderPool
+from services.rate_limiter import get_rate_limiter
+
+
+class FakeResponse:
+    """Minimal stand-in for a Gemini response."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModel:
+    """Records generate_content calls and returns a canned verdict."""
+
+    def __init__(self, model_name: str = "models/gemini-1.5-flash"):
+        self.model_name = model_name
+        self.calls: list = []
+
+    def generate_content(self, contents, **kwargs):
+        self.calls.append(contents)
+        return FakeResponse(json.dumps({
+            "status": "pass",
+            "confidence": 0.9,
+            "summary": "Found it",
+            "evidence_quote": "MFA is required",
+            "gaps": [],
+        }))
+
+
+def fake_endpoint(api_key: str, tier: str = DEFAULT_TIER) -> ModelEndpoint:
+    """Pool endpoint backed by a FakeModel."""
+    model = FakeModel(f"models/{tier}-model")
+    return ModelEndpoint(
+        key_id=api_key,
+        model_name=model.model_name,
+        tier=tier,
+        model=model,
+        limiter=get_rate_limiter(api_key, model.model_name),
+    )
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """GeminiService with a fake model and an unconstrained local rate limiter."""
+    monkeypatch.setattr(settings, "gemini_api_key", "test-api-key")
+    monkeypatch.setattr(settings, "gemini_rate_limit_backend", "local")
+    monkeypatch.setattr(settings, "gemini_requests_per_minute", 600000)
+    monkeypatch.setattr(settings, "gemini_backoff_base_seconds", 0.0)
+    monkeypatch.setattr("services.rate_limiter._limiters", {})
+    monkeypatch.setattr("services.provider_pool._pools", {})
+    service = GeminiService(scan_type="quick")
+    service.pool = ProviderPool([fake_endpoint("test-api-key")])
+    return service
+
+
+@pytest.fixture
+def policy_file(tmp_path):
+    """A small text evidence document."""
+    path = tmp_path / "policy.txt"
+    path.write_text("All users must use MFA. Access is reviewed quarterly.")
+    return str(path)
+
+
+@pytest.mark.asyncio
+class TestPromptStructure:
+    """Tests for shared document segment and per-control instructions."""
+
+    async def test_document_segment_leads_request(self, gemini, policy_file):
+        """Every request should start with the same document segment."""
+        await gemini.analyze_documents([policy_file])
+
+        calls = gemini.model.calls
+        assert len(calls) == len(gemini.controls)
+        segments = {call[0] for call in calls}
+        assert len(segments) == 1
+        assert "All users must use MFA" in segments.pop()
+
+    async def test_control_instructions_follow_documents(self, gemini, policy_file):
+        """The second part should carry only the control instructions."""
+        await gemini.analyze_documents([policy_file])
+
+        first_call = gemini.model.calls[0]
+        control = gemini.controls[0]
+        assert f"Control ID: {control['control_id']}" in first_call[1]
+        assert "All users must use MFA" not in first_call[1]
+
+    async def test_analyze_control_builds_segment(self, gemini):
+        """analyze_control should work without a prebuilt segment."""
+        result = await gemini.analyze_control(gemini.controls[0], ["Policy text"])
+
+        assert result["status"] == "pass"
+        assert "Policy text" in gemini.model.calls[0][0]
+
+
+class FakeCachedContent:
+    """Stand-in for a Gemini CachedContent handle."""
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.deleted = False
+        self.ttl_updates = []
+
+    def update(self, ttl=None):
+        self.ttl_updates.append(ttl)
+
+    def delete(self):
+        self.deleted = True
+
+
+@pytest.fixture
+def fake_cache(monkeypatch, gemini):
+    """Route context cache creation to fakes and make every job cacheable."""
+    created = []
+    cached_model = FakeModel()
+
+    def create(**kwargs):
+        cache = FakeCachedContent(kwargs["contents"])
+        created.append(cache)
+        return cache
+
+    monkeypatch.setattr(settings, "gemini_cache_min_tokens", 1)
+    monkeypatch.setattr("services.gemini_service.caching.CachedContent.create", create)
+    monkeypatch.setattr(
+        "services.gemini_service.genai.GenerativeModel.from_cached_content",
+        lambda cached_content, generation_config=None: cached_model,
+    )
+    return created, cached_model
+
+
+@pytest.mark.asyncio
+class TestContextCache:
+    """Tests for the per-job document context cache."""
+
+    async def test_small_documents_sent_inline(self, gemini, policy_file):
+        """Segments below the minimum cacheable size should stay inline."""
+        results = await gemini.analyze_documents([policy_file])
+
+        assert results["context_cache_used"] is False
+        assert all(len(call) == 2 for call in gemini.model.calls)
+
+    async def test_cached_context_reused_and_deleted(self, gemini, policy_file, fake_cache):
+        """All controls should reference one cache that is deleted afterwards."""
+        created, cached_model = fake_cache
+
+        results = await gemini.analyze_documents([policy_file])
+
+        assert results["context_cache_used"] is True
+        assert len(created) == 1
+        assert "All users must use MFA" in created[0].contents[0]
+        assert created[0].deleted
+        assert gemini.model.calls == []
+        assert len(cached_model.calls) == len(gemini.controls)
+        assert all(len(call) == 1 for call in cached_model.calls)
+        assert all(c["cache_hit"] for c in results["metrics"]["controls"])
+
+    async def test_cache_ttl_extended_during_job(
+        self, gemini, policy_file, fake_cache, monkeypatch
+    ):
+        """A job outliving the cache TTL should keep renewing it."""
+        created, _ = fake_cache
+        monkeypatch.setattr(settings, "gemini_cache_ttl_seconds", 0)
+
+        await gemini.analyze_documents([policy_file])
+
+        assert len(created[0].ttl_updates) == len(gemini.controls)
+
+    async def test_cache_not_extended_early(self, gemini, policy_file, fake_cache):
+        created, _ = fake_cache
+
+        await gemini.analyze_documents([policy_file])
+
+        assert created[0].ttl_updates == []
+
+    async def test_cache_failure_falls_back_inline(
+        self, gemini, policy_file, fake_cache, monkeypatch
+    ):
+        """A cache creation error should not fail the job."""
+        def fail(**kwargs):
+            raise RuntimeError("caching not supported for model")
+
+        monkeypatch.setattr("services.gemini_service.caching.CachedContent.create", fail)
+
+        results = await gemini.analyze_documents([policy_file])
+
+        assert results["context_cache_used"] is False
+        assert len(gemini.model.calls) == len(gemini.controls)
+
+
+class ThrottledError(Exception):
+    """Error carrying an HTTP status code like google.api_core errors."""
+
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+@pytest.mark.asyncio
+class TestRetries:
+    """Tests for retrying throttled Gemini calls."""
+
+    async def test_throttled_call_is_retried(self, gemini):
+        """A 429 followed by success should produce a normal verdict."""
+        model = gemini.model
+        original = model.generate_content
+        failures = [ThrottledError(429)]
+
+        def flaky(contents, **kwargs):
+            if failures:
+                raise failures.pop()
+            return original(contents, **kwargs)
+
+        model.generate_content = flaky
+
+        result = await gemini.analyze_control(gemini.controls[0], ["Policy text"])
+
+        assert result["status"] == "pass"
+        assert result["retries"] == 1
+
+    async def test_client_error_not_retried(self, gemini):
+        """A 400 should be recorded as an error without retrying."""
+        calls = []
+
+        def bad_request(contents, **kwargs):
+            calls.append(contents)
+            raise ThrottledError(400)
+
+        gemini.model.generate_content = bad_request
+
+        result = await gemini.analyze_control(gemini.controls[0], ["Policy text"])
+
+        assert result["status"] == "error"
+        assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+class TestRouting:
+    """Tests for routing controls across keys and model tiers."""
+
+    async def test_requests_spread_across_keys(self, gemini, policy_file):
+        """Controls should be shared between API keys."""
+        gemini.pool = ProviderPool([fake_endpoint("key-a"), fake_endpoint("key-b")])
+
+        await gemini.analyze_documents([policy_file])
+
+        counts = [len(e.model.calls) for e in gemini.pool.endpoints]
+        assert sum(counts) == len(gemini.controls)
+        assert all(count > 0 for count in counts)
+
+    async def test_quick_scan_uses_fast_tier(self, gemini, policy_file, monkeypatch):
+        """Quick scans should go to the fast model when one is configured."""
+        monkeypatch.setattr(settings, "gemini_fast_model", "gemini-1.5-flash-8b")
+        default, fast = fake_endpoint("key-a"), fake_endpoint("key-a", FAST_TIER)
+        gemini.pool = ProviderPool([default, fast])
+
+        await gemini.analyze_documents([policy_file])
+
+        assert default.model.calls == []
+        assert len(fast.model.calls) == len(gemini.controls)
+
+    async def test_full_scan_uses_default_tier(self, gemini, monkeypatch):
+        """Standard-risk controls in a full scan stay on the default model."""
+        monkeypatch.setattr(settings, "gemini_fast_model", "gemini-1.5-flash-8b")
+        default, fast = fake_endpoint("key-a"), fake_endpoint("key-a", FAST_TIER)
+        gemini.pool = ProviderPool([default, fast])
+        gemini.scan_type = "full"
+
+        await gemini.analyze_control(gemini.controls[0], ["Policy text"])
+
+        assert len(default.model.calls) == 1
+        assert fast.model.calls == []
+
+
+@pytest.mark.asyncio
+class TestMetrics:
+    """Tests for LLM and extraction metrics."""
+
+    async def test_parse_failures_counted(self, gemini):
+        """Unparseable responses should be flagged and counted per control."""
+        gemini.model.generate_content = lambda contents, **kwargs: FakeResponse("not json")
+        control = gemini.controls[0]
+        labels = {"tier": "default", "control_id": control["control_id"]}
+        before = REGISTRY.get_sample_value("shieldagent_llm_parse_failures_total", labels) or 0
+
+        result = await gemini.analyze_control(control, ["Policy text"])
+
+        assert result["parse_failed"] is True
+        assert REGISTRY.get_sample_value(
+            "shieldagent_llm_parse_failures_total", labels
+        ) == before + 1
+
+    async def test_repaired_parses_counted(self, gemini):
+        """Replies recovered by the repair step should be flagged as repaired."""
+        gemini.model.generate_content = lambda contents, **kwargs: FakeResponse(
+            'Here you go: {"status": "pass", "confidence": 0.8, "summary": "ok", "gaps": [],}'
+        )
+        labels = {"tier": "default", "method": "repaired"}
+        before = REGISTRY.get_sample_value("shieldagent_llm_parse_results_total", labels) or 0
+
+        result = await gemini.analyze_control(gemini.controls[0], ["Policy text"])
+
+        assert result["status"] == "pass"
+        assert result["parse_repaired"] is True
+        assert REGISTRY.get_sample_value(
+            "shieldagent_llm_parse_results_total", labels
+        ) == before + 1
+
+    async def test_extraction_timed_by_file_type(self, gemini, policy_file):
+        labels = {"file_type": "txt"}
+        before = REGISTRY.get_sample_value(
+            "shieldagent_document_extraction_seconds_count", labels
+        ) or 0
+
+        await gemini.extract_document_text(policy_file)
+
+        assert REGISTRY.get_sample_value(
+            "shieldagent_document_extraction_seconds_count", labels
+        ) == before + 1
+
+    async def test_job_metrics_per_document_and_control(self, gemini, policy_file, tmp_path):
+        """Results should carry extraction and LLM telemetry for the job record."""
+        missing = str(tmp_path / "missing.pdf")
+
+        results = await gemini.analyze_documents([policy_file, missing])
+
+        documents = results["metrics"]["documents"]
+        assert [d["path"] for d in documents] == [policy_file, missing]
+        assert documents[0]["chars"] > 0 and documents[0]["error"] is None
+        assert "not found" in documents[1]["error"]
+        controls = results["metrics"]["controls"]
+        assert [c["control_id"] for c in controls] == [c["control_id"] for c in gemini.controls]
+        assert all(c["latency_ms"] is not None and not c["cache_hit"] for c in controls)
+
+
+@pytest.mark.asyncio
+class TestRelevancePrefilter:
+    """Tests for answering unsupported controls without an LLM call."""
+
+    @pytest.fixture
+    def full_scan(self, gemini):
+        gemini.scan_type = "full"
+        gemini.controls = gemini.catalog.get_controls("full")
+        return gemini
+
+    async def test_unmentioned_controls_skip_llm(self, full_scan, policy_file):
+        results = await full_scan.analyze_documents([policy_file])
+
+        calls = len(full_scan.pool.primary.model.calls)
+        items = {e["control_id"]: e for e in results["evidence_items"]}
+        assert len(items) == len(full_scan.controls)
+        assert 0 < calls < len(full_scan.controls)
+        assert items["P1.1"]["status"] == "not_applicable"
+        assert "not sent for AI analysis" in items["P1.1"]["summary"]
+        assert not [g for g in results["gaps"] if g["control_id"] == "P1.1"]
+        assert results["summary"]["not_applicable"] == len(full_scan.controls) - calls
+        prefiltered = [c for c in results["metrics"]["controls"] if c["prefiltered"]]
+        assert len(prefiltered) == len(full_scan.controls) - calls
+
+    async def test_quick_scan_not_prefiltered(self, gemini, policy_file):
+        await gemini.analyze_documents([policy_file])
+
+        assert len(gemini.pool.primary.model.calls) == len(gemini.controls)
+
+    async def test_disabled_sends_every_control(self, full_scan, policy_file, monkeypatch):
+        monkeypatch.setattr(settings, "relevance_filter_scan_types", [])
+
+        await full_scan.analyze_documents([policy_file])
+
+        assert len(full_scan.pool.primary.model.calls) == len(full_scan.controls)
+
+
+@pytest.mark.asyncio
+class TestCascade:
+    """Tests for escalating uncertain fast-tier verdicts to the default model."""
+
+    @pytest.fixture
+    def tiers(self, gemini, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_fast_model", "gemini-1.5-flash-8b")
+        monkeypatch.setattr(settings, "gemini_cascade_enabled", True)
+        default, fast = fake_endpoint("key-a"), fake_endpoint("key-a", FAST_TIER)
+        gemini.pool = ProviderPool([default, fast])
+        gemini.scan_type = "full"
+        return default, fast
+
+    async def test_confident_verdict_accepted(self, gemini, tiers):
+        default, fast = tiers
+
+        result = await gemini.evaluate_control(gemini.controls[0], ["Policy text"])
+
+        assert len(fast.model.calls) == 1
+        assert default.model.calls == []
+        assert result["tier"] == FAST_TIER
+        assert result["escalated"] is False
+
+    async def test_low_confidence_escalated(self, gemini, tiers):
+        default, fast = tiers
+        fast.model.generate_content = lambda contents, **kwargs: FakeResponse(json.dumps({
+            "status": "pass", "confidence": 0.4, "summary": "Maybe", "gaps": [],
+        }))
+        control = gemini.controls[0]
+        labels = {"category": control["category"], "outcome": "low_confidence"}
+        before = REGISTRY.get_sample_value("shieldagent_llm_cascade_decisions_total", labels) or 0
+
+        result = await gemini.evaluate_control(control, ["Policy text"])
+
+        assert len(default.model.calls) == 1
+        assert result["tier"] == DEFAULT_TIER
+        assert result["confidence"] == 0.9
+        assert result["escalation_reason"] == "low_confidence"
+        assert [p["tier"] for p in result["cascade"]] == [FAST_TIER, DEFAULT_TIER]
+        assert REGISTRY.get_sample_value(
+            "shieldagent_llm_cascade_decisions_total", labels
+        ) == before + 1
+
+    async def test_parse_failure_escalated(self, gemini, tiers):
+        default, fast = tiers
+        fast.model.generate_content = lambda contents, **kwargs: FakeResponse("not json")
+
+        result = await gemini.evaluate_control(gemini.controls[0], ["Policy text"])
+
+        assert result["escalation_reason"] == "parse_failure"
+        assert result["status"] == "pass"
+
+    async def test_failed_escalation_keeps_fast_verdict(self, gemini, tiers):
+        default, fast = tiers
+        fast.model.generate_content = lambda contents, **kwargs: FakeResponse(json.dumps({
+            "status": "needs_review", "confidence": 0.8, "summary": "Unclear", "gaps": [],
+        }))
+        default.model.generate_content = lambda contents, **kwargs: (_ for _ in ()).throw(
+            ValueError("bad request")
+        )
+
+        result = await gemini.evaluate_control(gemini.controls[0], ["Policy text"])
+
+        assert result["status"] == "needs_review"
+        assert result["tier"] == FAST_TIER
+        assert result["escalated"] is True
+
+    async def test_category_policy_disables_cascade(self, gemini, tiers, monkeypatch):
+        default, fast = tiers
+        control = gemini.controls[0]
+        monkeypatch.setattr(
+            settings, "gemini_cascade_policies", {control["category"].upper(): {"enabled": False}}
+        )
+
+        result = await gemini.evaluate_control(control, ["Policy text"])
+
+        assert len(default.model.calls) == 1
+        assert fast.model.calls == []
+        assert "escalated" not in result
+
+    async def test_escalations_in_job_metrics(self, gemini, tiers, policy_file):
+        default, fast = tiers
+        fast.model.generate_content = lambda contents, **kwargs: FakeResponse(json.dumps({
+            "status": "fail", "confidence": 0.5, "summary": "Missing", "gaps": [],
+        }))
+        gemini.scan_type = "quick"
+
+        results = await gemini.analyze_documents([policy_file])
+
+        controls = results["metrics"]["controls"]
+        assert all(c["escalated"] for c in controls)
+        assert len(default.model.calls) == len(controls)
+
+
+@pytest.mark.asyncio
+class TestPromptBudget:
+    """Tests for packing documents by token budget."""
+
+    async def test_context_fill_reported_per_call(self, gemini):
+        result = await gemini.analyze_control(gemini.controls[0], ["Policy text"])
+
+        assert result["prompt_tokens_estimated"] > 0
+        assert 0 < result["context_fill"] < 1
+
+    async def test_oversized_documents_keep_relevant_chunks(self, gemini, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_map_reduce_enabled", False)
+        monkeypatch.setattr(settings, "gemini_max_document_tokens", 1200)
+        monkeypatch.setattr(settings, "gemini_chunk_tokens", 100)
+        filler = "\n\n".join(f"Cafeteria menu item {i} " + "lunch " * 60 for i in range(40))
+        evidence = "All users authenticate with MFA and SSO; access reviews run quarterly."
+        path = tmp_path / "binder.txt"
+        path.write_text(f"{filler}\n\n{evidence}\n\n{filler}")
+
+        results = await gemini.analyze_documents([str(path)])
+
+        packing = results["metrics"]["packing"]
+        assert packing["chunks_packed"] < packing["chunks_total"]
+        assert packing["tokens"] <= packing["budget_tokens"]
+        segment = gemini.pool.primary.model.calls[0][0]
+        assert evidence in segment
+        assert "sections omitted" in segment
+
+
+class MapReduceModel(FakeModel):
+    """Answers map requests with findings for sections mentioning MFA."""
+
+    def __init__(self, model_name: str = "models/default-model"):
+        super().__init__(model_name)
+        self.map_calls: list = []
+        self.fail_sections_with = None
+
+    def generate_content(self, contents, **kwargs):
+        if "CONTROLS:" not in contents[-1]:
+            return super().generate_content(contents, **kwargs)
+        self.map_calls.append(contents)
+        section = contents[0]
+        if self.fail_sections_with and self.fail_sections_with in section:
+            raise ValueError("bad request")
+        control_ids = re.findall(r"^- (\S+) \(", contents[-1], re.MULTILINE)
+        findings = [
+            {"control_id": control_id, "quote": "MFA is enforced for all users", "note": ""}
+            for control_id in control_ids
+            if "MFA is enforced" in section
+        ]
+        return FakeResponse(json.dumps({"findings": findings}))
+
+
+@pytest.mark.asyncio
+class TestMapReduce:
+    """Tests for mapping evidence that does not fit the token budget."""
+
+    @pytest.fixture
+    def binder(self, gemini, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_max_document_tokens", 600)
+        monkeypatch.setattr(settings, "gemini_map_chunk_tokens", 400)
+        cache = MapCache(fakeredis.FakeRedis(), 60)
+        monkeypatch.setattr("services.gemini_service.get_map_cache", lambda: cache)
+        model = MapReduceModel()
+        gemini.pool.primary.model = model
+        filler = "\n\n".join(f"Cafeteria menu item {i} " + "lunch " * 60 for i in range(20))
+        path = tmp_path / "binder.txt"
+        path.write_text(f"{filler}\n\nMFA is enforced for all users.")
+        return str(path)
+
+    async def test_evidence_past_budget_reaches_verdict(self, gemini, binder):
+        results = await gemini.analyze_documents([binder])
+
+        model = gemini.pool.primary.model
+        stats = results["metrics"]["map_reduce"]
+        assert stats["sections"] > 1
+        assert stats["calls"] == len(model.map_calls) == stats["sections"] * stats["groups"]
+        reduce_segment = model.calls[0][0]
+        assert '"MFA is enforced for all users"' in reduce_segment
+        assert f"split into {stats['sections']} sections" in reduce_segment
+        assert results["context_cache_used"] is False
+        assert len(results["evidence_items"]) == len(gemini.controls)
+
+    async def test_unchanged_sections_not_remapped(self, gemini, binder):
+        first = await gemini.analyze_documents([binder])
+        model = gemini.pool.primary.model
+        map_calls = len(model.map_calls)
+
+        second = await gemini.analyze_documents([binder])
+
+        assert len(model.map_calls) == map_calls
+        assert second["metrics"]["map_reduce"]["calls"] == 0
+        assert second["metrics"]["map_reduce"]["cache_hits"] == first["metrics"]["map_reduce"]["calls"]
+
+    async def test_failed_section_left_unreviewed(self, gemini, binder):
+        gemini.pool.primary.model.fail_sections_with = "Cafeteria menu item 0 "
+
+        results = await gemini.analyze_documents([binder])
+
+        assert results["metrics"]["map_reduce"]["errors"] > 0
+        reduce_segment = gemini.pool.primary.model.calls[0][0]
+        assert "Section 1 could not be reviewed" in reduce_segment
@@ -2,9 +2,25 @@
 Tests for health check endpoint.
 """
 
+import asyncio
+
+import fakeredis
 import pytest
 from httpx import AsyncClient
 
+from core.config import settings
+from core.readiness import (
+    ReadinessChecker,
+    _redis_probe_client,
+    get_readiness_checker,
+    probe_celery_workers,
+    probe_redis,
+    probe_upload_dir,
+)
+from main import app
+from tests.fakes import FakeClock
+from worker.celery_app import celery_app
+
 
 @pytest.mark.asyncio
 class TestHealthCheck:
@@ -32,3 +48,161 @@ class TestHealthCheck:
         
         # Should succeed without auth headers
         assert response.status_code == 200
+
+
+def counting_probe(calls: dict, name: str, error: Exception | None = None):
+    """Probe that counts invocations and optionally fails."""
+    async def probe():
+        calls[name] = calls.get(name, 0) + 1
+        if error:
+            raise error
+        return None
+    return probe
+
+
+@pytest.mark.asyncio
+class TestReadinessChecker:
+    """Tests for cached dependency probes."""
+
+    async def test_results_cached_for_ttl(self):
+        calls = {}
+        clock = FakeClock()
+        checker = ReadinessChecker(
+            {"database": counting_probe(calls, "database")},
+            required=["database"],
+            ttl_seconds=5.0,
+            clock=clock,
+        )
+
+        first = await checker.check()
+        clock.now = 4.9
+        second = await checker.check()
+        clock.now = 5.1
+        third = await checker.check()
+
+        assert calls["database"] == 2
+        assert (first["cached"], second["cached"], third["cached"]) == (False, True, False)
+        assert first["checks"]["database"]["status"] == "ok"
+        assert "latency_ms" in first["checks"]["database"]
+
+    async def test_concurrent_checks_share_probes(self):
+        calls = {}
+        checker = ReadinessChecker({"redis": counting_probe(calls, "redis")}, required=["redis"])
+
+        await asyncio.gather(*(checker.check() for _ in range(10)))
+
+        assert calls["redis"] == 1
+
+    async def test_required_failure_not_ready(self):
+        calls = {}
+        checker = ReadinessChecker(
+            {
+                "database": counting_probe(calls, "database", ConnectionError("refused")),
+                "redis": counting_probe(calls, "redis"),
+            },
+            required=["database", "redis"],
+        )
+
+        report = await checker.check()
+
+        assert report["status"] == "not_ready"
+        assert "refused" in report["checks"]["database"]["error"]
+        assert report["checks"]["redis"]["status"] == "ok"
+
+    async def test_optional_failure_still_ready(self):
+        calls = {}
+        checker = ReadinessChecker(
+            {
+                "database": counting_probe(calls, "database"),
+                "celery": counting_probe(calls, "celery", RuntimeError("No workers")),
+            },
+            required=["database"],
+        )
+
+        report = await checker.check()
+
+        assert report["status"] == "ready"
+        assert report["checks"]["celery"]["status"] == "error"
+        assert report["checks"]["celery"]["required"] is False
+
+    async def test_slow_probe_times_out(self):
+        async def hang():
+            await asyncio.sleep(10)
+
+        checker = ReadinessChecker({"database": hang}, required=["database"], timeout_seconds=0.05)
+
+        report = await checker.check()
+
+        assert report["status"] == "not_ready"
+        assert "Timed out" in report["checks"]["database"]["error"]
+
+    async def test_upload_dir_probe(self, tmp_path, monkeypatch):
+        upload_dir = tmp_path / "uploads"
+        monkeypatch.setattr(settings, "upload_dir", str(upload_dir))
+
+        await probe_upload_dir()
+
+        assert upload_dir.is_dir()
+        assert list(upload_dir.iterdir()) == []
+
+    async def test_redis_probe_bounded_by_timeout(self, monkeypatch):
+        timeouts = []
+        monkeypatch.setattr(settings, "readiness_probe_timeout_seconds", 0.5)
+        monkeypatch.setattr(
+            "core.readiness._redis_probe_client",
+            lambda timeout: timeouts.append(timeout) or fakeredis.FakeRedis(),
+        )
+
+        await probe_redis()
+        kwargs = _redis_probe_client(0.5).connection_pool.connection_kwargs
+
+        assert timeouts == [0.5]
+        assert kwargs["socket_timeout"] == 0.5
+        assert kwargs["socket_connect_timeout"] == 0.5
+
+    async def test_celery_probe_bounded_by_timeout(self, monkeypatch):
+        pings = []
+
+        def ping(timeout, connection):
+            pings.append((timeout, connection.connect_timeout, connection.transport_options))
+            return [{"worker@host": {"ok": "pong"}}]
+
+        monkeypatch.setattr(settings, "readiness_probe_timeout_seconds", 0.5)
+        monkeypatch.setattr(celery_app.control, "ping", ping)
+
+        detail = await probe_celery_workers()
+
+        [(timeout, connect_timeout, transport_options)] = pings
+        assert timeout == connect_timeout == 0.25
+        assert transport_options["socket_timeout"] == 0.25
+        assert detail == "1 worker(s) responding"
+
+
+@pytest.mark.asyncio
+class TestReadinessEndpoint:
+    """Tests for /health/ready."""
+
+    async def test_ready(self, client: AsyncClient):
+        app.dependency_overrides[get_readiness_checker] = lambda: ReadinessChecker(
+            {"database": counting_probe({}, "database")}, required=["database"]
+        )
+        try:
+            response = await client.get("/api/health/ready")
+        finally:
+            app.dependency_overrides.pop(get_readiness_checker)
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+    async def test_not_ready_returns_503(self, client: AsyncClient):
+        app.dependency_overrides[get_readiness_checker] = lambda: ReadinessChecker(
+            {"database": counting_probe({}, "database", TimeoutError("pool exhausted"))},
+            required=["database"],
+        )
+        try:
+            response = await client.get("/api/health/ready")
+        finally:
+            app.dependency_overrides.pop(get_readiness_checker)
+
+        assert response.status_code == 503
+        assert response.json()["checks"]["database"]["status"] == "error"
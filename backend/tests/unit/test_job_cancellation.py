@@ -0,0 +1,210 @@
+"""
+Tests for cooperative job cancellation.
+"""
+
+import asyncio
+import time
+from uuid import UUID
+
+import fakeredis
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.config import settings
+from models.evidence import Gap
+from models.job import JobStatus
+from schemas.job import JobCreate
+from services.gemini_service import GeminiService
+from services.job_cancellation import request_cancellation
+from services.job_scheduler import FairScheduler
+from services.job_service import JobService
+from tests.fakes import FakeGemini
+from worker.tasks import run_analysis
+
+
+@pytest.fixture(autouse=True)
+def redis_client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr("services.job_cancellation._get_redis", lambda: client)
+    return client
+
+
+def cancel_after(checks: int):
+    """Cancel check that starts returning True on its Nth call."""
+    calls = []
+
+    async def check():
+        calls.append(1)
+        return len(calls) >= checks
+    return check
+
+
+@pytest.mark.asyncio
+class TestAnalysisCancellation:
+    """Tests for stopping analyze_documents early."""
+
+    async def test_stops_between_controls(self, stub_service, tmp_path):
+        path = tmp_path / "policy.txt"
+        path.write_text("All users must use MFA.")
+
+        results = await stub_service.analyze_documents([str(path)], cancel_check=cancel_after(3))
+
+        assert results["cancelled"] is True
+        assert len(results["evidence_items"]) == 2
+
+    async def test_abandons_control_during_retries(self, stub_service, tmp_path, monkeypatch):
+        monkeypatch.setattr(settings, "llm_stub_error_rate", 1.0)
+        monkeypatch.setattr(settings, "gemini_max_retries", 3)
+        monkeypatch.setattr(settings, "gemini_backoff_base_seconds", 5.0)
+        monkeypatch.setattr(settings, "job_cancel_poll_seconds", 0.02)
+        monkeypatch.setattr("services.rate_limiter._limiters", {})
+        monkeypatch.setattr("services.provider_pool._pools", {})
+        service = GeminiService(scan_type="quick")
+        path = tmp_path / "policy.txt"
+        path.write_text("All users must use MFA.")
+
+        started = time.perf_counter()
+        results = await service.analyze_documents([str(path)], cancel_check=cancel_after(2))
+
+        assert results["cancelled"] is True
+        assert results["evidence_items"] == []
+        assert time.perf_counter() - started < 1.0
+
+    async def test_runs_to_completion_without_cancellation(self, stub_service, tmp_path):
+        path = tmp_path / "policy.txt"
+        path.write_text("All users must use MFA.")
+
+        results = await stub_service.analyze_documents([str(path)], cancel_check=cancel_after(100))
+
+        assert results["cancelled"] is False
+        assert len(results["evidence_items"]) == len(stub_service.controls)
+
+    async def test_outer_cancellation_stops_analysis(self):
+        """A run cancelled from outside (e.g. the task time limit) must not leave the call running."""
+        started = asyncio.Event()
+        stopped = asyncio.Event()
+
+        async def analysis():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            finally:
+                stopped.set()
+
+        run = asyncio.create_task(GeminiService._run_cancellable(analysis(), cancel_after(100)))
+        await started.wait()
+        run.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await run
+        await asyncio.wait_for(stopped.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+class TestCancelledJobs:
+    """Tests for how the worker finalizes cancelled jobs."""
+
+    @pytest.fixture
+    def gemini(self, monkeypatch):
+        gemini = FakeGemini(controls=("CC6.1", "CC6.2"))
+        monkeypatch.setattr("worker.tasks.get_gemini_service", lambda **kwargs: gemini)
+        return gemini
+
+    @pytest_asyncio.fixture
+    async def job(self, test_db, test_user, test_document, gemini):
+        return await JobService(test_db).create_job(
+            JobCreate(document_ids=[test_document.id]), test_user.id, [test_document]
+        )
+
+    async def _run(self, test_db, job):
+        await run_analysis(
+            str(job.id),
+            [],
+            session_factory=async_sessionmaker(test_db.bind, expire_on_commit=False),
+            progress_callback=None,
+        )
+        await test_db.refresh(job)
+
+    async def test_cancelled_job_keeps_finished_results(self, test_db, job):
+        request_cancellation(str(job.id))
+
+        await self._run(test_db, job)
+
+        gaps = (await test_db.execute(select(Gap).where(Gap.job_id == job.id))).scalars().all()
+        assert job.status == JobStatus.CANCELLED.value
+        assert job.progress == 0
+        assert [g.control_id for g in gaps] == ["CC6.1"]
+
+    async def test_queued_cancelled_job_never_starts(self, test_db, job, gemini):
+        job.status = JobStatus.CANCELLED.value
+        await test_db.commit()
+
+        await self._run(test_db, job)
+
+        assert job.status == JobStatus.CANCELLED.value
+        assert gemini.calls == 0
+
+    async def test_interrupted_job_marked_failed(self, test_db, job, gemini, monkeypatch):
+        """A run cut off by the task time limit must not stay RUNNING."""
+        gemini.hold = True
+        released = []
+        monkeypatch.setattr("worker.tasks.release_job", released.append)
+        run = asyncio.create_task(self._run(test_db, job))
+        await gemini.started.wait()
+        run.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await run
+
+        await test_db.refresh(job)
+        assert job.status == JobStatus.FAILED.value
+        assert job.completed_at is not None
+        assert released == [str(job.id)]
+
+
+@pytest.mark.asyncio
+class TestCancelEndpoint:
+    """Tests for POST /jobs/{id}/cancel."""
+
+    async def test_cancel_pending_job(
+        self, client: AsyncClient, auth_headers: dict, test_document, redis_client, monkeypatch
+    ):
+        scheduler = FairScheduler(fakeredis.FakeRedis(), dispatch_fn=lambda *a: None)
+        revoked: list[str] = []
+        monkeypatch.setattr(settings, "scheduler_enabled", True)
+        monkeypatch.setattr("api.jobs.get_job_scheduler", lambda: scheduler)
+        monkeypatch.setattr("services.job_scheduler.get_job_scheduler", lambda: scheduler)
+        monkeypatch.setattr("api.jobs.revoke_task", revoked.append)
+        created = await client.post(
+            "/api/jobs/evidence-run",
+            json={"document_ids": [str(test_document.id)]},
+            headers=auth_headers,
+        )
+        job_id = created.json()["id"]
+
+        response = await client.post(f"/api/jobs/{job_id}/cancel", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.json()["status"] == JobStatus.CANCELLED.value
+        assert revoked == [job_id]
+        assert redis_client.exists(f"shieldagent:cancel:{job_id}")
+
+    async def test_cancel_finished_job_rejected(
+        self, client: AsyncClient, auth_headers: dict, test_job, test_db
+    ):
+        test_job.status = JobStatus.SUCCEEDED.value
+        await test_db.commit()
+
+        response = await client.post(f"/api/jobs/{test_job.id}/cancel", headers=auth_headers)
+
+        assert response.status_code == 400
+
+    async def test_cancel_unknown_job(self, client: AsyncClient, auth_headers: dict):
+        response = await client.post(
+            f"/api/jobs/{UUID(int=0)}/cancel", headers=auth_headers
+        )
+
+        assert response.status_code == 404
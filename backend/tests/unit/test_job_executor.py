@@ -0,0 +1,155 @@
+"""
+Tests for the in-process job executor behind POST /jobs/{id}/run.
+"""
+
+import asyncio
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from main import app
+from models.job import Job, JobStatus
+from schemas.job import JobCreate
+from services.job_executor import ExecutorUnavailableError, JobExecutor, get_job_executor
+from services.job_service import JobService
+from tests.fakes import FakeGemini
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    fake = FakeGemini(hold=True)
+    monkeypatch.setattr("worker.tasks.get_gemini_service", lambda **kwargs: fake)
+    return fake
+
+
+@pytest_asyncio.fixture
+async def executor(test_db):
+    executor = JobExecutor(
+        async_sessionmaker(test_db.bind, expire_on_commit=False),
+        max_workers=1,
+        max_queued=1,
+    )
+    executor.start()
+    app.dependency_overrides[get_job_executor] = lambda: executor
+    yield executor
+    await executor.stop(timeout=1)
+
+
+async def _create_job(test_db, test_user, document) -> Job:
+    """Create a pending job linked to the document."""
+    return await JobService(test_db).create_job(
+        JobCreate(document_ids=[document.id]), test_user.id, [document]
+    )
+
+
+async def _wait_for(condition, timeout: float = 2.0) -> None:
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.asyncio
+class TestRunEndpoint:
+    """Tests for queuing jobs through POST /jobs/{id}/run."""
+
+    async def test_returns_before_analysis_finishes(
+        self, client: AsyncClient, auth_headers, test_db, test_user, test_document, gemini, executor
+    ):
+        job = await _create_job(test_db, test_user, test_document)
+
+        response = await client.post(f"/api/jobs/{job.id}/run", headers=auth_headers)
+
+        assert response.status_code == 202
+        assert response.json()["status"] == JobStatus.PENDING.value
+
+        gemini.release.set()
+        await executor.join()
+        await test_db.refresh(job)
+        assert job.status == JobStatus.SUCCEEDED.value
+        assert gemini.calls == 1
+
+    async def test_stopped_executor_is_unavailable(
+        self, client: AsyncClient, auth_headers, test_db, test_user, test_document
+    ):
+        job = await _create_job(test_db, test_user, test_document)
+        stopped = JobExecutor(async_sessionmaker(test_db.bind))
+        app.dependency_overrides[get_job_executor] = lambda: stopped
+
+        response = await client.post(f"/api/jobs/{job.id}/run", headers=auth_headers)
+
+        assert response.status_code == 503
+
+    async def test_rejected_run_keeps_scheduler_slot(
+        self, client: AsyncClient, auth_headers, test_db, test_user, test_document, monkeypatch
+    ):
+        """A job the executor refuses must stay queued in the fair scheduler."""
+        job = await _create_job(test_db, test_user, test_document)
+        released: list[str] = []
+        monkeypatch.setattr("api.jobs.release_job", released.append)
+        stopped = JobExecutor(async_sessionmaker(test_db.bind))
+        app.dependency_overrides[get_job_executor] = lambda: stopped
+
+        response = await client.post(f"/api/jobs/{job.id}/run", headers=auth_headers)
+
+        assert response.status_code == 503
+        assert released == []
+
+    async def test_accepted_run_releases_scheduler_slot(
+        self, client: AsyncClient, auth_headers, test_db, test_user, test_document,
+        gemini, executor, monkeypatch,
+    ):
+        job = await _create_job(test_db, test_user, test_document)
+        released: list[str] = []
+        monkeypatch.setattr("api.jobs.release_job", released.append)
+
+        response = await client.post(f"/api/jobs/{job.id}/run", headers=auth_headers)
+
+        assert response.status_code == 202
+        assert released == [str(job.id)]
+        gemini.release.set()
+        await executor.join()
+
+
+@pytest.mark.asyncio
+class TestJobExecutor:
+    """Tests for queue bounds and shutdown."""
+
+    async def test_duplicate_submission_ignored(
+        self, test_db, test_user, test_document, gemini, executor
+    ):
+        job = await _create_job(test_db, test_user, test_document)
+
+        assert executor.submit(str(job.id), "quick", "soc2")
+        assert not executor.submit(str(job.id), "quick", "soc2")
+
+        gemini.release.set()
+        await executor.join()
+        assert gemini.calls == 1
+
+    async def test_full_queue_refuses_jobs(
+        self, test_db, test_user, test_document, gemini, executor
+    ):
+        first = await _create_job(test_db, test_user, test_document)
+        second = await _create_job(test_db, test_user, test_document)
+        executor.submit(str(first.id), "quick", "soc2")
+
+        with pytest.raises(ExecutorUnavailableError):
+            executor.submit(str(second.id), "quick", "soc2")
+
+        gemini.release.set()
+
+    async def test_stop_fails_interrupted_job(
+        self, test_db, test_user, test_document, gemini, executor
+    ):
+        job = await _create_job(test_db, test_user, test_document)
+        executor.submit(str(job.id), "quick", "soc2")
+        await _wait_for(lambda: gemini.calls == 1)
+
+        await executor.stop(timeout=0.01)
+
+        await test_db.refresh(job)
+        assert job.status == JobStatus.FAILED.value
+        assert not executor.running
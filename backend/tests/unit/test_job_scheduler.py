@@ -0,0 +1,313 @@
+"""
+Tests for the Redis-backed fair job scheduler.
+"""
+
+import fakeredis
+import pytest
+from httpx import AsyncClient
+
+from core.config import settings
+from services.job_scheduler import (
+    DispatchError,
+    FairScheduler,
+    dispatch_pending_jobs,
+    get_job_scheduler,
+)
+from tests.fakes import FakeClock
+
+QUICK, FULL = 8, 51
+
+
+class Dispatched(list):
+    """Records dispatched jobs; can be told to fail."""
+
+    fail = False
+
+    def __call__(self, job_id, payload):
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        self.append(job_id)
+
+
+@pytest.fixture
+def dispatched():
+    return Dispatched()
+
+
+@pytest.fixture
+def make_scheduler(dispatched):
+    """Build schedulers sharing one fake Redis, as separate API instances would."""
+    redis_client = fakeredis.FakeRedis()
+    clock = FakeClock(1_700_000_000.0)
+
+    def make(**kwargs) -> FairScheduler:
+        kwargs.setdefault("max_running", 0)
+        kwargs.setdefault("max_per_tenant", 0)
+        return FairScheduler(redis_client, dispatch_fn=dispatched, clock=clock, **kwargs)
+
+    make.clock = clock
+    return make
+
+
+def submit(
+    scheduler: FairScheduler, job_id: str, tenant: str, cost: int = QUICK, lane: str = "quick"
+) -> int:
+    payload = {"document_ids": [], "scan_type": lane}
+    return scheduler.submit(job_id, tenant, cost, payload, lane=lane)
+
+
+class TestConcurrencyLimits:
+    """Tests for per-user and global running limits."""
+
+    def test_per_user_limit(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_per_tenant=2)
+
+        for i in range(5):
+            submit(scheduler, f"a{i}", "alice")
+
+        assert dispatched == ["a0", "a1"]
+
+        scheduler.release("a0")
+
+        assert dispatched == ["a0", "a1", "a2"]
+
+    def test_global_limit(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+
+        submit(scheduler, "a0", "alice")
+        submit(scheduler, "b0", "bob")
+
+        assert dispatched == ["a0"]
+        assert scheduler.position("b0") == 1
+
+    def test_full_scans_do_not_hold_quick_slots(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+
+        submit(scheduler, "f0", "alice", FULL, lane="full")
+        submit(scheduler, "f1", "bob", FULL, lane="full")
+        submit(scheduler, "q0", "carol", lane="quick")
+
+        assert dispatched == ["f0", "q0"]
+        assert scheduler.position("f1") == 1
+
+    def test_lane_limits_override_global(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1, lane_max_running={"quick": 3})
+
+        for i in range(4):
+            submit(scheduler, f"q{i}", f"user{i}", lane="quick")
+            submit(scheduler, f"f{i}", f"user{i}", FULL, lane="full")
+
+        assert [j for j in dispatched if j.startswith("q")] == ["q0", "q1", "q2"]
+        assert [j for j in dispatched if j.startswith("f")] == ["f0"]
+
+    def test_lane_limits_follow_worker_concurrency(self, monkeypatch):
+        monkeypatch.setattr(settings, "worker_quick_concurrency", 40)
+        monkeypatch.setattr(settings, "worker_full_concurrency", 12)
+        monkeypatch.setattr("core.redis.get_redis_client", fakeredis.FakeRedis)
+        get_job_scheduler.cache_clear()
+        try:
+            scheduler = get_job_scheduler()
+        finally:
+            get_job_scheduler.cache_clear()
+
+        assert scheduler.lane_max_running == {"quick": 40, "full": 12}
+
+    def test_per_user_limit_applies_per_lane(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_per_tenant=2)
+
+        for i in range(3):
+            submit(scheduler, f"f{i}", "alice", FULL, lane="full")
+        submit(scheduler, "q0", "alice", lane="quick")
+
+        assert dispatched == ["f0", "f1", "q0"]
+
+        scheduler.release("f0")
+        assert dispatched == ["f0", "f1", "q0", "f2"]
+
+    def test_limits_shared_across_instances(self, make_scheduler, dispatched):
+        first = make_scheduler(max_per_tenant=1)
+        second = make_scheduler(max_per_tenant=1)
+
+        submit(first, "a0", "alice")
+        submit(second, "a1", "alice")
+
+        assert dispatched == ["a0"]
+
+    def test_expired_lease_frees_slot(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_per_tenant=1, lease_seconds=60)
+        submit(scheduler, "a0", "alice")
+        submit(scheduler, "a1", "alice")
+
+        make_scheduler.clock.now += 61
+        scheduler.dispatch()
+
+        assert dispatched == ["a0", "a1"]
+
+    def test_renewed_lease_keeps_slot(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_per_tenant=1, lease_seconds=60)
+        submit(scheduler, "a0", "alice")
+        submit(scheduler, "a1", "alice")
+
+        make_scheduler.clock.now += 50
+        assert scheduler.renew("a0")
+        make_scheduler.clock.now += 50
+        scheduler.dispatch()
+
+        assert dispatched == ["a0"]
+
+
+class TestFairOrdering:
+    """Tests for weighted fair queuing across users."""
+
+    def test_small_job_overtakes_backlog(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        for i in range(4):
+            submit(scheduler, f"a{i}", "alice", FULL)
+
+        submit(scheduler, "b0", "bob", QUICK)
+
+        assert scheduler.position("b0") == 1
+        scheduler.release("a0")
+        assert dispatched == ["a0", "b0"]
+
+    def test_users_interleave(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        submit(scheduler, "hold", "carol")
+        for i in range(3):
+            submit(scheduler, f"a{i}", "alice")
+        for i in range(3):
+            submit(scheduler, f"b{i}", "bob")
+
+        for job_id in ["hold", "a0", "b0", "a1", "b1", "a2"]:
+            scheduler.release(job_id)
+
+        assert dispatched == ["hold", "a0", "b0", "a1", "b1", "a2", "b2"]
+
+    def test_weight_scales_share(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1, weights={"alice": 2.0})
+        submit(scheduler, "hold", "carol")
+        for i in range(4):
+            submit(scheduler, f"a{i}", "alice")
+            submit(scheduler, f"b{i}", "bob")
+
+        for _ in range(6):
+            scheduler.release(dispatched[-1])
+
+        assert dispatched[1:] == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+    def test_idle_user_gains_no_credit(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        submit(scheduler, "b0", "bob")
+        for i in range(3):
+            submit(scheduler, f"a{i}", "alice")
+        scheduler.release("b0")
+        scheduler.release("a0")
+
+        # Bob returns after alice has been served; he joins at the current
+        # virtual time instead of jumping ahead of everything
+        submit(scheduler, "b1", "bob", FULL)
+
+        assert scheduler.position("a2") == 1
+        assert scheduler.position("b1") == 2
+
+
+class TestQueueMaintenance:
+    """Tests for resubmission, withdrawal and dispatch failures."""
+
+    def test_resubmit_is_idempotent(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        submit(scheduler, "a0", "alice")
+        submit(scheduler, "a1", "alice")
+
+        assert submit(scheduler, "a1", "alice") == 1
+        assert scheduler.redis.zcard(f"{scheduler.prefix}lane:quick:pending") == 1
+
+    def test_release_withdraws_pending_job(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        submit(scheduler, "a0", "alice")
+        submit(scheduler, "a1", "alice")
+
+        assert scheduler.release("a1")
+        assert scheduler.position("a1") is None
+        scheduler.release("a0")
+        assert dispatched == ["a0"]
+
+    def test_failed_dispatch_requeues(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        dispatched.fail = True
+        with pytest.raises(DispatchError):
+            submit(scheduler, "a0", "alice")
+
+        assert scheduler.position("a0") == 1
+
+        dispatched.fail = False
+        assert scheduler.dispatch() == ["a0"]
+
+    def test_resubmit_after_failed_dispatch_starts_job(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_running=1)
+        dispatched.fail = True
+        with pytest.raises(DispatchError):
+            submit(scheduler, "a0", "alice")
+
+        dispatched.fail = False
+        submit(scheduler, "a0", "alice")
+
+        assert dispatched == ["a0"]
+        assert scheduler.position("a0") is None
+
+    def test_periodic_dispatch_starts_waiting_jobs(
+        self, make_scheduler, dispatched, monkeypatch
+    ):
+        scheduler = make_scheduler(max_per_tenant=1, lease_seconds=60)
+        monkeypatch.setattr("services.job_scheduler.get_job_scheduler", lambda: scheduler)
+        dispatched.fail = True
+        with pytest.raises(DispatchError):
+            submit(scheduler, "a0", "alice")
+        dispatched.fail = False
+
+        # Nothing is submitted or released: only the periodic dispatch runs
+        dispatch_pending_jobs()
+        assert dispatched == ["a0"]
+
+        submit(scheduler, "a1", "alice")
+        make_scheduler.clock.now += 61
+        dispatch_pending_jobs()
+        assert dispatched == ["a0", "a1"]
+
+    def test_other_jobs_failure_does_not_fail_submit(self, make_scheduler, dispatched):
+        scheduler = make_scheduler(max_per_tenant=1)
+        submit(scheduler, "a0", "alice")
+        dispatched.fail = True
+        submit(scheduler, "a1", "alice")
+
+        # Releasing a0 starts a1, whose publish fails; release still succeeds
+        assert scheduler.release("a0")
+        assert scheduler.position("a1") == 1
+
+
+@pytest.mark.asyncio
+class TestQueuePositionApi:
+    """Tests for queue position in job responses."""
+
+    async def test_position_reported_while_waiting(
+        self, client: AsyncClient, auth_headers: dict, test_document, relay_outbox, monkeypatch
+    ):
+        dispatched = Dispatched()
+        scheduler = FairScheduler(
+            fakeredis.FakeRedis(), dispatch_fn=dispatched, max_running=0, max_per_tenant=1
+        )
+        monkeypatch.setattr(settings, "scheduler_enabled", True)
+        monkeypatch.setattr(settings, "job_dedup_enabled", False)
+        monkeypatch.setattr("api.jobs.get_job_scheduler", lambda: scheduler)
+        monkeypatch.setattr("services.outbox.get_job_scheduler", lambda: scheduler)
+        body = {"document_ids": [str(test_document.id)], "scan_type": "quick"}
+
+        first = (await client.post("/api/jobs/evidence-run", json=body, headers=auth_headers)).json()
+        second = (await client.post("/api/jobs/evidence-run", json=body, headers=auth_headers)).json()
+        await relay_outbox()
+
+        assert dispatched == [first["id"]]
+        response = await client.get(f"/api/jobs/{first['id']}", headers=auth_headers)
+        assert response.json()["queue_position"] is None
+        response = await client.get(f"/api/jobs/{second['id']}", headers=auth_headers)
+        assert response.json()["queue_position"] == 1
@@ -2,9 +2,27 @@
 Tests for jobs API endpoints.
 """
 
+import asyncio
+
+import fakeredis
 import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
 from httpx import AsyncClient
-from uuid import uuid4
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from uuid import UUID, uuid4
+
+from core.config import settings
+from models.document import Document
+from models.evidence import EvidenceItem
+from models.job import Job, JobStatus
+from main import app
+from services.job_executor import JobExecutor, get_job_executor
+from services.job_scheduler import FairScheduler
+from services.job_service import JobService
+from tests.fakes import FakeGemini
+from worker.tasks import run_analysis
 
 
 @pytest.mark.asyncio
@@ -65,6 +83,41 @@ class TestCreateJob:
         # Should either fail validation or be handled gracefully
         assert response.status_code in [400, 422]
 
+    async def test_create_job_framework_control_count(
+        self, client: AsyncClient, auth_headers: dict, test_document
+    ):
+        """Total controls should come from the framework's scan profile."""
+        response = await client.post(
+            "/api/jobs/evidence-run",
+            json={
+                "framework": "ISO-27001",
+                "document_ids": [str(test_document.id)],
+                "scan_type": "full",
+            },
+            headers=auth_headers,
+        )
+        
+        assert response.status_code == 201
+        data = response.json()
+        assert data["job_type"] == "iso27001"
+        assert data["total_controls"] == 93
+
+    async def test_create_job_unknown_framework(
+        self, client: AsyncClient, auth_headers: dict, test_document
+    ):
+        """Creating a job for an unknown framework should fail."""
+        response = await client.post(
+            "/api/jobs/evidence-run",
+            json={
+                "framework": "made-up-framework",
+                "document_ids": [str(test_document.id)],
+            },
+            headers=auth_headers,
+        )
+        
+        assert response.status_code == 400
+        assert "framework" in response.json()["detail"].lower()
+
     async def test_create_job_without_auth(self, client: AsyncClient):
         """Creating a job without auth should fail."""
         response = await client.post(
@@ -78,6 +131,220 @@ class TestCreateJob:
         assert response.status_code == 401
 
 
+@pytest.mark.asyncio
+class TestJobDeduplication:
+    """Tests for reusing identical evidence runs."""
+
+    @pytest.fixture(autouse=True)
+    def dispatched(self, monkeypatch):
+        """Jobs started through an in-memory scheduler."""
+        started = []
+        scheduler = FairScheduler(
+            fakeredis.FakeRedis(),
+            dispatch_fn=lambda job_id, payload: started.append(job_id),
+            max_running=0,
+            max_per_tenant=0,
+        )
+        monkeypatch.setattr(settings, "scheduler_enabled", True)
+        monkeypatch.setattr("api.jobs.get_job_scheduler", lambda: scheduler)
+        monkeypatch.setattr("services.outbox.get_job_scheduler", lambda: scheduler)
+        return started
+
+    async def _run(self, client, auth_headers, document, scan_type="quick"):
+        response = await client.post(
+            "/api/jobs/evidence-run",
+            json={"document_ids": [str(document.id)], "scan_type": scan_type},
+            headers=auth_headers,
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    async def test_duplicate_attaches_to_active_job(
+        self, client: AsyncClient, auth_headers: dict, test_document, dispatched, relay_outbox
+    ):
+        """A repeated request while the job is pending should return the same job."""
+        first = await self._run(client, auth_headers, test_document)
+        second = await self._run(client, auth_headers, test_document)
+        await relay_outbox()
+
+        assert second["id"] == first["id"]
+        assert dispatched == [first["id"]]
+        assert first["deduplicated"] is False
+        assert second["deduplicated"] is True
+
+    async def test_different_scan_type_creates_job(
+        self, client: AsyncClient, auth_headers: dict, test_document
+    ):
+        """Runs that analyze different controls should not be merged."""
+        quick = await self._run(client, auth_headers, test_document, "quick")
+        full = await self._run(client, auth_headers, test_document, "full")
+
+        assert full["id"] != quick["id"]
+        assert full["deduplicated"] is False
+
+    async def test_recent_result_is_cloned(
+        self, client: AsyncClient, auth_headers: dict, test_document, test_db, dispatched,
+        relay_outbox,
+    ):
+        """A repeat of a recently succeeded job should copy its evidence."""
+        first = await self._run(client, auth_headers, test_document)
+        source = await test_db.get(Job, UUID(first["id"]))
+        source.status = JobStatus.SUCCEEDED.value
+        source.completed_at = datetime.now(timezone.utc)
+        test_db.add(EvidenceItem(
+            job_id=source.id, control_id="CC6.1", status="pass", confidence=0.9,
+        ))
+        await test_db.commit()
+
+        second = await self._run(client, auth_headers, test_document)
+        await relay_outbox()
+
+        assert second["id"] != first["id"]
+        assert second["status"] == JobStatus.SUCCEEDED.value
+        assert second["source_job_id"] == first["id"]
+        assert second["deduplicated"] is True
+        assert dispatched == [first["id"]]
+        copied = await test_db.execute(
+            select(EvidenceItem).where(EvidenceItem.job_id == UUID(second["id"]))
+        )
+        assert [e.control_id for e in copied.scalars()] == ["CC6.1"]
+
+    async def test_stale_result_is_not_cloned(
+        self, client: AsyncClient, auth_headers: dict, test_document, test_db
+    ):
+        """Results older than the freshness window should trigger a new analysis."""
+        first = await self._run(client, auth_headers, test_document)
+        source = await test_db.get(Job, UUID(first["id"]))
+        source.status = JobStatus.SUCCEEDED.value
+        source.completed_at = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.job_dedup_freshness_seconds + 60
+        )
+        await test_db.commit()
+
+        second = await self._run(client, auth_headers, test_document)
+
+        assert second["id"] != first["id"]
+        assert second["status"] == JobStatus.PENDING.value
+        assert second["source_job_id"] is None
+
+    async def _fail(self, test_db, job_id):
+        job = await test_db.get(Job, UUID(job_id))
+        job.status = JobStatus.FAILED.value
+        job.completed_at = datetime.now(timezone.utc)
+        await test_db.commit()
+
+    async def test_rerun_conflicts_with_identical_active_job(
+        self, client: AsyncClient, auth_headers: dict, test_document, test_db
+    ):
+        """A failed job cannot be re-run while an identical job holds its key."""
+        first = await self._run(client, auth_headers, test_document)
+        await self._fail(test_db, first["id"])
+        second = await self._run(client, auth_headers, test_document)
+        assert second["id"] != first["id"]
+
+        response = await client.post(f"/api/jobs/{first['id']}/run", headers=auth_headers)
+
+        assert response.status_code == 409
+        assert second["id"] in response.json()["detail"]
+        test_db.expire_all()
+        assert (await test_db.get(Job, UUID(first["id"]))).status == JobStatus.FAILED.value
+
+    async def test_retry_of_failed_duplicate_is_skipped(
+        self, client: AsyncClient, auth_headers: dict, test_document, test_db
+    ):
+        """A worker retry must not reactivate a job an identical one replaced."""
+        from worker.tasks import run_analysis
+
+        first = await self._run(client, auth_headers, test_document)
+        await self._fail(test_db, first["id"])
+        await self._run(client, auth_headers, test_document)
+
+        result = await run_analysis(
+            first["id"], [], session_factory=async_sessionmaker(test_db.bind),
+        )
+
+        assert result["status"] == "skipped"
+        test_db.expire_all()
+        assert (await test_db.get(Job, UUID(first["id"]))).status == JobStatus.FAILED.value
+
+
+@pytest.mark.asyncio
+class TestJobDocuments:
+    """Tests for the documents recorded on each job."""
+
+    @pytest_asyncio.fixture
+    async def other_document(self, test_db, test_user):
+        document = Document(
+            user_id=test_user.id,
+            filename="other.txt",
+            original_filename="other.txt",
+            file_type="txt",
+            file_path="/tmp/other.txt",
+            file_size=10,
+        )
+        test_db.add(document)
+        await test_db.commit()
+        return document
+
+    async def _create(self, client, auth_headers, document):
+        response = await client.post(
+            "/api/jobs/evidence-run",
+            json={"document_ids": [str(document.id)]},
+            headers=auth_headers,
+        )
+        return UUID(response.json()["id"])
+
+    async def test_job_records_its_documents(
+        self, client, auth_headers, test_db, test_user, test_document, other_document, monkeypatch
+    ):
+        """Only the requested documents should be linked, in both directions."""
+        job_id = await self._create(client, auth_headers, test_document)
+        service = JobService(test_db)
+
+        documents = await service.get_job_documents(job_id)
+        jobs = await service.list_document_jobs(test_document.id, test_user.id)
+
+        assert [d.id for d in documents] == [test_document.id]
+        assert [j.id for j in jobs] == [job_id]
+        assert await service.list_document_jobs(other_document.id, test_user.id) == []
+
+    async def test_run_analyzes_only_job_documents(
+        self, client, auth_headers, test_db, test_document, other_document, monkeypatch
+    ):
+        """Re-running a job should not pull in the user's other documents."""
+        job_id = await self._create(client, auth_headers, test_document)
+        gemini = FakeGemini()
+        monkeypatch.setattr("worker.tasks.get_gemini_service", lambda **kwargs: gemini)
+        executor = JobExecutor(async_sessionmaker(test_db.bind, expire_on_commit=False))
+        executor.start()
+        app.dependency_overrides[get_job_executor] = lambda: executor
+
+        response = await client.post(f"/api/jobs/{job_id}/run", headers=auth_headers)
+        await executor.stop()
+
+        assert response.status_code == 202
+        assert gemini.paths == [test_document.file_path]
+
+    async def test_run_links_owner_documents_for_unlinked_job(
+        self, client, auth_headers, test_db, test_job, test_document, monkeypatch
+    ):
+        """A job from before job_documents should run on its owner's documents."""
+        service = JobService(test_db)
+        assert await service.get_job_documents(test_job.id) == []
+        gemini = FakeGemini()
+        monkeypatch.setattr("worker.tasks.get_gemini_service", lambda **kwargs: gemini)
+        executor = JobExecutor(async_sessionmaker(test_db.bind, expire_on_commit=False))
+        executor.start()
+        app.dependency_overrides[get_job_executor] = lambda: executor
+
+        response = await client.post(f"/api/jobs/{test_job.id}/run", headers=auth_headers)
+        await executor.stop()
+
+        assert response.status_code == 202
+        assert gemini.paths == [test_document.file_path]
+        assert [d.id for d in await service.get_job_documents(test_job.id)] == [test_document.id]
+
+
 @pytest.mark.asyncio
 class TestListJobs:
     """Tests for job listing endpoint."""
@@ -216,3 +483,110 @@ class TestJobGaps:
         )
         
         assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+class TestJobMetrics:
+    """Tests for job performance telemetry endpoint."""
+
+    async def test_metrics_unavailable_before_completion(
+        self, client: AsyncClient, auth_headers: dict, test_job
+    ):
+        """A job that has not run should report no metrics yet."""
+        response = await client.get(
+            f"/api/jobs/{test_job.id}/metrics",
+            headers=auth_headers,
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["available"] is False
+        assert data["controls"] == []
+
+    async def test_metrics_recorded_for_job(
+        self, client: AsyncClient, auth_headers: dict, test_db, test_job, test_document
+    ):
+        """Stored metrics should be returned per document and control with totals."""
+        from services.job_service import build_job_metrics
+        
+        analysis_metrics = {
+            "documents": [{
+                "path": test_document.file_path,
+                "file_type": "json",
+                "chars": 1200,
+                "extraction_ms": 12.5,
+                "error": None,
+            }],
+            "controls": [
+                {"control_id": "CC6.1", "status": "pass", "tier": "default",
+                 "latency_ms": 800.0, "retries": 1, "prompt_tokens": 300,
+                 "response_tokens": 50, "cache_hit": True, "parse_failed": False},
+                {"control_id": "CC6.2", "status": "needs_review", "tier": "default",
+                 "latency_ms": 1200.0, "retries": 0, "prompt_tokens": 320,
+                 "response_tokens": 40, "cache_hit": True, "parse_failed": True,
+                 "escalated": True, "escalation_reason": "parse_failure"},
+                {"control_id": "P1.1", "status": "not_applicable", "tier": None,
+                 "latency_ms": 0.0, "prefiltered": True},
+            ],
+        }
+        test_job.metrics = build_job_metrics(analysis_metrics, [test_document], db_write_ms=4.2)
+        await test_db.commit()
+        
+        response = await client.get(
+            f"/api/jobs/{test_job.id}/metrics",
+            headers=auth_headers,
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["available"] is True
+        assert data["documents"][0]["document_id"] == str(test_document.id)
+        assert data["documents"][0]["filename"] == "test_document.json"
+        assert "path" not in data["documents"][0]
+        assert [c["control_id"] for c in data["controls"]] == ["CC6.1", "CC6.2", "P1.1"]
+        assert data["controls"][1]["escalation_reason"] == "parse_failure"
+        totals = data["totals"]
+        assert totals["prompt_tokens"] == 620
+        assert totals["llm_latency_ms"] == 2000.0
+        assert totals["max_control_latency_ms"] == 1200.0
+        assert totals["cache_hits"] == 2
+        assert totals["retries"] == 1
+        assert totals["parse_failures"] == 1
+        assert totals["prefiltered"] == 1
+        assert totals["escalations"] == 1
+        assert totals["db_write_ms"] == 4.2
+
+    async def test_write_time_includes_commit(
+        self, test_db, test_job, test_document, monkeypatch
+    ):
+        """db_write_ms should cover committing the results, not just the flush."""
+        commit = AsyncSession.commit
+
+        async def slow_commit(session):
+            # Slow down only the commit that finishes the job
+            if any(getattr(o, "status", None) == JobStatus.SUCCEEDED.value for o in session.dirty):
+                await asyncio.sleep(0.05)
+            await commit(session)
+
+        monkeypatch.setattr("worker.tasks.get_gemini_service", lambda **kwargs: FakeGemini())
+        monkeypatch.setattr(AsyncSession, "commit", slow_commit)
+        await run_analysis(
+            str(test_job.id),
+            [str(test_document.id)],
+            session_factory=async_sessionmaker(test_db.bind, expire_on_commit=False),
+        )
+        await test_db.refresh(test_job)
+
+        assert test_job.status == JobStatus.SUCCEEDED.value
+        assert test_job.metrics["totals"]["db_write_ms"] >= 50
+
+    async def test_metrics_not_found(
+        self, client: AsyncClient, auth_headers: dict
+    ):
+        """Getting metrics for non-existent job should return 404."""
+        response = await client.get(
+            f"/api/jobs/{uuid4()}/metrics",
+            headers=auth_headers,
+        )
+        
+        assert response.status_code == 404
@@ -0,0 +1,183 @@
+"""
+Tests for the offline stub LLM backend.
+"""
+
+import json
+
+import grpc
+import pytest
+
+from core.config import settings
+from services import llm_backends
+from services.llm_backends import (
+    GenerativeServiceGrpcTransport,
+    GeminiBackend,
+    StubAPIError,
+    StubBackend,
+    StubConfig,
+    get_llm_backend,
+)
+from services.map_reduce import build_map_instructions, parse_findings
+from services.provider_pool import build_provider_pool
+
+INSTRUCTIONS = """
+CONTROL BEING EVALUATED:
+- Control ID: CC6.1
+
+ANALYSIS INSTRUCTIONS:
+Analyze for evidence of logical access security.
+Look for:
+- Multi-factor authentication
+- Role-based access control
+- Quarterly access reviews
+"""
+
+
+def make_model(**config) -> object:
+    config.setdefault("latency_ms", 0)
+    config.setdefault("latency_distribution", "fixed")
+    return StubBackend(StubConfig(**config)).create_model("stub", "stub-model", primary=True)
+
+
+class TestStubModel:
+    """Tests for deterministic stub verdicts and fault injection."""
+
+    def test_verdict_from_look_for_items(self):
+        model = make_model()
+        response = model.generate_content([
+            "Users sign in with multi-factor authentication. Reviews run quarterly.",
+            INSTRUCTIONS,
+        ])
+
+        verdict = json.loads(response.text)
+        assert verdict["status"] == "pass"
+        assert verdict["gaps"] == ["Role-based access control"]
+
+    def test_no_evidence_fails(self):
+        model = make_model()
+        verdict = json.loads(model.generate_content(["Cafeteria menu", INSTRUCTIONS]).text)
+
+        assert verdict["status"] == "fail"
+        assert len(verdict["gaps"]) == 3
+
+    def test_deterministic(self):
+        contents = ["Access reviews run quarterly.", INSTRUCTIONS]
+        first = make_model().generate_content(contents).text
+        second = make_model().generate_content(contents).text
+
+        assert first == second
+
+    def test_throttle_injection(self):
+        model = make_model(throttle_rate=1.0)
+
+        with pytest.raises(StubAPIError) as exc_info:
+            model.generate_content(["doc", INSTRUCTIONS])
+        assert exc_info.value.code == 429
+
+    def test_error_injection_varies_by_attempt(self):
+        """Retries of a failed request draw fresh outcomes."""
+        model = make_model(error_rate=0.5, seed=7)
+        outcomes = set()
+        for _ in range(20):
+            try:
+                model.generate_content(["doc", INSTRUCTIONS])
+                outcomes.add("ok")
+            except StubAPIError as e:
+                outcomes.add(e.code)
+
+        assert outcomes == {"ok", 503}
+
+    def test_map_request_returns_findings(self):
+        group = [
+            {"control_id": "CC6.1", "title": "Logical access", "description": "Access security",
+             "look_for": ["Multi-factor authentication", "Quarterly access reviews"]},
+            {"control_id": "CC7.2", "title": "Monitoring", "description": "Anomaly detection",
+             "look_for": ["Intrusion detection"]},
+        ]
+        model = make_model()
+        response = model.generate_content([
+            "Badges are issued at reception.\nUsers sign in with multi-factor authentication.",
+            build_map_instructions(group),
+        ])
+
+        findings = parse_findings(response.text, {"CC6.1", "CC7.2"})
+        assert findings == [{
+            "control_id": "CC6.1",
+            "quote": "Users sign in with multi-factor authentication.",
+            "note": "Multi-factor authentication",
+        }]
+
+    def test_failed_request_attempts_bounded(self, monkeypatch):
+        monkeypatch.setattr(llm_backends, "_MAX_TRACKED_REQUESTS", 3)
+        model = make_model(error_rate=1.0)
+        for i in range(5):
+            with pytest.raises(StubAPIError):
+                model.generate_content([f"doc {i}", INSTRUCTIONS])
+
+        assert len(model._attempts) == 3
+
+
+class TestBackendSelection:
+    """Tests for choosing the backend from settings."""
+
+    def test_default_is_gemini(self, monkeypatch):
+        monkeypatch.setattr(settings, "llm_backend", "gemini")
+        assert isinstance(get_llm_backend(), GeminiBackend)
+
+    def test_stub_pool_needs_no_key(self, monkeypatch):
+        monkeypatch.setattr(settings, "llm_backend", "stub")
+        monkeypatch.setattr(settings, "gemini_api_key", "")
+        monkeypatch.setattr(settings, "gemini_api_keys", [])
+        monkeypatch.setattr(settings, "gemini_rate_limit_backend", "local")
+        monkeypatch.setattr("services.rate_limiter._limiters", {})
+
+        pool = build_provider_pool()
+
+        assert pool.backend.name == "stub"
+        assert not pool.backend.supports_context_cache
+        assert pool.primary.model.model_name == settings.gemini_model
+
+
+class TestGeminiClients:
+    """Tests for process-wide Gemini clients."""
+
+    @pytest.fixture
+    def channel_options(self, monkeypatch):
+        """Options of every gRPC channel created, without connecting."""
+        created = []
+
+        def create_channel(host, options=None, **kwargs):
+            created.append(dict(options))
+            return grpc.insecure_channel("localhost:1")
+
+        monkeypatch.setattr(GenerativeServiceGrpcTransport, "create_channel", create_channel)
+        return created
+
+    def test_models_of_a_key_share_one_client(self, channel_options):
+        backend = GeminiBackend()
+
+        primary = backend.create_model("key-a", "gemini-1.5-flash", primary=True)
+        fast = backend.create_model("key-a", "gemini-1.5-flash-8b", primary=True)
+        other = backend.create_model("key-b", "gemini-1.5-flash", primary=False)
+
+        assert primary._client is fast._client
+        assert other._client is not primary._client
+        assert len(channel_options) == 2
+
+    def test_channel_keepalive(self, channel_options, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_keepalive_seconds", 45.0)
+
+        GeminiBackend().create_model("key-a", "gemini-1.5-flash", primary=True)
+
+        assert channel_options[0]["grpc.keepalive_time_ms"] == 45000
+        assert channel_options[0]["grpc.keepalive_permit_without_calls"] == 1
+
+    def test_configure_applies_key_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(llm_backends, "_configured_key", None)
+        monkeypatch.setattr(llm_backends.genai, "configure", lambda **kw: calls.append(kw))
+
+        for _ in range(3):
+            GeminiBackend().configure("key-a")
+
+        assert calls == [{"api_key": "key-a"}]
@@ -0,0 +1,103 @@
+"""
+Tests for structured verdict parsing.
+"""
+
+import json
+
+import google.generativeai as genai
+from google.generativeai.types import generation_types
+
+from core.config import settings
+from services.llm_backends import GeminiBackend, StubBackend, StubConfig
+from services.llm_response import VERDICT_SCHEMA, parse_verdict
+
+
+VERDICT = {
+    "status": "fail",
+    "confidence": 0.7,
+    "summary": "No MFA policy",
+    "evidence_quote": None,
+    "gaps": ["MFA not required"],
+}
+
+
+class TestParseVerdict:
+    """Tests for the strict fast path and bounded repair."""
+
+    def test_strict_json(self):
+        parsed = parse_verdict(json.dumps(VERDICT))
+
+        assert parsed.method == "strict"
+        assert parsed.verdict == VERDICT
+
+    def test_code_fence_repaired(self):
+        parsed = parse_verdict(f"```json\n{json.dumps(VERDICT)}\n```")
+
+        assert parsed.method == "repaired"
+        assert parsed.verdict["status"] == "fail"
+
+    def test_trailing_commas_repaired(self):
+        text = '{"status": "pass", "confidence": 0.9, "summary": "ok", "gaps": ["a",],}'
+
+        parsed = parse_verdict(text)
+
+        assert parsed.method == "repaired"
+        assert parsed.verdict["gaps"] == ["a"]
+
+    def test_unparseable_reply_fails(self):
+        parsed = parse_verdict("I could not evaluate this control.")
+
+        assert parsed.method == "failed"
+        assert parsed.verdict["status"] == "needs_review"
+        assert parsed.verdict["parse_failed"] is True
+
+    def test_non_object_fails(self):
+        assert parse_verdict('["pass"]').method == "failed"
+
+    def test_fields_normalized(self):
+        text = '{"status": "PASS", "confidence": "1.5", "summary": "ok", "gaps": "none"}'
+
+        verdict = parse_verdict(text).verdict
+
+        assert verdict["status"] == "pass"
+        assert verdict["confidence"] == 1.0
+        assert verdict["gaps"] == ["none"]
+        assert verdict["evidence_quote"] is None
+
+    def test_unknown_status_needs_review(self):
+        verdict = parse_verdict('{"status": "partial", "confidence": 0.5, "gaps": []}').verdict
+
+        assert verdict["status"] == "needs_review"
+
+
+class TestJsonMode:
+    """Tests for requesting schema-constrained output."""
+
+    def test_gemini_requests_json_schema(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_json_mode", True)
+
+        config = GeminiBackend().generation_config()
+
+        converted = generation_types.to_generation_config_dict(config)
+        assert converted["response_mime_type"] == "application/json"
+        assert set(VERDICT_SCHEMA["required"]) <= set(VERDICT_SCHEMA["properties"])
+
+    def test_json_mode_disabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_json_mode", False)
+
+        assert GeminiBackend().generation_config() is None
+
+    def test_gemini_model_uses_config(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_json_mode", True)
+
+        model = GeminiBackend().create_model("key", "gemini-1.5-flash", primary=True)
+
+        assert isinstance(model, genai.GenerativeModel)
+        assert model._generation_config["response_mime_type"] == "application/json"
+
+    def test_stub_output_parses_strictly(self):
+        model = StubBackend(StubConfig(latency_ms=0.0)).create_model("stub", "stub-model", True)
+
+        response = model.generate_content(["Document: MFA enforced", "Look for: MFA"])
+
+        assert parse_verdict(response.text).method == "strict"
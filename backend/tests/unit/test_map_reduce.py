@@ -0,0 +1,125 @@
+"""
+Tests for the map-reduce building blocks.
+"""
+
+import fakeredis
+import redis
+
+from services.map_reduce import (
+    MAX_FINDINGS_PER_SECTION,
+    Finding,
+    MapCache,
+    build_map_instructions,
+    control_groups,
+    format_findings,
+    parse_findings,
+    section_digest,
+)
+from services.token_budget import TokenCounter
+
+
+def control(control_id: str, category: str) -> dict:
+    return {
+        "control_id": control_id,
+        "category": category,
+        "title": f"Title {control_id}",
+        "description": "Description",
+        "look_for": ["Access reviews", "MFA"],
+    }
+
+
+class TestMapRequests:
+    """Tests for grouping controls and parsing map replies."""
+
+    def test_groups_by_category(self):
+        controls = [control(f"A{i}", "Access") for i in range(5)] + [control("R1", "Risk")]
+
+        groups = control_groups(controls, max_size=3)
+
+        assert [[c["control_id"] for c in g] for g in groups] == [
+            ["A0", "A1", "A2"], ["A3", "A4"], ["R1"],
+        ]
+
+    def test_instructions_list_controls(self):
+        instructions = build_map_instructions([control("A1", "Access")])
+
+        assert "- A1 (Title A1): Description" in instructions
+        assert "Look for: Access reviews; MFA" in instructions
+
+    def test_digest_depends_on_text_and_instructions(self):
+        digest = section_digest("gemini", "instructions", "text")
+
+        assert digest == section_digest("gemini", "instructions", "text")
+        assert digest != section_digest("gemini", "instructions", "text!")
+        assert digest != section_digest("gemini", "other", "text")
+
+    def test_parse_keeps_known_controls(self):
+        reply = """```json
+        {"findings": [
+            {"control_id": "a1", "quote": "MFA is enforced", "note": "all users"},
+            {"control_id": "ZZ9", "quote": "unrelated"},
+            {"control_id": "A1", "quote": ""},
+        ]}
+        ```"""
+
+        findings = parse_findings(reply, {"A1"})
+
+        assert findings == [{"control_id": "A1", "quote": "MFA is enforced", "note": "all users"}]
+
+    def test_parse_caps_findings_per_control(self):
+        reply = {"findings": [{"control_id": "A1", "quote": f"q{i}"} for i in range(20)]}
+
+        findings = parse_findings(str(reply).replace("'", '"'), {"A1"})
+
+        assert len(findings) == MAX_FINDINGS_PER_SECTION
+
+    def test_unparseable_reply(self):
+        assert parse_findings("no findings here", {"A1"}) is None
+        assert parse_findings('{"status": "pass"}', {"A1"}) is None
+
+
+class TestFindingsText:
+    """Tests for rendering findings into the reduce prompt."""
+
+    def test_findings_and_unreviewed_sections(self):
+        findings = [Finding("A1", 0, "MFA is enforced", "all users"), Finding("A1", 4, "Reviews")]
+
+        text = format_findings(findings, 6, [2], TokenCounter(), max_tokens=1000)
+
+        assert 'Section 1: "MFA is enforced" (all users)' in text
+        assert 'Section 5: "Reviews"' in text
+        assert "split into 6 sections" in text
+        assert "Section 3 could not be reviewed" in text
+
+    def test_no_findings(self):
+        text = format_findings([], 3, [], TokenCounter(), max_tokens=1000)
+
+        assert "No section contained evidence" in text
+
+    def test_findings_trimmed_to_budget(self):
+        counter = TokenCounter()
+        findings = [Finding("A1", i, "word " * 50) for i in range(40)]
+
+        text = format_findings(findings, 40, [], counter, max_tokens=500)
+
+        assert counter.count(text) <= 500
+        assert "further findings omitted" in text
+
+
+class TestMapCache:
+    """Tests for the Redis-backed map cache."""
+
+    def test_round_trip(self):
+        cache = MapCache(fakeredis.FakeRedis(), ttl_seconds=60)
+        findings = [{"control_id": "A1", "quote": "MFA", "note": ""}]
+
+        cache.set_many({"abc": findings, "def": []})
+
+        assert cache.get_many(["abc", "def", "missing"]) == {"abc": findings, "def": []}
+
+    def test_redis_errors_are_misses(self):
+        cache = MapCache(redis.Redis(port=1, socket_connect_timeout=0.1), ttl_seconds=60)
+
+        cache.set_many({"abc": []})
+
+        assert cache.get_many(["abc"]) == {}
@@ -0,0 +1,121 @@
+"""
+Tests for Prometheus metrics.
+"""
+
+import threading
+from uuid import uuid4
+
+import fakeredis
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry
+from prometheus_client.registry import Collector
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from core.metrics import (
+    CeleryQueueCollector,
+    InstrumentedAsyncQueuePool,
+    broker_client,
+    instrument_engine,
+)
+from worker.celery_app import celery_app
+
+
+def sample(name: str, labels: dict | None = None) -> float:
+    """Current value of a metric sample (0 if not yet observed)."""
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+@pytest.mark.asyncio
+class TestMetricsEndpoint:
+    """Tests for /metrics and HTTP request histograms."""
+
+    async def test_metrics_exposed(self, client):
+        await client.get("/api/health")
+
+        response = await client.get("/metrics")
+
+        assert response.status_code == 200
+        assert "shieldagent_http_request_duration_seconds" in response.text
+
+    async def test_requests_labelled_by_route_template(self, client, auth_headers):
+        labels = {"method": "GET", "route": "/api/jobs/{job_id}", "status": "404"}
+        before = sample("shieldagent_http_request_duration_seconds_count", labels)
+
+        await client.get(f"/api/jobs/{uuid4()}", headers=auth_headers)
+
+        after = sample("shieldagent_http_request_duration_seconds_count", labels)
+        assert after == before + 1
+
+    async def test_unmatched_routes_share_a_label(self, client):
+        labels = {"method": "GET", "route": "unmatched", "status": "404"}
+        before = sample("shieldagent_http_request_duration_seconds_count", labels)
+
+        await client.get(f"/no-such-path/{uuid4()}")
+
+        assert sample("shieldagent_http_request_duration_seconds_count", labels) == before + 1
+
+    async def test_collected_off_the_event_loop(self, client, monkeypatch):
+        threads = []
+
+        class ThreadRecorder(Collector):
+            def collect(self):
+                threads.append(threading.get_ident())
+                return []
+
+        registry = CollectorRegistry()
+        registry.register(ThreadRecorder())
+        monkeypatch.setattr("core.metrics.get_api_registry", lambda: registry)
+
+        response = await client.get("/metrics")
+
+        assert response.status_code == 200
+        assert threads and threading.get_ident() not in threads
+
+
+class TestQueueCollector:
+    """Tests for broker queue lengths."""
+
+    def test_lengths_read_from_celery_broker(self, monkeypatch):
+        broker = fakeredis.FakeRedis()
+        broker.rpush("scans.quick", "a", "b")
+        urls = []
+        monkeypatch.setattr(celery_app.conf, "broker_url", "redis://broker:6380/3")
+        monkeypatch.setattr(
+            "core.metrics.broker_client", lambda url: urls.append(url) or broker
+        )
+
+        [family] = CeleryQueueCollector().collect()
+
+        lengths = {s.labels["queue"]: s.value for s in family.samples}
+        assert urls == ["redis://broker:6380/3"]
+        assert lengths["scans.quick"] == 2
+        assert lengths["scans.full"] == 0
+
+    def test_broker_client_bound_to_url(self):
+        client = broker_client("redis://broker:6380/3")
+
+        kwargs = client.connection_pool.connection_kwargs
+        assert (kwargs["host"], kwargs["port"], kwargs["db"]) == ("broker", 6380, 3)
+
+
+@pytest.mark.asyncio
+async def test_pool_checkouts_tracked(tmp_path):
+    """Checkouts should be counted and in-use connections returned to zero."""
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedAsyncQueuePool,
+    )
+    instrument_engine(engine)
+    checkouts = sample("shieldagent_db_pool_checkouts_total")
+    waits = sample("shieldagent_db_pool_wait_seconds_count")
+    in_use = sample("shieldagent_db_pool_connections_in_use")
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        assert sample("shieldagent_db_pool_connections_in_use") == in_use + 1
+    await engine.dispose()
+
+    assert sample("shieldagent_db_pool_checkouts_total") == checkouts + 1
+    assert sample("shieldagent_db_pool_wait_seconds_count") == waits + 1
+    assert sample("shieldagent_db_pool_connections_in_use") == in_use
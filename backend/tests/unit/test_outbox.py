@@ -0,0 +1,230 @@
+"""
+Tests for the transactional outbox and its relay.
+"""
+
+import asyncio
+from uuid import UUID
+
+import fakeredis
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from core.config import settings
+from models.job import Job, JobStatus
+from models.outbox import OutboxMessage
+from schemas.job import JobCreate
+from services.job_scheduler import FairScheduler
+from services.job_service import JobService
+from services.outbox import ANALYSIS_TOPIC, OutboxRelay
+from tests.fakes import FakeGemini
+from worker.tasks import run_analysis
+
+
+class Publisher(list):
+    """Records published messages; can be told to fail."""
+
+    fail = False
+
+    def __call__(self, topic, payload):
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        self.append((topic, payload))
+
+
+@pytest.fixture
+def publisher():
+    return Publisher()
+
+
+@pytest.fixture
+def relay(test_db, publisher):
+    return OutboxRelay(
+        async_sessionmaker(test_db.bind, expire_on_commit=False),
+        publish_fn=publisher,
+        batch_size=2,
+    )
+
+
+async def _outbox_rows(test_db) -> list[OutboxMessage]:
+    test_db.expire_all()
+    return list((await test_db.execute(select(OutboxMessage))).scalars().all())
+
+
+async def _create_jobs(test_db, test_user, test_document, count: int) -> list[Job]:
+    service = JobService(test_db)
+    return [
+        await service.create_job(
+            JobCreate(document_ids=[test_document.id]), test_user.id, [test_document]
+        )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+class TestJobCreation:
+    """Tests for committing jobs with their outbox message."""
+
+    async def test_api_commits_job_with_message(
+        self, client: AsyncClient, auth_headers: dict, test_db, test_document, monkeypatch
+    ):
+        def broker_down(*args, **kwargs):
+            raise AssertionError("the request must not touch the broker")
+
+        monkeypatch.setattr("services.outbox.publish_analysis", broker_down)
+        monkeypatch.setattr("services.outbox.get_job_scheduler", broker_down)
+
+        document_id = str(test_document.id)
+        response = await client.post(
+            "/api/jobs/evidence-run",
+            json={"document_ids": [document_id], "scan_type": "full"},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 201
+        job_id = response.json()["id"]
+        [message] = await _outbox_rows(test_db)
+        assert message.topic == ANALYSIS_TOPIC
+        assert message.payload["job_id"] == job_id
+        assert message.payload["document_ids"] == [document_id]
+        assert message.payload["scan_type"] == "full"
+        job = (await test_db.execute(select(Job).where(Job.id == UUID(job_id)))).scalar_one()
+        assert job.celery_task_id == job_id
+
+
+@pytest.mark.asyncio
+class TestOutboxRelay:
+    """Tests for publishing, batching and retries."""
+
+    async def test_publishes_and_deletes(
+        self, relay, publisher, test_db, test_user, test_document
+    ):
+        [job] = await _create_jobs(test_db, test_user, test_document, 1)
+
+        assert await relay.relay_once() == 1
+
+        assert [payload["job_id"] for _, payload in publisher] == [str(job.id)]
+        assert await _outbox_rows(test_db) == []
+
+    async def test_publishes_in_batches(
+        self, relay, publisher, test_db, test_user, test_document
+    ):
+        await _create_jobs(test_db, test_user, test_document, 3)
+
+        assert await relay.relay_once() == 2
+        assert await relay.relay_once() == 1
+        assert await relay.relay_once() == 0
+
+    async def test_failed_publish_backs_off(
+        self, relay, publisher, test_db, test_user, test_document
+    ):
+        await _create_jobs(test_db, test_user, test_document, 1)
+        publisher.fail = True
+
+        assert await relay.relay_once() == 0
+
+        [message] = await _outbox_rows(test_db)
+        assert message.attempts == 1
+        assert "broker unavailable" in message.last_error
+
+        # Not due again until the backoff passes
+        publisher.fail = False
+        assert await relay.relay_once() == 0
+        assert publisher == []
+
+
+@pytest.mark.asyncio
+async def test_run_calls_periodic_work_when_idle(test_db):
+    """The relay loop keeps running periodic work with no messages due."""
+    calls = []
+
+    def periodic():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("redis unavailable")
+
+    relay = OutboxRelay(
+        async_sessionmaker(test_db.bind, expire_on_commit=False),
+        poll_interval=0.01,
+        periodic_fn=periodic,
+        periodic_interval=0.01,
+    )
+    relay.start()
+    await asyncio.sleep(0.2)
+    await relay.stop()
+
+    assert len(calls) >= 2
+
+
+@pytest.mark.asyncio
+async def test_repeated_delivery_skips_finished_job(test_db, test_user, test_document, monkeypatch):
+    """A message published twice must not analyze a finished job again."""
+    monkeypatch.setattr(
+        "worker.tasks.get_gemini_service",
+        lambda **kwargs: pytest.fail("finished job was analyzed again"),
+    )
+    [job] = await _create_jobs(test_db, test_user, test_document, 1)
+    job.status = JobStatus.SUCCEEDED.value
+    await test_db.commit()
+
+    result = await run_analysis(
+        str(job.id),
+        [],
+        session_factory=async_sessionmaker(test_db.bind, expire_on_commit=False),
+        progress_callback=None,
+    )
+
+    assert result["status"] == "skipped"
+    assert (await test_db.execute(select(func.count()).select_from(OutboxMessage))).scalar_one() == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deliveries_run_job_once(test_db, test_user, test_document, monkeypatch):
+    """Two deliveries of the same message must claim the job only once."""
+    gemini = FakeGemini(hold=True)
+    monkeypatch.setattr("worker.tasks.get_gemini_service", lambda **kwargs: gemini)
+    [job] = await _create_jobs(test_db, test_user, test_document, 1)
+    session_factory = async_sessionmaker(test_db.bind, expire_on_commit=False)
+
+    first = asyncio.create_task(run_analysis(str(job.id), [], session_factory=session_factory))
+    await gemini.started.wait()
+    second = await run_analysis(str(job.id), [], session_factory=session_factory)
+    gemini.release.set()
+
+    assert second == {"status": "skipped", "job_id": str(job.id), "job_status": "RUNNING"}
+    assert (await first)["status"] == "success"
+    assert gemini.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_message_kept_until_scheduler_publishes(
+    test_db, test_user, test_document, monkeypatch
+):
+    """A scheduler publish failure must leave the outbox row for a retry."""
+    published = []
+    broker_up = False
+
+    def publish(job_id, payload):
+        if not broker_up:
+            raise ConnectionError("broker unavailable")
+        published.append(job_id)
+
+    scheduler = FairScheduler(fakeredis.FakeRedis(), dispatch_fn=publish, max_running=0)
+    monkeypatch.setattr(settings, "scheduler_enabled", True)
+    monkeypatch.setattr("services.outbox.get_job_scheduler", lambda: scheduler)
+    relay = OutboxRelay(async_sessionmaker(test_db.bind, expire_on_commit=False))
+    [job] = await _create_jobs(test_db, test_user, test_document, 1)
+    job_id = str(job.id)
+
+    assert await relay.relay_once() == 0
+    [message] = await _outbox_rows(test_db)
+    assert "broker unavailable" in message.last_error
+
+    broker_up = True
+    message.available_at = message.created_at
+    await test_db.commit()
+    assert await relay.relay_once() == 1
+
+    assert published == [job_id]
+    assert await _outbox_rows(test_db) == []
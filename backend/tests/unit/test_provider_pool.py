@@ -0,0 +1,242 @@
+"""
+Tests for routing Gemini requests across API keys and model tiers.
+"""
+
+import pytest
+
+from services.llm_backends import StubBackend
+from services.provider_pool import (
+    DEFAULT_TIER,
+    FAST_TIER,
+    EscalationPolicy,
+    ModelEndpoint,
+    NoHealthyEndpointError,
+    ProviderPool,
+    escalation_policy,
+    select_tier,
+)
+from core.config import settings
+from services.rate_limiter import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    LocalTokenBucket,
+    RateLimiter,
+    RetryPolicy,
+)
+from tests.fakes import ApiError, FakeClock
+
+
+def make_endpoint(name: str, tier: str = DEFAULT_TIER, max_retries: int = 0) -> ModelEndpoint:
+    """Endpoint whose model is just its name, with an unconstrained limiter."""
+    limiter = RateLimiter(
+        key=name,
+        bucket=LocalTokenBucket(rate_per_second=10000, capacity=10000),
+        breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+        concurrency=AdaptiveConcurrencyLimiter(max_limit=4),
+        retry_policy=RetryPolicy(max_retries=max_retries, backoff_base=0, backoff_max=0),
+    )
+    return ModelEndpoint(key_id=name, model_name=name, tier=tier, model=name, limiter=limiter)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestSelect:
+    """Tests for least-loaded endpoint selection."""
+
+    def test_picks_least_loaded(self):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        pool = ProviderPool([a, b])
+        a.in_flight = 3
+
+        assert pool.select() is b
+        assert b.in_flight == 1
+
+    def test_idle_endpoints_share_traffic(self):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        pool = ProviderPool([a, b])
+
+        chosen = {pool.select().key_id for _ in range(2)}
+
+        assert chosen == {"a", "b"}
+
+    def test_skips_open_circuit(self):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        pool = ProviderPool([a, b])
+        a.limiter.breaker.record_failure()
+
+        assert all(pool.select() is b for _ in range(3))
+
+    def test_routes_by_tier(self):
+        default, fast = make_endpoint("a"), make_endpoint("a-fast", FAST_TIER)
+        pool = ProviderPool([default, fast])
+
+        assert pool.select(FAST_TIER) is fast
+        assert pool.select(DEFAULT_TIER) is default
+
+    def test_missing_tier_falls_back_to_default(self):
+        default = make_endpoint("a")
+        pool = ProviderPool([default])
+
+        assert pool.select(FAST_TIER) is default
+
+    def test_exhausted(self):
+        a = make_endpoint("a")
+        pool = ProviderPool([a])
+
+        with pytest.raises(NoHealthyEndpointError):
+            pool.select(exclude=(a,))
+
+
+@pytest.mark.asyncio
+class TestCall:
+    """Tests for calls with failover and ejection."""
+
+    async def test_passes_endpoint_model(self):
+        pool = ProviderPool([make_endpoint("a")])
+
+        assert await pool.call(lambda model: f"called {model}") == "called a"
+        assert pool.endpoints[0].requests == 1
+        assert pool.endpoints[0].in_flight == 0
+
+    async def test_fails_over_on_server_error(self):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        b.in_flight = 1  # make "a" the first choice
+        pool = ProviderPool([a, b])
+        stats = {}
+
+        def fn(model):
+            if model == "a":
+                raise ApiError(503)
+            return model
+
+        assert await pool.call(fn, stats=stats) == "b"
+        assert stats["failovers"] == 1
+        assert a.failures == 1
+
+    async def test_auth_error_ejects_key(self, clock):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        b.in_flight = 1
+        pool = ProviderPool([a, b], ejection_seconds=60, clock=clock)
+
+        def fn(model):
+            if model == "a":
+                raise ApiError(403)
+            return model
+
+        assert await pool.call(fn) == "b"
+        assert not a.is_healthy(clock.now)
+
+        clock.now += 60
+        assert a.is_healthy(clock.now)
+
+    async def test_client_error_not_failed_over(self):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        pool = ProviderPool([a, b])
+        calls = []
+
+        def fn(model):
+            calls.append(model)
+            raise ApiError(400)
+
+        with pytest.raises(ApiError):
+            await pool.call(fn)
+        assert len(calls) == 1
+
+    async def test_raises_after_all_endpoints_fail(self):
+        pool = ProviderPool([make_endpoint("a"), make_endpoint("b")])
+
+        def fn(model):
+            raise ApiError(500)
+
+        with pytest.raises(ApiError):
+            await pool.call(fn)
+        assert sum(e.failures for e in pool.endpoints) == 2
+
+    async def test_pinned_endpoint(self):
+        a, b = make_endpoint("a"), make_endpoint("b")
+        a.in_flight = 5
+        pool = ProviderPool([a, b])
+
+        assert await pool.call(lambda model: model, endpoint=a) == "a"
+
+
+class WarmingBackend(StubBackend):
+    """Backend recording warm-ups; models named "down" cannot connect."""
+
+    def __init__(self):
+        super().__init__()
+        self.warmed = []
+
+    def warm_up(self, model, timeout):
+        if model == "down":
+            raise TimeoutError()
+        self.warmed.append(model)
+
+
+class TestWarmUp:
+    """Tests for connecting endpoints at startup."""
+
+    def test_connects_every_endpoint(self):
+        backend = WarmingBackend()
+        pool = ProviderPool([make_endpoint("a"), make_endpoint("b", FAST_TIER)], backend=backend)
+
+        pool.warm_up(timeout=1)
+
+        assert sorted(backend.warmed) == ["a", "b"]
+
+    def test_unreachable_endpoint_does_not_fail_startup(self):
+        backend = WarmingBackend()
+        pool = ProviderPool([make_endpoint("down"), make_endpoint("b")], backend=backend)
+
+        pool.warm_up(timeout=1)
+
+        assert backend.warmed == ["b"]
+
+
+class TestSelectTier:
+    """Tests for choosing a model tier per control."""
+
+    def test_default_without_fast_model(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_fast_model", "")
+        assert select_tier("quick", {"risk": "low"}) == DEFAULT_TIER
+
+    def test_quick_scan_and_low_risk(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_fast_model", "gemini-1.5-flash-8b")
+        assert select_tier("quick", {"risk": "high"}) == FAST_TIER
+        assert select_tier("full", {"risk": "low"}) == FAST_TIER
+        assert select_tier("full", {"risk": "medium"}) == DEFAULT_TIER
+
+
+class TestEscalationPolicy:
+    """Tests for deciding when a fast-tier verdict is escalated."""
+
+    def test_reasons(self):
+        policy = EscalationPolicy(min_confidence=0.7)
+        assert policy.reason({"status": "pass", "confidence": 0.9}) is None
+        assert policy.reason({"status": "pass", "confidence": 0.5}) == "low_confidence"
+        assert policy.reason({"status": "needs_review", "confidence": 0.9}) == "needs_review"
+        assert policy.reason(
+            {"status": "needs_review", "confidence": 0.0, "parse_failed": True}
+        ) == "parse_failure"
+
+    def test_category_override(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_fast_model", "gemini-1.5-flash-8b")
+        monkeypatch.setattr(settings, "gemini_cascade_enabled", True)
+        monkeypatch.setattr(settings, "gemini_cascade_policies", {
+            "Risk Assessment": {"min_confidence": 0.95, "statuses": ["fail"]},
+            "Monitoring": {"enabled": False},
+        })
+
+        policy = escalation_policy({"category": "risk assessment"})
+        assert policy.min_confidence == 0.95
+        assert policy.reason({"status": "fail", "confidence": 0.99}) == "fail"
+        assert escalation_policy({"category": "Monitoring"}) is None
+        assert escalation_policy({"category": "Other"}).min_confidence == 0.7
+
+    def test_off_without_fast_model(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_fast_model", "")
+        monkeypatch.setattr(settings, "gemini_cascade_enabled", True)
+        assert escalation_policy({"category": "Other"}) is None
@@ -0,0 +1,320 @@
+"""
+Tests for Gemini rate limiting, retries and circuit breaking.
+"""
+
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from services.rate_limiter import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LocalTokenBucket,
+    RateLimiter,
+    RedisTokenBucket,
+    RetryPolicy,
+    backoff_delay,
+    is_retryable_error,
+    is_throttle_error,
+)
+from tests.fakes import ApiError, FakeClock
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_limiter(max_retries: int = 3, failure_threshold: int = 5) -> RateLimiter:
+    """RateLimiter with no waiting between retries."""
+    return RateLimiter(
+        key="test",
+        bucket=LocalTokenBucket(rate_per_second=10000, capacity=10000),
+        breaker=CircuitBreaker(failure_threshold, reset_timeout=60),
+        concurrency=AdaptiveConcurrencyLimiter(max_limit=4),
+        retry_policy=RetryPolicy(max_retries=max_retries, backoff_base=0, backoff_max=0),
+    )
+
+
+class TestErrorClassification:
+    """Tests for retryable/throttle detection."""
+
+    def test_throttle(self):
+        assert is_throttle_error(ApiError(429))
+        assert is_retryable_error(ApiError(429))
+
+    def test_server_errors_retryable(self):
+        assert is_retryable_error(ApiError(503))
+        assert not is_throttle_error(ApiError(503))
+
+    def test_client_errors_not_retryable(self):
+        assert not is_retryable_error(ApiError(400))
+        assert not is_retryable_error(ValueError("boom"))
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(1, 10):
+            assert 0 <= backoff_delay(attempt, 1.0, 8.0) <= 8.0
+
+
+class TestLocalTokenBucket:
+    """Tests for the in-process token bucket."""
+
+    def test_burst_then_wait(self, clock):
+        """Capacity tokens are available immediately, then callers wait."""
+        bucket = LocalTokenBucket(rate_per_second=1, capacity=2, clock=clock)
+
+        assert bucket.try_acquire("k") == 0
+        assert bucket.try_acquire("k") == 0
+        assert bucket.try_acquire("k") == pytest.approx(1.0)
+
+    def test_refill(self, clock):
+        """Tokens refill at the configured rate."""
+        bucket = LocalTokenBucket(rate_per_second=2, capacity=1, clock=clock)
+        bucket.try_acquire("k")
+
+        clock.now += 0.5
+        assert bucket.try_acquire("k") == 0
+
+    def test_keys_are_independent(self, clock):
+        """Each API key has its own budget."""
+        bucket = LocalTokenBucket(rate_per_second=1, capacity=1, clock=clock)
+        bucket.try_acquire("a")
+
+        assert bucket.try_acquire("b") == 0
+
+    def test_penalize(self, clock):
+        """A penalty blocks acquisitions until it expires."""
+        bucket = LocalTokenBucket(rate_per_second=100, capacity=100, clock=clock)
+        bucket.penalize("k", 5)
+
+        assert bucket.try_acquire("k") == pytest.approx(5)
+        clock.now += 5
+        assert bucket.try_acquire("k") == 0
+
+
+class TestCircuitBreaker:
+    """Tests for circuit breaker state transitions."""
+
+    def test_opens_after_threshold(self, clock):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_half_open_trial(self, clock):
+        """After the timeout one trial call is admitted."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_trial_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+        breaker.before_call()
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_stale_trial_replaced(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock, trial_timeout=30)
+        breaker.record_failure()
+        clock.now += 10
+        breaker.before_call()
+
+        clock.now += 30
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_frees_circuit(self):
+        """A half-open trial cancelled mid-request must not block later calls."""
+        limiter = make_limiter(max_retries=0, failure_threshold=1)
+        limiter.breaker.reset_timeout = 0
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            raise ApiError(503)
+
+        def hang():
+            started.set()
+            release.wait(5)
+
+        with pytest.raises(ApiError):
+            await limiter.call(fail)
+        trial = asyncio.create_task(limiter.call(hang))
+        await asyncio.to_thread(started.wait, 5)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        release.set()
+
+        assert await limiter.call(lambda: "ok") == "ok"
+        assert limiter.breaker.state == CircuitBreaker.CLOSED
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Tests for AIMD concurrency adaptation."""
+
+    def test_throttle_halves_limit(self, clock):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, clock=clock)
+        limiter.on_throttle()
+        assert limiter.limit == 4
+
+        # Repeated throttles within the interval count once
+        limiter.on_throttle()
+        assert limiter.limit == 4
+
+    def test_success_recovers_limit(self, clock):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=8, clock=clock)
+        limiter.on_throttle()
+        # One window's worth of successes adds roughly one slot
+        for _ in range(5):
+            limiter.on_success()
+        assert limiter.limit == 5
+
+    @pytest.mark.asyncio
+    async def test_limits_concurrent_calls(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=2)
+        peak = 0
+
+        async def work():
+            nonlocal peak
+            await limiter.acquire()
+            try:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+            finally:
+                limiter.release()
+
+        await asyncio.gather(*(work() for _ in range(6)))
+
+        assert peak == 2
+        assert limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_passes_slot_on(self):
+        limiter = AdaptiveConcurrencyLimiter(max_limit=1)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        # Wake the first waiter, then cancel it before it resumes
+        limiter.release()
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+
+        assert first.cancelled()
+        assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+class TestRateLimiterCall:
+    """Tests for the retrying call wrapper."""
+
+    async def test_retries_transient_errors(self):
+        limiter = make_limiter()
+        errors = [ApiError(503), ApiError(429)]
+        stats = {}
+
+        def fn():
+            if errors:
+                raise errors.pop()
+            return "ok"
+
+        assert await limiter.call(fn, stats=stats) == "ok"
+        assert stats == {"retries": 2, "throttled": 1}
+
+    async def test_gives_up_after_max_retries(self):
+        limiter = make_limiter(max_retries=2)
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise ApiError(500)
+
+        with pytest.raises(ApiError):
+            await limiter.call(fn)
+        assert len(calls) == 3
+
+    async def test_circuit_opens_on_repeated_failures(self):
+        limiter = make_limiter(max_retries=0, failure_threshold=2)
+
+        def fn():
+            raise ApiError(503)
+
+        for _ in range(2):
+            with pytest.raises(ApiError):
+                await limiter.call(fn)
+        with pytest.raises(CircuitOpenError):
+            await limiter.call(fn)
+
+    async def test_throttle_reduces_concurrency(self):
+        limiter = make_limiter()
+        errors = [ApiError(429)]
+
+        def fn():
+            if errors:
+                raise errors.pop()
+            return "ok"
+
+        await limiter.call(fn)
+        assert limiter.concurrency.limit < 4
+
+    async def test_blocking_calls_run_off_the_loop(self):
+        """Concurrent blocking requests overlap instead of serializing the loop."""
+        limiter = make_limiter()
+
+        def fn():
+            time.sleep(0.2)
+            return "ok"
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limiter.call(fn) for _ in range(4)))
+
+        assert results == ["ok"] * 4
+        assert time.perf_counter() - started < 0.6
+
+    async def test_redis_bucket_calls_run_off_the_loop(self):
+        loop_thread = threading.current_thread()
+        threads = []
+
+        class RecordingBucket(RedisTokenBucket):
+            def try_acquire(self, key, tokens=1):
+                threads.append(threading.current_thread())
+                return super().try_acquire(key, tokens)
+
+            def penalize(self, key, seconds):
+                threads.append(threading.current_thread())
+                super().penalize(key, seconds)
+
+        limiter = make_limiter()
+        limiter.bucket = RecordingBucket(fakeredis.FakeRedis(), 10000, 10000)
+        errors = [ApiError(429)]
+
+        def fn():
+            if errors:
+                raise errors.pop()
+            return "ok"
+
+        assert await limiter.call(fn) == "ok"
+        # Two token acquisitions (more if the cooldown is still running) and a penalty
+        assert len(threads) >= 3
+        assert loop_thread not in threads
@@ -0,0 +1,83 @@
+"""
+Tests for the local relevance prefilter.
+"""
+
+from services.framework_registry import get_framework
+from services.relevance_filter import (
+    AhoCorasick,
+    RelevanceFilter,
+    item_phrases,
+    item_words,
+    normalize,
+)
+
+INFRA_EVIDENCE = """
+All workforce accounts require multi-factor authentication (MFA) and SSO.
+Role-based access control (RBAC) is enforced; privileged access is reviewed
+quarterly. Data is encrypted in transit with TLS. Our incident response plan
+defines severity levels and on-call response team roles.
+"""
+
+
+def build(*patterns: str) -> AhoCorasick[str]:
+    automaton: AhoCorasick[str] = AhoCorasick()
+    for pattern in patterns:
+        automaton.add(pattern, pattern)
+    return automaton.build()
+
+
+class TestAhoCorasick:
+    """Tests for the multi-pattern matcher."""
+
+    def test_finds_overlapping_patterns(self):
+        automaton = build("access", "access review", "review")
+
+        matches = list(automaton.iter_matches("quarterly access review"))
+
+        assert sorted(matches) == ["access", "access review", "review"]
+
+    def test_matches_whole_words_only(self):
+        automaton = build("mfa", "sso")
+
+        assert list(automaton.iter_matches("mfa enabled")) == ["mfa"]
+        assert list(automaton.iter_matches("mfas enabled")) == []
+        assert list(automaton.iter_matches("lasso")) == []
+
+    def test_failure_links_recover_partial_matches(self):
+        automaton = build("data retention", "retention schedule")
+
+        matches = list(automaton.iter_matches("data retention schedule"))
+
+        assert sorted(matches) == ["data retention", "retention schedule"]
+
+
+class TestTerms:
+    """Tests for deriving search terms from "Look for" items."""
+
+    def test_alternatives_are_phrases(self):
+        item = "Authentication mechanisms (passwords, MFA, SSO)"
+
+        assert {"mfa", "sso", "password", "authentication mechanism"} <= item_phrases(item)
+        assert item_words(item) == {"authentication", "password"}
+
+    def test_normalize_stems_words(self):
+        assert normalize("Access Reviews,\nreviewed  quarterly") == "access review review quarterly"
+
+
+class TestRelevanceFilter:
+    """Tests for scoring controls against evidence."""
+
+    def test_privacy_controls_score_zero_on_infra_evidence(self):
+        catalog = get_framework("soc2")
+        scores = RelevanceFilter(catalog.controls).score([INFRA_EVIDENCE], catalog.controls)
+
+        assert scores["CC6.1"].score >= 0.5
+        privacy = [c["control_id"] for c in catalog.get_section_controls("P")]
+        assert all(scores[cid].score == 0 for cid in privacy)
+
+    def test_controls_without_look_for_always_pass(self):
+        control = {"control_id": "X1", "check_prompt": "Assess the thing."}
+
+        scores = RelevanceFilter([control]).score(["unrelated"], [control])
+
+        assert scores["X1"].score == 1.0
@@ -197,6 +197,25 @@ class TestRiskScoreCalculation:
         assert 30 <= result.overall_score <= 80
         assert result.compliance_percentage == 50.0  # 2 out of 4 passing
 
+    def test_not_applicable_controls_ignored(
+        self, calculator, sample_passing_results
+    ):
+        """Controls the evidence does not cover should not lower the score."""
+        baseline = calculator.calculate_risk_score(sample_passing_results)
+        sample_passing_results["controls"].append({
+            "control_id": "P1.1",
+            "category": "Privacy",
+            "title": "Privacy Notice",
+            "status": "not_applicable",
+            "confidence": 0.0,
+            "gaps": [],
+        })
+
+        result = calculator.calculate_risk_score(sample_passing_results)
+
+        assert result.overall_score == baseline.overall_score
+        assert result.compliance_percentage == 100.0
+
 
 class TestRiskLevelDetermination:
     """Tests for risk level determination."""
@@ -0,0 +1,145 @@
+"""
+Tests for token estimates, calibration and document packing.
+"""
+
+from core.config import settings
+from services.token_budget import (
+    DOCUMENT_SEPARATOR,
+    OMITTED_MARKER,
+    TokenCounter,
+    context_window_tokens,
+    local_token_estimate,
+    pack_documents,
+    split_chunks,
+)
+
+
+class CountingFn:
+    """Exact count stub: two tokens per local token, recording each batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(texts)
+        return 2 * sum(local_token_estimate(t) for t in texts)
+
+
+def paragraphs(count: int, words: int = 50, word: str = "audit") -> str:
+    return "\n\n".join(" ".join([f"{word}{i}"] * words) for i in range(count))
+
+
+class TestEstimates:
+    """Tests for local estimates and model windows."""
+
+    def test_local_estimate(self):
+        assert local_token_estimate("") == 0
+        assert local_token_estimate("MFA is required.") == 4
+        assert local_token_estimate("authentication") == 2
+        assert local_token_estimate("2024") == 4
+
+    def test_context_window_lookup(self, monkeypatch):
+        monkeypatch.setattr(settings, "gemini_context_window_tokens", {"gemini-x": 1000})
+        monkeypatch.setattr(settings, "gemini_default_context_window_tokens", 500)
+        assert context_window_tokens("models/gemini-x") == 1000
+        assert context_window_tokens("other") == 500
+
+
+class TestCalibration:
+    """Tests for calibrating estimates against exact counts."""
+
+    def test_ratio_from_one_batched_count(self):
+        counter = TokenCounter()
+        count_fn = CountingFn()
+
+        assert counter.calibrate(["first document", "second document"], count_fn)
+
+        assert len(count_fn.batches) == 1
+        assert counter.ratio == 2.0
+        assert counter.count("first document") == 4
+
+    def test_sampled_texts_not_recounted(self):
+        counter = TokenCounter()
+        count_fn = CountingFn()
+        counter.calibrate(["first document"], count_fn)
+
+        assert not counter.calibrate(["first document"], count_fn)
+        assert counter.calibrate(["first document", "new one"], count_fn)
+        assert count_fn.batches[1] == ["new one"]
+
+    def test_failure_keeps_ratio(self):
+        counter = TokenCounter()
+
+        def fail(texts):
+            raise ConnectionError("count-tokens unavailable")
+
+        assert not counter.calibrate(["text"], fail)
+        assert not counter.calibrate(["text"], lambda texts: None)
+        assert counter.ratio == 1.0
+
+
+class TestPacking:
+    """Tests for packing documents into a token budget."""
+
+    def test_documents_that_fit_are_joined_whole(self):
+        counter = TokenCounter()
+        texts = ["first policy", "second policy"]
+
+        packed = pack_documents(texts, budget_tokens=100, counter=counter)
+
+        assert packed.text == DOCUMENT_SEPARATOR.join(texts)
+        assert packed.complete
+        assert 0 < packed.fill_ratio < 1
+
+    def test_long_paragraph_split(self):
+        counter = TokenCounter()
+
+        chunks = split_chunks(" ".join(["word"] * 300), 0, counter, max_tokens=100)
+
+        assert len(chunks) == 3
+        assert all(c.tokens <= 100 for c in chunks)
+        assert all(c.text.split() == ["word"] * 100 for c in chunks)
+
+    def test_priority_chunks_kept_in_order(self):
+        counter = TokenCounter()
+        text = paragraphs(10, words=20)
+
+        packed = pack_documents(
+            [text],
+            budget_tokens=200,
+            counter=counter,
+            chunk_tokens=50,
+            priority=lambda chunk: 1.0 if chunk.index in (2, 7) else 0.0,
+        )
+
+        assert not packed.complete
+        assert packed.tokens <= 200
+        assert packed.text.index("audit2") < packed.text.index("audit7")
+        assert "audit5" not in packed.text
+        assert packed.text.startswith(OMITTED_MARKER)
+        assert packed.text.endswith(OMITTED_MARKER)
+
+    def test_dropped_tail_marked_before_next_document(self):
+        counter = TokenCounter()
+        texts = [paragraphs(6, words=20, word="policy"), paragraphs(6, words=20, word="access")]
+
+        packed = pack_documents(
+            texts,
+            budget_tokens=300,
+            counter=counter,
+            chunk_tokens=50,
+            priority=lambda chunk: 1.0 if chunk.index == 0 else 0.0,
+        )
+
+        first, second = packed.text.split(DOCUMENT_SEPARATOR)
+        assert first.startswith("policy0") and first.endswith(OMITTED_MARKER)
+        assert second.startswith("access0") and second.endswith(OMITTED_MARKER)
+        assert packed.tokens <= 300
+
+    def test_never_exceeds_budget(self):
+        counter = TokenCounter()
+        texts = [paragraphs(20, word="policy"), paragraphs(20, word="access")]
+
+        for budget in (60, 200, 700, 1500):
+            packed = pack_documents(texts, budget_tokens=budget, counter=counter, chunk_tokens=50)
+            assert counter.count(packed.text) <= budget
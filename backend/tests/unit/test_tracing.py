@@ -0,0 +1,138 @@
+"""
+Tests for OpenTelemetry tracing and Celery trace propagation.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from core.config import settings
+from core.tracing import JsonLinesSpanExporter, capture_trace_headers, setup_tracing, tracer
+from services.outbox import analysis_message, publish_message
+from worker.tracing import ENQUEUED_AT_HEADER, CeleryRequestGetter, _inject_trace_headers
+
+_exporter = InMemorySpanExporter()
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    """Finished spans recorded by the process-wide tracer provider."""
+    monkeypatch.setattr(settings, "tracing_enabled", True)
+    provider = setup_tracing("shieldagent-test", exporter=_exporter)
+    provider.force_flush()
+    _exporter.clear()
+
+    def finished():
+        provider.force_flush()
+        return _exporter.get_finished_spans()
+
+    return finished
+
+
+@pytest.mark.asyncio
+class TestAnalysisSpans:
+    """Tests for spans around document analysis."""
+
+    async def test_spans_nest_under_analysis(self, spans, stub_service, tmp_path):
+        path = tmp_path / "policy.txt"
+        path.write_text("All users must use MFA. Access is reviewed quarterly.")
+
+        await stub_service.analyze_documents([str(path)])
+
+        by_id = {s.context.span_id: s for s in spans()}
+        names = [s.name for s in by_id.values()]
+        assert names.count("analyze_control") == len(stub_service.controls)
+
+        root = next(s for s in by_id.values() if s.name == "analyze_documents")
+        for span in by_id.values():
+            if span.name in ("analyze_control", "extract_document_text"):
+                assert span.parent.span_id == root.context.span_id
+            if span.name in ("llm.generate", "parse_response"):
+                assert by_id[span.parent.span_id].name == "analyze_control"
+
+    async def test_control_span_attributes(self, spans, stub_service):
+        control = stub_service.controls[0]
+
+        await stub_service.analyze_control(control, ["MFA is enforced"])
+
+        span = next(s for s in spans() if s.name == "analyze_control")
+        assert span.attributes["control.id"] == control["control_id"]
+        assert span.attributes["llm.retries"] == 0
+        assert span.attributes["llm.prompt_tokens"] > 0
+        assert span.attributes["llm.parse_failed"] is False
+
+
+class TestCeleryPropagation:
+    """Tests for carrying trace context through task headers."""
+
+    def test_headers_continue_publisher_trace(self, spans):
+        headers = {}
+        with tracer.start_as_current_span("publish") as publish:
+            _inject_trace_headers(headers=headers)
+
+        assert ENQUEUED_AT_HEADER in headers
+        # Celery exposes message headers as attributes of the task request
+        request = SimpleNamespace(**headers)
+        parent = propagate.extract(request, getter=CeleryRequestGetter())
+        span_context = trace.get_current_span(parent).get_span_context()
+        assert span_context.trace_id == publish.get_span_context().trace_id
+        assert span_context.span_id == publish.get_span_context().span_id
+
+    def test_submission_headers_kept(self, spans):
+        with tracer.start_as_current_span("submit") as submit:
+            submitted = capture_trace_headers()
+
+        headers = dict(submitted)
+        with tracer.start_as_current_span("relay"):
+            _inject_trace_headers(headers=headers)
+
+        assert headers == submitted
+        parent = propagate.extract(SimpleNamespace(**headers), getter=CeleryRequestGetter())
+        span_context = trace.get_current_span(parent).get_span_context()
+        assert span_context.span_id == submit.get_span_context().span_id
+
+    def test_outbox_publish_continues_request_trace(self, spans, monkeypatch):
+        from worker.tasks import run_compliance_analysis
+
+        published = []
+        monkeypatch.setattr(
+            run_compliance_analysis, "apply_async", lambda **kwargs: published.append(kwargs)
+        )
+        monkeypatch.setattr(settings, "scheduler_enabled", False)
+        with tracer.start_as_current_span("POST /api/jobs") as request:
+            message = analysis_message("job-1", "user-1", 8, [], "quick", "soc2")
+
+        publish_message(message.topic, message.payload)
+
+        [options] = published
+        headers = options["headers"]
+        assert ENQUEUED_AT_HEADER in headers
+        parent = propagate.extract(SimpleNamespace(**headers), getter=CeleryRequestGetter())
+        span_context = trace.get_current_span(parent).get_span_context()
+        assert span_context.trace_id == request.get_span_context().trace_id
+
+    def test_disabled_adds_no_headers(self, monkeypatch):
+        monkeypatch.setattr(settings, "tracing_enabled", False)
+        headers = {}
+
+        _inject_trace_headers(headers=headers)
+
+        assert headers == {}
+
+
+class TestJsonLinesExporter:
+    """Tests for the local file exporter."""
+
+    def test_writes_one_span_per_line(self, spans, tmp_path):
+        with tracer.start_as_current_span("outer"):
+            with tracer.start_as_current_span("inner"):
+                pass
+        path = tmp_path / "traces.jsonl"
+
+        JsonLinesSpanExporter(str(path)).export(spans())
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        assert '"name": "inner"' in lines[0]
@@ -0,0 +1,80 @@
+"""
+Tests for the event loop shared by worker task threads.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from worker.event_loop import SharedEventLoop
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+@pytest.fixture
+def shared():
+    loop = SharedEventLoop("test-loop")
+    yield loop
+    loop.stop(timeout=1)
+
+
+class TestSharedEventLoop:
+    """Tests for running task coroutines on one loop."""
+
+    def test_task_threads_share_one_loop(self, shared):
+        async def job():
+            await asyncio.sleep(0.2)
+            return id(asyncio.get_running_loop())
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            loops = list(pool.map(lambda _: shared.run(job()), range(20)))
+
+        assert len(set(loops)) == 1
+        # Twenty jobs waiting on I/O together take about as long as one
+        assert time.perf_counter() - started < 1.0
+
+    def test_runs_in_caller_context(self, shared):
+        async def job():
+            return request_id.get()
+
+        def task(value):
+            request_id.set(value)
+            return shared.run(job())
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            assert list(pool.map(task, ["a", "b"])) == ["a", "b"]
+
+    def test_timeout_cancels_coroutine(self, shared):
+        cancelled = threading.Event()
+
+        async def job():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(TimeoutError):
+            shared.run(job(), timeout=0.1)
+        assert cancelled.wait(1)
+
+    def test_errors_propagate(self, shared):
+        async def job():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            shared.run(job())
+
+    def test_stop_and_restart(self, shared):
+        async def job():
+            return 42
+
+        assert shared.run(job()) == 42
+        shared.stop(timeout=1)
+        assert not shared.running
+        assert shared.run(job()) == 42
@@ -3,9 +3,24 @@ Celery application configuration for ShieldAgent background tasks.
 """
 
 from celery import Celery
+from kombu import Queue
 
 from core.config import settings
 
+# Queues, each served by its own worker pool (see docker-compose.yml) so
+# long full scans never sit in front of interactive quick scans
+DEFAULT_QUEUE = "celery"
+QUICK_SCAN_QUEUE = "scans.quick"
+FULL_SCAN_QUEUE = "scans.full"
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Route analysis tasks to the quick or full scan queue by scan type."""
+    if name != "worker.tasks.run_compliance_analysis":
+        return None
+    scan_type = kwargs.get("scan_type") or (args[2] if len(args) > 2 else "quick")
+    return {"queue": FULL_SCAN_QUEUE if scan_type == "full" else QUICK_SCAN_QUEUE}
+
 
 # Create Celery app
 celery_app = Celery(
@@ -32,7 +47,16 @@ celery_app.conf.update(
     # Result expiration
     result_expires=86400,  # 24 hours
     
-    # Worker settings
+    # Queues and routing; a worker started without -Q consumes all of them
+    task_default_queue=DEFAULT_QUEUE,
+    task_queues=[
+        Queue(DEFAULT_QUEUE),
+        Queue(QUICK_SCAN_QUEUE),
+        Queue(FULL_SCAN_QUEUE),
+    ],
+    task_routes=[route_task],
+    
+    # Worker settings (concurrency is overridden per queue with -c)
     worker_prefetch_multiplier=1,
     worker_concurrency=2,
     
@@ -40,3 +64,7 @@ celery_app.conf.update(
     task_acks_late=True,
     task_reject_on_worker_lost=True,
 )
+
+# Register Prometheus and trace propagation signal handlers
+import worker.metrics  # noqa: E402,F401
+import worker.tracing  # noqa: E402,F401
@@ -0,0 +1,104 @@
+"""
+One asyncio event loop shared by every task thread of a worker process.
+
+With the threads pool (celery worker -P threads -c N), each task thread
+hands its coroutine to this loop and blocks until it finishes. Analysis is
+almost all LLM and database I/O wait, so dozens of jobs then interleave on
+one loop and share its database pool, HTTP clients and LLM limits, instead
+of each task building (and tearing down) a loop and engine of its own.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable
+
+from core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class SharedEventLoop:
+    """An event loop running forever in a daemon thread, started on first use."""
+
+    def __init__(self, name: str = "shared-event-loop") -> None:
+        self.name = name
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """Whether the loop thread has been started and not stopped."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if needed and return the loop."""
+        with self._lock:
+            if self._loop is None or not self.running:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def serve() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=serve, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+                logger.info("Shared event loop started", name=self.name)
+            return self._loop
+
+    def run(self, coro: Awaitable[Any], timeout: float | None = None) -> Any:
+        """
+        Run a coroutine on the shared loop and wait for its result.
+
+        Called from task threads, never from the loop itself. The coroutine
+        runs in a copy of the caller's context, so the task's trace span
+        stays current inside it.
+
+        Args:
+            coro: Coroutine to run.
+            timeout: Seconds to wait before cancelling it (None = no limit).
+
+        Returns:
+            The coroutine's result.
+
+        Raises:
+            TimeoutError: If the coroutine ran past the timeout.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Task exceeded {timeout}s on the shared event loop")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Cancel outstanding coroutines, stop the loop and close it."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or thread is None or not thread.is_alive():
+                return
+
+            async def cancel_all() -> None:
+                tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            try:
+                asyncio.run_coroutine_threadsafe(cancel_all(), loop).result(timeout)
+            except Exception as e:
+                logger.warning("Shared event loop did not drain", error=str(e))
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
+            self._loop = self._thread = None
+            logger.info("Shared event loop stopped", name=self.name)
+
+
+shared_loop = SharedEventLoop("analysis-loop")
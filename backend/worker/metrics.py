@@ -0,0 +1,56 @@
+"""
+Prometheus instrumentation for Celery workers.
+
+Records task run time through Celery signals and serves the worker's metrics
+over HTTP once the worker is ready. Prefork workers run tasks in child
+processes, so PROMETHEUS_MULTIPROC_DIR must be set for their metrics to reach
+the endpoint served by the parent.
+"""
+
+import os
+import time
+
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown, worker_ready
+from prometheus_client import multiprocess, start_http_server
+
+from core.config import settings
+from core.logging import get_logger
+from core.metrics import CELERY_TASK_DURATION, build_registry, is_multiprocess
+
+logger = get_logger(__name__)
+
+# Start times of tasks running in this process, keyed by task ID
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(
+            time.perf_counter() - started
+        )
+
+
+@worker_ready.connect
+def _start_metrics_server(**kwargs):
+    if not settings.worker_metrics_port:
+        return
+    if not is_multiprocess():
+        logger.warning(
+            "PROMETHEUS_MULTIPROC_DIR not set; task metrics from pool processes "
+            "will not be exported"
+        )
+    start_http_server(settings.worker_metrics_port, registry=build_registry())
+    logger.info("Worker metrics server started", port=settings.worker_metrics_port)
+
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs):
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid or os.getpid())
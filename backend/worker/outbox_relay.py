@@ -0,0 +1,23 @@
+"""
+Standalone outbox relay process.
+
+Run with: python -m worker.outbox_relay
+"""
+
+import asyncio
+
+from core.logging import setup_logging
+from services.outbox import get_outbox_relay
+
+
+def main() -> None:
+    """Publish outbox messages until interrupted."""
+    setup_logging()
+    try:
+        asyncio.run(get_outbox_relay().run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
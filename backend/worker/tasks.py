@@ -3,48 +3,141 @@ Celery tasks for compliance analysis background processing.
 """
 
 import asyncio
+import time
 from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable
 from uuid import UUID
 
-from celery import current_task
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from celery import Task
+from celery.concurrency.thread import TaskPool as ThreadTaskPool
+from celery.signals import (
+    worker_process_init,
+    worker_process_shutdown,
+    worker_ready,
+    worker_shutdown,
+)
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from core.config import settings
+from core.logging import get_logger
+from core.metrics import InstrumentedAsyncQueuePool, instrument_engine
+from core.tracing import trace_engine, tracer
 from models.job import Job, JobStatus
 from models.document import Document
 from models.evidence import EvidenceItem, Gap, EvidenceStatus, GapSeverity
 from services.gemini_service import get_gemini_service
+from services.job_cancellation import CancellationFlag
+from services.job_scheduler import release_job, renew_job_lease
+from services.job_service import JobService, build_job_metrics
+from services.provider_pool import init_provider_pool
 from worker.celery_app import celery_app
+from worker.event_loop import shared_loop
+
+logger = get_logger(__name__)
+
+
+def create_worker_engine() -> AsyncEngine:
+    """Create an instrumented database engine for worker tasks."""
+    engine = create_async_engine(
+        settings.database_url,
+        echo=False,
+        poolclass=InstrumentedAsyncQueuePool,
+    )
+    instrument_engine(engine)
+    trace_engine(engine)
+    return engine
 
 
 def get_async_session():
     """Create async database session for worker."""
-    engine = create_async_engine(settings.database_url, echo=False)
-    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return sessionmaker(create_worker_engine(), class_=AsyncSession, expire_on_commit=False)
+
 
+@lru_cache
+def get_shared_session_factory():
+    """Get the session factory shared by all jobs on the shared event loop."""
+    return get_async_session()
 
-async def _run_analysis(
+
+def _task_progress_reporter(task: Task) -> Callable[[int, int, str], None]:
+    """
+    Build a callback publishing analysis progress as the task's state.
+
+    The task ID is captured now because task.request is thread-local and
+    the callback may run on the shared event loop's thread.
+    """
+    task_id = task.request.id
+
+    def report(current: int, total: int, control_id: str) -> None:
+        task.update_state(
+            task_id=task_id,
+            state="PROGRESS",
+            meta={
+                "current": current,
+                "total": total,
+                "control_id": control_id,
+                "progress": int((current / total) * 100),
+            },
+        )
+
+    return report
+
+
+async def run_analysis(
     job_id: str,
     document_ids: list[str],
     scan_type: str = "quick",
+    framework: str = "soc2",
+    session_factory: Callable[[], AsyncSession] | None = None,
+    progress_callback: Callable[[int, int, str], None] | None = None,
 ) -> dict:
     """
-    Internal async function to run compliance analysis.
+    Run compliance analysis for a job and persist its results.
+    
+    Shared by the Celery task and the in-process executor.
     
     Args:
         job_id: The job UUID string.
-        document_ids: List of document UUID strings.
-        scan_type: "quick" for 8 controls, "full" for all 51.
+        document_ids: List of document UUID strings (used when the job has
+            no job_documents rows).
+        scan_type: "quick" for the pack's quick-scan controls, "full" for all.
+        framework: Framework ID of the control pack to evaluate against.
+        session_factory: Session factory to use; defaults to a new worker engine.
+        progress_callback: Called with (current, total, control_id) per control.
         
     Returns:
         Analysis results dictionary.
     """
-    AsyncSessionLocal = get_async_session()
+    AsyncSessionLocal = session_factory or get_async_session()
     
     async with AsyncSessionLocal() as db:
-        # Get job
+        # Claim the job atomically: of two deliveries of the same task
+        # (the outbox publishes at least once), only one moves it to
+        # RUNNING. Cancelled, running and finished jobs are skipped.
+        try:
+            claimed = await db.execute(
+                update(Job)
+                .where(
+                    Job.id == UUID(job_id),
+                    Job.status.in_([JobStatus.PENDING.value, JobStatus.FAILED.value]),
+                )
+                .values(
+                    status=JobStatus.RUNNING.value,
+                    started_at=datetime.now(timezone.utc),
+                    error_message=None,
+                )
+            )
+            await db.commit()
+        except IntegrityError:
+            # A retry of a failed job whose de-duplication key an identical
+            # job has taken since; that job does the work
+            await db.rollback()
+            claimed = None
+        
         result = await db.execute(
             select(Job).where(Job.id == UUID(job_id))
         )
@@ -53,19 +146,20 @@ async def _run_analysis(
         if not job:
             raise ValueError(f"Job not found: {job_id}")
         
-        # Update job to running
-        job.status = JobStatus.RUNNING.value
-        job.started_at = datetime.now(timezone.utc)
-        await db.commit()
+        if claimed is None or claimed.rowcount == 0:
+            return {"status": "skipped", "job_id": job_id, "job_status": job.status}
         
         try:
-            # Get documents
-            result = await db.execute(
-                select(Document).where(
-                    Document.id.in_([UUID(d) for d in document_ids])
+            # Get documents, falling back to the task arguments for jobs
+            # created before job_documents existed
+            documents = await JobService(db).get_job_documents(job.id)
+            if not documents:
+                rows = await db.execute(
+                    select(Document).where(
+                        Document.id.in_([UUID(d) for d in document_ids])
+                    )
                 )
-            )
-            documents = result.scalars().all()
+                documents = list(rows.scalars().all())
             
             if not documents:
                 raise ValueError("No documents found for analysis")
@@ -74,100 +168,132 @@ async def _run_analysis(
             doc_paths = [doc.file_path for doc in documents]
             
             # Initialize Gemini service with scan_type
-            gemini = get_gemini_service(scan_type=scan_type)
+            gemini = get_gemini_service(scan_type=scan_type, framework=framework)
             controls = gemini.get_controls()
             
-            # Progress callback
-            def update_progress(current, total, control_id):
-                progress = int((current / total) * 100)
-                # Update task state for Celery
-                current_task.update_state(
-                    state="PROGRESS",
-                    meta={
-                        "current": current,
-                        "total": total,
-                        "control_id": control_id,
-                        "progress": progress,
-                    }
-                )
-            
             # Update job total controls
             job.total_controls = len(controls)
             await db.commit()
             
-            # Run analysis
+            # Run analysis, stopping early if the job is cancelled
+            cancellation = CancellationFlag(job_id)
             analysis_results = await gemini.analyze_documents(
                 doc_paths,
-                progress_callback=update_progress,
+                progress_callback=progress_callback,
+                cancel_check=cancellation.is_requested,
             )
+            cancelled = analysis_results.get("cancelled") or await cancellation.is_requested()
             
-            # Save evidence items
-            for evidence_data in analysis_results["evidence_items"]:
-                status_map = {
-                    "pass": EvidenceStatus.PASS.value,
-                    "fail": EvidenceStatus.FAIL.value,
-                    "needs_review": EvidenceStatus.NEEDS_REVIEW.value,
-                    "error": EvidenceStatus.ERROR.value,
-                }
+            with tracer.start_as_current_span("persist_results"):
+                write_started = time.perf_counter()
                 
-                evidence = EvidenceItem(
-                    job_id=UUID(job_id),
-                    control_id=evidence_data["control_id"],
-                    status=status_map.get(
-                        evidence_data.get("status", "needs_review"),
-                        EvidenceStatus.NEEDS_REVIEW.value
-                    ),
-                    confidence=evidence_data.get("confidence", 0.0),
-                    summary=evidence_data.get("summary", ""),
-                    evidence_quote=evidence_data.get("evidence_quote"),
-                    raw_llm_response={"response": evidence_data.get("raw_llm_response")},
-                    source_document_ids=[UUID(d) for d in document_ids],
-                )
-                db.add(evidence)
-            
-            # Save gaps
-            for gap_data in analysis_results.get("gaps", []):
-                severity_map = {
-                    "critical": GapSeverity.CRITICAL.value,
-                    "high": GapSeverity.HIGH.value,
-                    "medium": GapSeverity.MEDIUM.value,
-                    "low": GapSeverity.LOW.value,
-                }
+                # Save evidence items
+                for evidence_data in analysis_results["evidence_items"]:
+                    status_map = {
+                        "pass": EvidenceStatus.PASS.value,
+                        "fail": EvidenceStatus.FAIL.value,
+                        "needs_review": EvidenceStatus.NEEDS_REVIEW.value,
+                        "error": EvidenceStatus.ERROR.value,
+                        "not_applicable": EvidenceStatus.NOT_APPLICABLE.value,
+                    }
                 
-                gap = Gap(
-                    job_id=UUID(job_id),
-                    control_id=gap_data["control_id"],
-                    severity=severity_map.get(
-                        gap_data.get("severity", "medium"),
-                        GapSeverity.MEDIUM.value
-                    ),
-                    description=gap_data["description"],
-                    remediation_suggestion=gap_data.get("remediation_suggestion"),
-                )
-                db.add(gap)
+                    evidence = EvidenceItem(
+                        job_id=UUID(job_id),
+                        control_id=evidence_data["control_id"],
+                        status=status_map.get(
+                            evidence_data.get("status", "needs_review"),
+                            EvidenceStatus.NEEDS_REVIEW.value
+                        ),
+                        confidence=evidence_data.get("confidence", 0.0),
+                        summary=evidence_data.get("summary", ""),
+                        evidence_quote=evidence_data.get("evidence_quote"),
+                        raw_llm_response={
+                            "response": evidence_data.get("raw_llm_response"),
+                            "latency_ms": evidence_data.get("latency_ms"),
+                            "retries": evidence_data.get("retries", 0),
+                        },
+                        source_document_ids=[doc.id for doc in documents],
+                    )
+                    db.add(evidence)
+                
+                # Save gaps
+                for gap_data in analysis_results.get("gaps", []):
+                    severity_map = {
+                        "critical": GapSeverity.CRITICAL.value,
+                        "high": GapSeverity.HIGH.value,
+                        "medium": GapSeverity.MEDIUM.value,
+                        "low": GapSeverity.LOW.value,
+                    }
+                
+                    gap = Gap(
+                        job_id=UUID(job_id),
+                        control_id=gap_data["control_id"],
+                        severity=severity_map.get(
+                            gap_data.get("severity", "medium"),
+                            GapSeverity.MEDIUM.value
+                        ),
+                        description=gap_data["description"],
+                        remediation_suggestion=gap_data.get("remediation_suggestion"),
+                    )
+                    db.add(gap)
+                
+                # Update job as completed
+                if cancelled:
+                    # Keep the evidence gathered before the cancellation
+                    job.status = JobStatus.CANCELLED.value
+                    job.progress = int(
+                        len(analysis_results["evidence_items"]) / max(len(controls), 1) * 100
+                    )
+                else:
+                    job.status = JobStatus.SUCCEEDED.value
+                    job.progress = 100
+                job.completed_at = datetime.now(timezone.utc)
+                await db.commit()
             
-            # Update job as completed
-            job.status = JobStatus.SUCCEEDED.value
-            job.progress = 100
+        except asyncio.CancelledError:
+            # Cut off by the task time limit on the shared loop, or by
+            # shutdown. Record the failure so the job does not stay RUNNING
+            # holding its de-duplication key, and free its scheduler slot.
+            await db.rollback()
+            job.status = JobStatus.FAILED.value
+            job.error_message = "Analysis was interrupted before it finished"
             job.completed_at = datetime.now(timezone.utc)
             await db.commit()
+            await asyncio.to_thread(release_job, job_id)
             
-            return {
-                "status": "success",
-                "job_id": job_id,
-                "evidence_count": len(analysis_results["evidence_items"]),
-                "gap_count": len(analysis_results.get("gaps", [])),
-                "summary": analysis_results["summary"],
-            }
-            
+            raise
+        
         except Exception as e:
-            # Update job as failed
+            # Discard partial results, then record the failure
+            await db.rollback()
             job.status = JobStatus.FAILED.value
             job.error_message = str(e)
             job.completed_at = datetime.now(timezone.utc)
             await db.commit()
             
             raise
+        
+        # The write time includes the commit, so the metrics follow in a
+        # second, single-row update. The job has finished by now, so a
+        # failure here only loses its telemetry.
+        job.metrics = build_job_metrics(
+            analysis_results["metrics"],
+            documents,
+            db_write_ms=(time.perf_counter() - write_started) * 1000,
+        )
+        try:
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("Failed to store job metrics", job_id=job_id, error=str(e))
+        
+        return {
+            "status": "cancelled" if cancelled else "success",
+            "job_id": job_id,
+            "evidence_count": len(analysis_results["evidence_items"]),
+            "gap_count": len(analysis_results.get("gaps", [])),
+            "summary": analysis_results["summary"],
+        }
 
 
 @celery_app.task(bind=True, max_retries=3)
@@ -176,6 +302,7 @@ def run_compliance_analysis(
     job_id: str,
     document_ids: list[str],
     scan_type: str = "quick",
+    framework: str = "soc2",
 ) -> dict:
     """
     Celery task to run compliance analysis on documents.
@@ -183,21 +310,82 @@ def run_compliance_analysis(
     Args:
         job_id: The job UUID string.
         document_ids: List of document UUID strings.
-        scan_type: "quick" for 8 controls, "full" for all 51.
+        scan_type: "quick" for the pack's quick-scan controls, "full" for all.
+        framework: Framework ID of the control pack to evaluate against.
         
     Returns:
         Analysis results dictionary.
     """
+    # Hold the scheduler slot for the whole run, including retries
+    renew_job_lease(job_id)
+    progress = _task_progress_reporter(self)
     try:
-        # Run async function in event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(
-                _run_analysis(job_id, document_ids, scan_type)
+        if settings.worker_shared_event_loop:
+            # Threads pools cannot enforce task_time_limit, so the loop does
+            result = shared_loop.run(
+                run_analysis(
+                    job_id, document_ids, scan_type, framework,
+                    session_factory=get_shared_session_factory(),
+                    progress_callback=progress,
+                ),
+                timeout=celery_app.conf.task_time_limit,
             )
-        finally:
-            loop.close()
+        else:
+            # Run async function in event loop
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                result = loop.run_until_complete(
+                    run_analysis(
+                        job_id, document_ids, scan_type, framework,
+                        progress_callback=progress,
+                    )
+                )
+            finally:
+                loop.close()
+    except TimeoutError:
+        # Past the hard time limit; a retry would most likely time out too.
+        # The job was marked FAILED when its coroutine was cancelled.
+        release_job(job_id)
+        raise
     except Exception as e:
+        if self.request.retries >= self.max_retries:
+            release_job(job_id)
         # Retry on failure
         raise self.retry(exc=e, countdown=60)
+    
+    # Free the user's slot and start the next fairly scheduled job
+    release_job(job_id)
+    return result
+
+
+@worker_process_init.connect
+def _init_llm_clients(**kwargs):
+    """Connect LLM clients in each pool process (gRPC channels do not survive fork)."""
+    init_provider_pool()
+
+
+@worker_ready.connect
+def _init_llm_clients_for_threads(sender=None, **kwargs):
+    """Connect LLM clients in the worker process itself when tasks run on threads."""
+    if isinstance(getattr(sender, "pool", None), ThreadTaskPool):
+        init_provider_pool()
+
+
+async def _dispose_shared_engine() -> None:
+    if get_shared_session_factory.cache_info().currsize:
+        await get_shared_session_factory().kw["bind"].dispose()
+        get_shared_session_factory.cache_clear()
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def _stop_shared_loop(**kwargs):
+    """Close the shared database pool and stop the shared loop on shutdown."""
+    if not shared_loop.running:
+        return
+    try:
+        shared_loop.run(_dispose_shared_engine(), timeout=10)
+    except Exception as e:
+        logger.warning("Failed to close shared database pool", error=str(e))
+    shared_loop.stop()
@@ -0,0 +1,107 @@
+"""
+Trace context propagation through Celery.
+
+The publishing process injects its current trace context (W3C traceparent)
+and the enqueue time into the task message headers. The worker continues
+that trace with a consumer span per task, preceded by a span covering the
+time the message waited in the queue.
+
+Jobs are published later by the outbox relay (and the fair scheduler), away
+from the request that submitted them. Their outbox payload carries headers
+captured at submission (core.tracing.capture_trace_headers), which the
+publish hook
+keeps, so the trace and the queue wait start at the request.
+"""
+
+import time
+
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from opentelemetry import context, propagate, trace
+from opentelemetry.propagators.textmap import Getter
+
+from core.config import settings
+from core.tracing import ENQUEUED_AT_HEADER, setup_tracing, shutdown_tracing, tracer
+
+# Active task spans in this process, keyed by task ID
+_task_spans: dict[str, tuple[trace.Span, object]] = {}
+
+
+class CeleryRequestGetter(Getter):
+    """Reads propagated headers, which Celery exposes as request attributes."""
+
+    def get(self, carrier, key):
+        value = getattr(carrier, key, None)
+        if value is None:
+            value = (getattr(carrier, "headers", None) or {}).get(key)
+        if value is None:
+            return None
+        return value if isinstance(value, list) else [value]
+
+    def keys(self, carrier):
+        return list(getattr(carrier, "headers", None) or {})
+
+
+@before_task_publish.connect
+def _inject_trace_headers(headers=None, **kwargs):
+    if not settings.tracing_enabled or headers is None:
+        return
+    # Headers captured at submission take precedence over the publisher's
+    if "traceparent" not in headers:
+        propagate.inject(headers)
+    headers.setdefault(ENQUEUED_AT_HEADER, time.time_ns())
+
+
+@task_prerun.connect
+def _start_task_span(task_id=None, task=None, **kwargs):
+    if not settings.tracing_enabled:
+        return
+    setup_tracing("shieldagent-worker")
+
+    parent = propagate.extract(task.request, getter=CeleryRequestGetter())
+    enqueued_at = getattr(task.request, ENQUEUED_AT_HEADER, None)
+    if enqueued_at:
+        # Queue wait ends now; the span is backdated to when it was published
+        tracer.start_span(
+            "celery.queue_wait",
+            context=parent,
+            start_time=int(enqueued_at),
+            attributes={
+                "messaging.destination": (task.request.delivery_info or {}).get("routing_key", ""),
+            },
+        ).end()
+
+    span = tracer.start_span(
+        f"celery.run {task.name}",
+        context=parent,
+        kind=trace.SpanKind.CONSUMER,
+        attributes={"celery.task_id": task_id, "celery.task_name": task.name},
+    )
+    token = context.attach(trace.set_span_in_context(span, parent))
+    _task_spans[task_id] = (span, token)
+
+
+@task_postrun.connect
+def _end_task_span(task_id=None, state=None, **kwargs):
+    entry = _task_spans.pop(task_id, None)
+    if entry is None:
+        return
+    span, token = entry
+    span.set_attribute("celery.state", state or "UNKNOWN")
+    if state == "FAILURE":
+        span.set_status(trace.StatusCode.ERROR)
+    span.end()
+    context.detach(token)
+
+
+# Prefork children exit through worker_process_shutdown; threads pools
+# run tasks in the main process, which ends with worker_shutdown
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def _flush_spans(**kwargs):
+    shutdown_tracing()